@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from .authentication import invalidate_user_on_change
+        from .models import CustomUser
+
+        post_save.connect(invalidate_user_on_change, sender=CustomUser, dispatch_uid='auth-user-cache-save')
+        post_delete.connect(invalidate_user_on_change, sender=CustomUser, dispatch_uid='auth-user-cache-delete')
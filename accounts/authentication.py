@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import CustomUser
+
+# Claims copied into every token so the stateless mode can build request.user
+# without a query. The password hash is never cached or embedded.
+CLAIM_FIELDS = ['email', 'full_name', 'role', 'is_staff', 'is_superuser', 'kyc_verified']
+CACHED_FIELDS = [f.attname for f in CustomUser._meta.concrete_fields if f.attname != 'password']
+
+LOCAL_MAX_ENTRIES = 10_000
+
+_local = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def token_user_id(validated_token):
+    try:
+        return CustomUser._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+    except KeyError as e:
+        raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+
+def user_from_fields(fields):
+    """A fresh CustomUser per request; anything not in ``fields`` loads lazily."""
+    names = [name for name in CACHED_FIELDS if name in fields]
+    return CustomUser.from_db('default', names, [fields[name] for name in names])
+
+
+def local_get(user_id):
+    with _local_lock:
+        entry = _local.get(user_id)
+        if entry is None:
+            return None
+        expires, fields = entry
+        if expires < time.monotonic():
+            del _local[user_id]
+            return None
+        _local.move_to_end(user_id)
+        return fields
+
+
+def local_set(user_id, fields):
+    with _local_lock:
+        _local[user_id] = (time.monotonic() + settings.AUTH_USER_LOCAL_TTL, fields)
+        _local.move_to_end(user_id)
+        while len(_local) > LOCAL_MAX_ENTRIES:
+            _local.popitem(last=False)
+
+
+def invalidate_cached_user(user_id):
+    """
+    Drop a user's cached row here and in the shared cache. Other processes
+    keep their in-process copy for at most AUTH_USER_LOCAL_TTL seconds, as
+    long as the shared cache really is shared (CACHE_BACKEND=redis).
+    """
+    with _local_lock:
+        _local.pop(user_id, None)
+    caches[settings.AUTH_USER_CACHE_ALIAS].delete(user_cache_key(user_id))
+
+
+def invalidate_user_on_change(sender, instance, **kwargs):
+    # Drop it now, and again once the write is visible, so a concurrent
+    # request cannot re-cache the old row in between.
+    invalidate_cached_user(instance.pk)
+    transaction.on_commit(lambda: invalidate_cached_user(instance.pk))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user id through a short-lived
+    in-process cache backed by the shared cache, instead of a SELECT per
+    request. CustomUser saves and deletes invalidate the entry.
+    """
+
+    def get_user(self, validated_token):
+        user_id = token_user_id(validated_token)
+        fields = local_get(user_id)
+        if fields is None:
+            shared = caches[settings.AUTH_USER_CACHE_ALIAS]
+            fields = shared.get(user_cache_key(user_id))
+            if fields is None:
+                fields = CustomUser.objects.filter(pk=user_id).values(*CACHED_FIELDS).first()
+                if fields is None:
+                    raise AuthenticationFailed(_("User not found"), code="user_not_found")
+                shared.set(user_cache_key(user_id), fields, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+            local_set(user_id, fields)
+
+        user = user_from_fields(fields)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    Trust the role/staff/KYC claims embedded in the access token and never
+    touch the database. Changes to those fields, and deactivation, only take
+    effect when the token is refreshed (UserClaimsTokenRefreshSerializer
+    re-reads the user), so pair this with a short ACCESS_TOKEN_LIFETIME.
+    """
+
+    def get_user(self, validated_token):
+        user_id = token_user_id(validated_token)
+        if 'role' not in validated_token:
+            raise InvalidToken(_("Token carries no user claims; log in again."))
+        fields = {name: validated_token[name] for name in CLAIM_FIELDS if name in validated_token}
+        # Tokens are only issued and refreshed for active users.
+        return user_from_fields(dict(fields, id=user_id, is_active=True))
+
+
+def set_user_claims(token, user):
+    for name in CLAIM_FIELDS:
+        token[name] = getattr(user, name)
+
+
+class UserClaimsRefreshToken(RefreshToken):
+    """Refresh token (and the access tokens minted from it) carrying CLAIM_FIELDS."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        set_user_claims(token, user)
+        return token
+
+
+class UserClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = UserClaimsRefreshToken
+
+
+class UserClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Mint the new access token with the user's current claims rather than the
+    ones copied from the refresh token at login, and refuse deleted or
+    inactive users.
+    """
+    token_class = UserClaimsRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = CustomUser.objects.filter(pk=token_user_id(refresh)).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        # Re-sign the same token (jti and expiry unchanged) with fresh claims;
+        # simplejwt copies them into the access token and any rotated refresh.
+        set_user_claims(refresh, user)
+        return super().validate(dict(attrs, refresh=str(refresh)))
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password, verify_password
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count from PBKDF2_ITERATIONS. It keeps
+    the stock algorithm name, so existing hashes verify and are rehashed on
+    login whenever the count changes.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PBKDF2_ITERATIONS or PBKDF2PasswordHasher.iterations
+
+
+def hash_executor():
+    global _executor
+    if not settings.PASSWORD_HASH_THREADS:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(settings.PASSWORD_HASH_THREADS, thread_name_prefix='password-hash')
+        return _executor
+
+
+def verify_and_upgrade(password, encoded):
+    """
+    Return (is_correct, new_encoded). ``new_encoded`` is set when the stored
+    hash uses an old hasher or work factor. Pure CPU work: no database access,
+    so it is safe to run on the hash pool.
+    """
+    is_correct, must_update = verify_password(password, encoded)
+    if is_correct and must_update:
+        return True, make_password(password)
+    return is_correct, None
+
+
+def check_login_password(user, password):
+    """
+    Check ``password`` against ``user`` and store a rehash if one is due. The
+    hashing runs on the bounded pool when PASSWORD_HASH_THREADS is set.
+    """
+    executor = hash_executor()
+    if executor is None:
+        is_correct, new_encoded = verify_and_upgrade(password, user.password)
+    else:
+        is_correct, new_encoded = executor.submit(verify_and_upgrade, password, user.password).result()
+    if new_encoded:
+        user.password = new_encoded
+        user.save(update_fields=['password'])
+    return is_correct
+
+
+async def acheck_login_password(user, password):
+    """Async check_login_password; the event loop never runs the hash itself."""
+    executor = hash_executor()
+    loop = asyncio.get_running_loop()
+    is_correct, new_encoded = await loop.run_in_executor(executor, verify_and_upgrade, password, user.password)
+    if new_encoded:
+        user.password = new_encoded
+        await user.asave(update_fields=['password'])
+    return is_correct
@@ -0,0 +1,103 @@
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import identify_hasher
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils.module_loading import import_string
+
+from accounts.models import CustomUser
+from accounts.serializers import LoginSerializer
+
+PASSWORD = "correct horse battery staple"
+
+
+def verify_for(seconds, encoded):
+    """Verify ``encoded`` repeatedly for ``seconds``; returns the number of checks."""
+    hasher = identify_hasher(encoded)
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        hasher.verify(PASSWORD, encoded)
+        count += 1
+    return count
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure password checks per second per core for each hasher, and the "
+        "number of queries one login runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hashers', default='pbkdf2,argon2,bcrypt',
+                            help="Names from PASSWORD_HASHER_CLASSES.")
+        parser.add_argument('--pbkdf2-iterations', type=int, action='append', dest='iterations',
+                            help="Also measure PBKDF2 at this iteration count (repeatable).")
+        parser.add_argument('--seconds', type=float, default=3.0, help="Measuring time per hasher.")
+        parser.add_argument('--processes', type=int, default=1,
+                            help="Parallel processes; the rate is still reported per core.")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        cases = []
+        for name in options['hashers'].split(','):
+            if name not in settings.PASSWORD_HASHER_CLASSES:
+                raise CommandError(f"Unknown hasher {name!r}")
+            cases.append((name, settings.PASSWORD_HASHER_CLASSES[name], {}))
+        for iterations in options['iterations'] or []:
+            cases.append((f"pbkdf2@{iterations}", settings.PASSWORD_HASHER_CLASSES['pbkdf2'], {'iterations': iterations}))
+
+        processes, seconds = options['processes'], options['seconds']
+        results = []
+        for label, path, encode_options in cases:
+            hasher = import_string(path)()
+            try:
+                encoded = hasher.encode(PASSWORD, hasher.salt(), **encode_options)
+            except ValueError as exc:
+                # The hasher's library (argon2-cffi, bcrypt) is not installed.
+                self.stderr.write(f"{label}: skipped ({exc})")
+                continue
+            with ProcessPoolExecutor(processes) as pool:
+                checks = sum(pool.map(verify_for, [seconds] * processes, [encoded] * processes))
+            per_core = checks / seconds / processes
+            results.append({
+                'hasher': label,
+                'logins_per_second_per_core': round(per_core, 1),
+                'ms_per_check': round(1000 / per_core, 2) if per_core else None,
+            })
+        login_queries = self.login_queries()
+
+        if options['json']:
+            self.stdout.write(json.dumps({'hashers': results, 'login_queries': login_queries}, indent=2))
+            return
+        for row in results:
+            self.stdout.write(
+                f"{row['hasher']:<16} {row['logins_per_second_per_core']:>10} logins/s/core "
+                f"{row['ms_per_check']!s:>9} ms/check"
+            )
+        self.stdout.write(f"One successful login runs {login_queries} queries.")
+
+    def login_queries(self):
+        """Queries run by LoginSerializer for a user whose hash is current."""
+        queries = None
+        try:
+            with transaction.atomic():
+                CustomUser.objects.create_user(
+                    email="benchmark-login@example.com", password=PASSWORD, full_name="Benchmark", is_active=True,
+                )
+                with CaptureQueriesContext(connection) as ctx:
+                    serializer = LoginSerializer(data={'email': "benchmark-login@example.com", 'password': PASSWORD})
+                    serializer.is_valid(raise_exception=True)
+                queries = len(ctx.captured_queries)
+                raise Rollback
+        except Rollback:
+            pass
+        return queries
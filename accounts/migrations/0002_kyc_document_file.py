@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:29
+
+import accounts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kyc',
+            name='document_file',
+            field=models.FileField(blank=True, max_length=500, storage=accounts.models.kyc_document_storage, upload_to='kyc/%Y/%m/'),
+        ),
+        migrations.AlterField(
+            model_name='kyc',
+            name='document_data',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:29
+
+from django.core.files.base import ContentFile
+from django.db import migrations, transaction
+
+BATCH_SIZE = 100
+
+
+def move_blobs_to_storage(apps, schema_editor):
+    """
+    Copy each inline document into kyc_documents storage and clear the blob.
+    Rows are handled in small batches, each in its own short transaction, so
+    the table is never locked for the whole run and the migration can resume.
+    """
+    KYC = apps.get_model('accounts', 'KYC')
+    pending = KYC.objects.filter(document_data__isnull=False, document_file='').order_by('pk')
+
+    while True:
+        ids = list(pending.values_list('pk', flat=True)[:BATCH_SIZE])
+        if not ids:
+            break
+        for pk in ids:
+            with transaction.atomic():
+                kyc = KYC.objects.select_for_update().only('pk', 'document_name', 'document_data', 'document_file').get(pk=pk)
+                if kyc.document_file or kyc.document_data is None:
+                    continue
+                kyc.document_file.save(kyc.document_name or f"kyc-{pk}", ContentFile(bytes(kyc.document_data)), save=False)
+                KYC.objects.filter(pk=pk).update(document_file=kyc.document_file.name, document_data=None)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0002_kyc_document_file'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_blobs_to_storage, migrations.RunPython.noop),
+    ]
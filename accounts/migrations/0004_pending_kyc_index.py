@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_move_kyc_blobs_to_storage'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('kyc_verified', False)), fields=['id'], name='user_pending_kyc_idx'),
+        ),
+    ]
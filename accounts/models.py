@@ -1,5 +1,7 @@
 import uuid
+from django.core.files.storage import storages
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 
 ROLE_CHOICES = (
@@ -43,17 +45,33 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 
     objects = CustomUserManager()
 
+    class Meta:
+        indexes = [
+            # Only the (small) pending-KYC review queue is indexed.
+            models.Index(fields=['id'], condition=models.Q(kyc_verified=False), name='user_pending_kyc_idx'),
+            # Fuzzy/partial admin lookups (UserSearchView); needs pg_trgm.
+            GinIndex(fields=['email'], opclasses=['gin_trgm_ops'], name='user_email_trgm_idx'),
+            GinIndex(fields=['full_name'], opclasses=['gin_trgm_ops'], name='user_full_name_trgm_idx'),
+        ]
+
     def __str__(self):
         return self.email
 
 
+def kyc_document_storage():
+    return storages['kyc_documents']
+
+
 class KYC(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name="kyc")
     document_type = models.CharField(max_length=50)
     document_number = models.CharField(max_length=100)
     
     document_name = models.CharField(max_length=255)  
-    document_data = models.BinaryField()  
+    document_file = models.FileField(upload_to='kyc/%Y/%m/', storage=kyc_document_storage, max_length=500, blank=True)
+    # Legacy inline copy of the document; emptied by migration 0003 and kept
+    # only so rows that have not been moved yet can still be downloaded.
+    document_data = models.BinaryField(null=True, blank=True, editable=False)
     
     submitted_at = models.DateTimeField(auto_now_add=True)
     approved_at = models.DateTimeField(null=True, blank=True)
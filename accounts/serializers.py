@@ -1,8 +1,8 @@
 from rest_framework import serializers
-from django.contrib.auth import authenticate
 from .models import CustomUser, KYC
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate, get_user_model
+from .authentication import UserClaimsRefreshToken
+from .hashers import check_login_password
+from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
@@ -41,25 +41,20 @@ class LoginSerializer(serializers.Serializer):
         if not email or not password:
             raise serializers.ValidationError("Must include email and password.")
 
-        try:
-            user_obj = User.objects.get(email=email)
-        except User.DoesNotExist:
+        # One query: the password is checked against this row directly
+        # instead of authenticate() fetching the user a second time.
+        user = User.objects.filter(email=email).first()
+        if user is None:
             raise serializers.ValidationError("User with this email does not exist.")
 
-        user = authenticate(
-            request=self.context.get("request"),
-            username=email,
-            password=password
-        )
-
-        if not user:
+        if not check_login_password(user, password):
             raise serializers.ValidationError("Incorrect password.")
 
         if not user.is_active:
             raise serializers.ValidationError("User account is disabled.")
 
         # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = UserClaimsRefreshToken.for_user(user)
         data["refresh"] = str(refresh)
         data["access"] = str(refresh.access_token)
         data["user"] = user
@@ -79,9 +74,9 @@ class KYCSerializer(serializers.ModelSerializer):
         fields = ["document_type", "document_number", "document_file", "document_name"]
 
     def create(self, validated_data):
-        file = validated_data.pop("document_file")
-        validated_data["document_name"] = file.name
-        validated_data["document_data"] = file.read()
+        # The upload is streamed into kyc_documents storage by the FileField;
+        # it is never read into memory or stored in the database row.
+        validated_data["document_name"] = validated_data["document_file"].name
         return super().create(validated_data)
 
 
@@ -1,3 +1,209 @@
-from django.test import TestCase
+import importlib
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from courses.encryption import EncryptedFileSystemStorage
+
+from .authentication import CachedJWTAuthentication, StatelessJWTAuthentication, UserClaimsRefreshToken
+from .models import CustomUser, KYC
+from .views import UserListView
+
+move_kyc_blobs = importlib.import_module('accounts.migrations.0003_move_kyc_blobs_to_storage')
+
+
+class KYCDocumentStorageTests(TestCase):
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        storage_patch = mock.patch.object(
+            KYC._meta.get_field('document_file'), 'storage', EncryptedFileSystemStorage(location=location)
+        )
+        storage_patch.start()
+        self.addCleanup(storage_patch.stop)
+
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(
+            email="student@example.com", password="pass1234", full_name="Student"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_submit_streams_to_storage_and_download_streams_back(self):
+        response = self.client.post(reverse('kyc-submit'), {
+            'document_type': 'passport',
+            'document_number': 'P123',
+            'document_file': SimpleUploadedFile("passport.pdf", b"%PDF passport"),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+        kyc = KYC.objects.get(user=self.user)
+        self.assertIsNone(kyc.document_data)
+        self.assertTrue(kyc.document_file.name.endswith("passport.pdf"))
+
+        download = self.client.get(reverse('kyc-download', args=[kyc.pk]))
+        self.assertEqual(b''.join(download.streaming_content), b"%PDF passport")
+        self.assertIn('filename="passport.pdf"', download['Content-Disposition'])
+
+    def test_migration_moves_inline_blobs(self):
+        kyc = KYC.objects.create(
+            user=self.user, document_type='passport', document_number='P123',
+            document_name='legacy.pdf', document_data=b"legacy bytes",
+        )
+
+        move_kyc_blobs.move_blobs_to_storage(apps, None)
+
+        kyc.refresh_from_db()
+        self.assertIsNone(kyc.document_data)
+        with kyc.document_file.open('rb') as handle:
+            self.assertEqual(handle.read(), b"legacy bytes")
+
+
+class DatabaseStatsTests(TestCase):
+    def test_admin_sees_connection_strategy(self):
+        admin = CustomUser.objects.create_superuser(email="admin@example.com", password="pass1234", full_name="Admin")
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        data = client.get(reverse('db-stats')).json()
+
+        self.assertEqual(data['mode'], 'persistent')
+        self.assertIsNone(data['pool'])
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            email="student@example.com", password="pass1234", full_name="Student", is_active=True
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {UserClaimsRefreshToken.for_user(self.user).access_token}")
+        self.url = reverse('user-list')
+        # DRF binds authentication classes at import; JWT_AUTH_MODE defaults
+        # to "database" on the locmem cache.
+        auth_patch = mock.patch.object(UserListView, 'authentication_classes', [CachedJWTAuthentication])
+        auth_patch.start()
+        self.addCleanup(auth_patch.stop)
+
+    def test_user_row_is_read_once(self):
+        self.client.get(self.url)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        user_table = CustomUser._meta.db_table
+        self.assertFalse([q for q in ctx.captured_queries if f'"{user_table}"."id" = ' in q['sql']])
+
+    def test_kyc_approval_invalidates_cached_user(self):
+        admin = CustomUser.objects.create_superuser(email="admin@example.com", password="pass1234", full_name="Admin")
+        kyc = KYC.objects.create(user=self.user, document_type='passport', document_number='P1', document_name='p.pdf')
+        self.assertFalse(CachedJWTAuthentication().get_user(self.token()).kyc_verified)
+
+        admin_client = APIClient()
+        admin_client.force_authenticate(admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            admin_client.put(reverse('kyc-approve', args=[kyc.pk]))
+
+        self.assertTrue(CachedJWTAuthentication().get_user(self.token()).kyc_verified)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_stateless_mode_trusts_token_claims(self):
+        with self.assertNumQueries(0):
+            user = StatelessJWTAuthentication().get_user(self.token())
+
+        self.assertEqual((user.pk, user.email, user.role), (self.user.pk, self.user.email, 'student'))
+
+    def token(self):
+        return UserClaimsRefreshToken.for_user(self.user).access_token
+
+    def test_refresh_reads_current_claims(self):
+        refresh = str(UserClaimsRefreshToken.for_user(self.user))
+        self.user.role = 'instructor'
+        self.user.kyc_verified = True
+        self.user.save()
+
+        response = APIClient().post(reverse('token_refresh'), {'refresh': refresh})
+
+        self.assertEqual(response.status_code, 200)
+        user = StatelessJWTAuthentication().get_user(AccessToken(response.data['access']))
+        self.assertEqual((user.role, user.kyc_verified), ('instructor', True))
+
+    def test_refresh_refuses_inactive_user(self):
+        refresh = str(UserClaimsRefreshToken.for_user(self.user))
+        self.user.is_active = False
+        self.user.save()
+
+        response = APIClient().post(reverse('token_refresh'), {'refresh': refresh})
+
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(PBKDF2_ITERATIONS=1000)
+class LoginTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="student@example.com", password="pass1234", full_name="Student", is_active=True
+        )
+
+    def login(self):
+        return APIClient().post(reverse('login'), {'email': "student@example.com", 'password': "pass1234"})
+
+    def test_login_reads_the_user_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.login().status_code, 200)
+
+    def test_changed_work_factor_rehashes_on_login(self):
+        with override_settings(PBKDF2_ITERATIONS=2000):
+            self.assertEqual(self.login().status_code, 200)
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$2000$"))
+
+    @override_settings(PASSWORD_HASH_THREADS=2)
+    def test_hashing_on_bounded_pool(self):
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(
+            APIClient().post(reverse('login'), {'email': "student@example.com", 'password': "wrong"}).status_code, 400
+        )
+
+
+def has_pg_trgm():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+class UserSearchTests(TestCase):
+    def setUp(self):
+        if not has_pg_trgm():
+            self.skipTest("pg_trgm is not installed")
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_superuser(
+            email="admin@example.com", password="pass1234", full_name="Admin",
+        ))
+        CustomUser.objects.create_user(email="jane.doe@example.com", password="pass1234", full_name="Jane Doe")
+        CustomUser.objects.create_user(email="john.smith@example.com", password="pass1234", full_name="John Smith")
+
+    def test_partial_name_finds_user(self):
+        response = self.client.get(reverse('user-search'), {'q': "smit"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['email'], "john.smith@example.com")
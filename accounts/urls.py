@@ -1,10 +1,11 @@
 from django.urls import path
-from .views import RegisterView, KYCSubmitView, KYCApproveView, KYCDownloadView, LoginView, PendingKYCUserListView, UserListView
+from .views import RegisterView, KYCSubmitView, KYCApproveView, KYCDownloadView, LoginView, PendingKYCUserListView, UserListView, UserSearchView
 
 urlpatterns = [
     path('login/', LoginView.as_view(), name='login'),
     path("register/", RegisterView.as_view(), name="register"),
     path("users/", UserListView.as_view(), name="user-list"),
+    path("users/search/", UserSearchView.as_view(), name="user-search"),
     path("kyc/submit/", KYCSubmitView.as_view(), name="kyc-submit"),
     path("kyc/approve/<int:pk>/", KYCApproveView.as_view(), name="kyc-approve"),
     path("kyc/download/<int:pk>/", KYCDownloadView.as_view(), name="kyc-download"),
@@ -4,6 +4,9 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from django.utils.timezone import now
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q
+from django.db.models.functions import Greatest
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.generics import GenericAPIView
@@ -17,6 +20,8 @@ from .serializers import (
     UserListSerializer
 )
 from .permissions import IsAdminCanApproveKYC
+from courses.media import attachment_response, in_thread
+from root.async_views import AsyncAPIView
 from rest_framework.permissions import IsAdminUser
 
 
@@ -60,7 +65,7 @@ class LoginView(GenericAPIView):
         }, status=status.HTTP_200_OK)
 
 class KYCSubmitView(generics.CreateAPIView):
-    queryset = KYC.objects.all()
+    queryset = KYC.objects.defer('document_data')
     serializer_class = KYCSerializer
 
     def perform_create(self, serializer):
@@ -69,12 +74,13 @@ class KYCSubmitView(generics.CreateAPIView):
 class PendingKYCUserListView(ListAPIView):
     serializer_class = UserListSerializer
     permission_classes = [IsAdminUser]  
+    cursor_ordering = 'id'
 
     def get_queryset(self):
-        return CustomUser.objects.filter(kyc_verified=False)
+        return CustomUser.objects.filter(kyc_verified=False).order_by('id')
 
 class KYCApproveView(generics.UpdateAPIView):
-    queryset = KYC.objects.all()
+    queryset = KYC.objects.select_related('user').defer('document_data')
     serializer_class = KYCSerializer
     permission_classes = [IsAdminCanApproveKYC]
 
@@ -87,19 +93,47 @@ class KYCApproveView(generics.UpdateAPIView):
         kyc.save()
         return Response({"status": "KYC Approved"})
     
-class KYCDownloadView(APIView):
+class KYCDownloadView(AsyncAPIView):
     permission_classes = [IsAuthenticated]
 
-    def get(self, request, pk):
-        try:
-            kyc = KYC.objects.get(pk=pk)
-            response = HttpResponse(kyc.document_data, content_type="application/octet-stream")
-            response['Content-Disposition'] = f'attachment; filename="{kyc.document_name}"'
-            return response
-        except KYC.DoesNotExist:
+    async def get(self, request, pk):
+        kyc = await KYC.objects.defer('document_data').filter(pk=pk).afirst()
+        if kyc is None:
             return Response({"error": "KYC not found"}, status=404)
 
+        if kyc.document_file:
+            return await in_thread(attachment_response)(request, kyc.document_file, kyc.document_name)
+
+        # Row not moved out of the database yet (see migration 0003).
+        document_data = await KYC.objects.filter(pk=pk).values_list('document_data', flat=True).aget()
+        response = HttpResponse(document_data, content_type="application/octet-stream")
+        response['Content-Disposition'] = f'attachment; filename="{kyc.document_name}"'
+        return response
+
 
 class UserListView(generics.ListAPIView):
-    queryset = CustomUser.objects.all()
-    serializer_class = UserListSerializer
\ No newline at end of file
+    queryset = CustomUser.objects.order_by('id')
+    serializer_class = UserListSerializer
+    cursor_ordering = 'id'
+
+
+class UserSearchView(APIView):
+    """
+    Admin lookup by partial or misspelt email / full name (?q=), ranked by
+    trigram word similarity and served from the pg_trgm GIN indexes.
+    """
+    permission_classes = [IsAdminUser]
+    limit = 20
+
+    def get(self, request):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({"error": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
+        users = (
+            CustomUser.objects.filter(Q(email__trigram_word_similar=text) | Q(full_name__trigram_word_similar=text))
+            .annotate(similarity=Greatest(
+                TrigramWordSimilarity(text, 'email'), TrigramWordSimilarity(text, 'full_name'),
+            ))
+            .order_by('-similarity', 'id')[:self.limit]
+        )
+        return Response(UserListSerializer(users, many=True).data)
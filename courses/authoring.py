@@ -0,0 +1,145 @@
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+from django.utils.timezone import now
+from rest_framework.exceptions import ValidationError
+
+from .cache import bump_catalog_version
+from .models import Course, Chapter, Lesson
+from .outline import schedule_outline_rebuild
+from .signals import muted_catalog_signals
+
+LESSON_FIELDS = ['title', 'content_type', 'content']
+
+
+def reorder(model, orders, timestamp):
+    """Set ``order`` on many rows with one UPDATE ... CASE statement."""
+    if not orders:
+        return
+    model.objects.filter(pk__in=orders).update(
+        order=Case(*[When(pk=pk, then=Value(order)) for pk, order in orders.items()], output_field=IntegerField()),
+        updated_at=timestamp,
+    )
+
+
+def check_ids(outline, chapters, lessons):
+    """Every id in the outline must belong to this course and appear once."""
+    errors, seen_chapters, seen_lessons = {}, set(), set()
+    for c, chapter in enumerate(outline['chapters']):
+        if 'id' in chapter:
+            if chapter['id'] not in chapters or chapter['id'] in seen_chapters:
+                errors[f"chapters[{c}].id"] = f"Chapter {chapter['id']} is not in this course or is listed twice."
+            seen_chapters.add(chapter['id'])
+        for l, lesson in enumerate(chapter['lessons']):
+            if 'id' in lesson:
+                if lesson['id'] not in lessons or lesson['id'] in seen_lessons:
+                    errors[f"chapters[{c}].lessons[{l}].id"] = (
+                        f"Lesson {lesson['id']} is not in this course or is listed twice."
+                    )
+                seen_lessons.add(lesson['id'])
+            elif 'content_type' not in lesson:
+                errors[f"chapters[{c}].lessons[{l}].content_type"] = "Required for new lessons."
+    if errors:
+        raise ValidationError(errors)
+    return seen_chapters, seen_lessons
+
+
+def apply_outline(course, outline):
+    """
+    Bring a course's chapters and lessons in line with ``outline`` in one
+    transaction and a fixed number of statements: one bulk INSERT per model
+    for new rows, one bulk UPDATE for changed fields, one CASE UPDATE per model
+    for order changes and one DELETE per model (plus one per table it cascades
+    to) for rows left out. Unchanged rows are not written. Returns a per-item
+    result list.
+    """
+    results = []
+    timestamp = now()
+    with transaction.atomic():
+        chapters = {c.pk: c for c in Chapter.objects.select_for_update().filter(course=course)}
+        lessons = {l.pk: l for l in Lesson.objects.select_for_update().filter(chapter__course=course)}
+        kept_chapters, kept_lessons = check_ids(outline, chapters, lessons)
+
+        # Chapters first: new lessons may need the ids of new chapters.
+        new_chapters, changed_chapters, chapter_orders, chapter_rows = [], [], {}, []
+        for position, item in enumerate(outline['chapters']):
+            chapter = chapters.get(item.get('id'))
+            if chapter is None:
+                chapter = Chapter(course=course, title=item['title'], order=position, updated_at=timestamp)
+                new_chapters.append(chapter)
+                result = {'type': 'chapter', 'status': 'created'}
+            else:
+                result = {'type': 'chapter', 'id': chapter.pk, 'status': 'unchanged'}
+                if chapter.title != item['title']:
+                    chapter.title = item['title']
+                    chapter.updated_at = timestamp
+                    changed_chapters.append(chapter)
+                    result['status'] = 'updated'
+                if chapter.order != position:
+                    chapter_orders[chapter.pk] = position
+                    result['status'] = 'reordered' if result['status'] == 'unchanged' else result['status']
+            chapter_rows.append(chapter)
+            results.append(result)
+
+        Chapter.objects.bulk_create(new_chapters)
+        Chapter.objects.bulk_update(changed_chapters, ['title', 'updated_at'])
+        reorder(Chapter, chapter_orders, timestamp)
+        for result, chapter in zip(results, chapter_rows):
+            result.setdefault('id', chapter.pk)
+
+        new_lessons, changed_lessons, lesson_orders, lesson_results = [], [], {}, []
+        touched_chapters = set()
+        for chapter, item in zip(chapter_rows, outline['chapters']):
+            for position, lesson_item in enumerate(item['lessons']):
+                lesson = lessons.get(lesson_item.get('id'))
+                values = {field: lesson_item[field] for field in LESSON_FIELDS if field in lesson_item}
+                if lesson is None:
+                    lesson = Lesson(chapter=chapter, order=position, updated_at=timestamp, **values)
+                    new_lessons.append(lesson)
+                    touched_chapters.add(chapter.pk)
+                    lesson_results.append((lesson, 'created'))
+                    continue
+
+                status = 'unchanged'
+                changed = {field: value for field, value in values.items() if getattr(lesson, field) != value}
+                if lesson.chapter_id != chapter.pk:
+                    changed['chapter_id'] = chapter.pk
+                if changed or lesson.order != position:
+                    # Both the old and the new chapter of a moved lesson.
+                    touched_chapters.update({lesson.chapter_id, chapter.pk})
+                if changed:
+                    for field, value in changed.items():
+                        setattr(lesson, field, value)
+                    lesson.updated_at = timestamp
+                    changed_lessons.append(lesson)
+                    status = 'moved' if 'chapter_id' in changed else 'updated'
+                if lesson.order != position:
+                    lesson_orders[lesson.pk] = position
+                    status = 'reordered' if status == 'unchanged' else status
+                lesson_results.append((lesson, status))
+
+        Lesson.objects.bulk_create(new_lessons)
+        Lesson.objects.bulk_update(changed_lessons, LESSON_FIELDS + ['chapter', 'updated_at'])
+        reorder(Lesson, lesson_orders, timestamp)
+        results.extend({'type': 'lesson', 'id': lesson.pk, 'status': status} for lesson, status in lesson_results)
+
+        if outline['delete_missing']:
+            dropped_lessons = [pk for pk in lessons if pk not in kept_lessons]
+            dropped_chapters = [pk for pk in chapters if pk not in kept_chapters]
+            touched_chapters.update(lessons[pk].chapter_id for pk in dropped_lessons)
+            # Queryset deletes go through the collector, so keys, uploads and
+            # cascades are handled as for single deletes, in one query per
+            # related table. The per-row receivers are muted; the block below
+            # does their work once.
+            with muted_catalog_signals():
+                Lesson.objects.filter(pk__in=dropped_lessons).delete()
+                Chapter.objects.filter(pk__in=dropped_chapters).delete()
+            results.extend({'type': 'lesson', 'id': pk, 'status': 'deleted'} for pk in dropped_lessons)
+            results.extend({'type': 'chapter', 'id': pk, 'status': 'deleted'} for pk in dropped_chapters)
+
+        if any(result['status'] != 'unchanged' for result in results):
+            # Bulk writes send no signals, so do what the signal receivers would.
+            Chapter.objects.filter(pk__in=touched_chapters).update(updated_at=timestamp)
+            Course.objects.filter(pk=course.pk).update(updated_at=timestamp)
+            bump_catalog_version()
+            schedule_outline_rebuild(course.pk)
+    return results
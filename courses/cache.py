@@ -0,0 +1,149 @@
+import hashlib
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from root.timing import record_cache
+
+from .models import Lesson, UserLessonKey
+from .serializers import encode_partial_key
+
+VERSION_KEY = 'catalog:version'
+
+_stats = {'hit': 0, 'miss': 0}
+_stats_lock = threading.Lock()
+
+
+def catalog_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def record(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+    record_cache(outcome)
+
+
+def cache_stats():
+    """Hit/miss counters for this worker process."""
+    with _stats_lock:
+        hits, misses = _stats['hit'], _stats['miss']
+    total = hits + misses
+    return {
+        'pid': os.getpid(),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+        'version': catalog_version(),
+    }
+
+
+def catalog_version():
+    # Seeded from the clock rather than 1: if the key is evicted, the new
+    # version must not make entries written under an older one reachable again.
+    version = catalog_cache().get(VERSION_KEY)
+    if version is None:
+        catalog_cache().add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = catalog_cache().get(VERSION_KEY, 0)
+    return version
+
+
+def increment_version():
+    cache = catalog_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def bump_catalog_version(**kwargs):
+    """
+    Signal receiver: every catalog entry written under the old version is now
+    unreachable. Bumped again once the write commits, so a request that
+    rebuilt an entry from the old rows in between cannot keep it cached.
+    """
+    increment_version()
+    transaction.on_commit(increment_version)
+
+
+def catalog_key(request, view_name, action, kwargs, version=None):
+    params = '&'.join(f"{key}={value}" for key, value in sorted(request.query_params.items()))
+    raw = f"{request.get_host()}|{view_name}|{action}|{sorted(kwargs.items())}|{params}"
+    return f"catalog:{version or catalog_version()}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+def lesson_payloads(data):
+    """Yield every serialized lesson (any dict carrying partial_decryption_key) in a payload."""
+    if isinstance(data, dict):
+        if 'partial_decryption_key' in data and 'id' in data:
+            yield data
+        for value in data.values():
+            yield from lesson_payloads(value)
+    elif isinstance(data, list):
+        for item in data:
+            yield from lesson_payloads(item)
+
+
+def merge_user_fields(data, user):
+    """Fill the per-user partial keys into a cached, user-independent payload."""
+    if not user or user.is_anonymous:
+        return data
+    lessons = list(lesson_payloads(data))
+    if not lessons:
+        return data
+    keys = UserLessonKey.objects.issue_for(user, [Lesson(id=lesson['id']) for lesson in lessons])
+    for lesson in lessons:
+        lesson['partial_decryption_key'] = encode_partial_key(keys[lesson['id']])
+    return data
+
+
+class CatalogCacheMixin:
+    """
+    Read-through cache for list/retrieve on catalog viewsets. The payload is
+    built without per-user fields, stored under the current catalog version and
+    completed with the caller's lesson keys on the way out. Model signals bump
+    the version whenever a Category, Course, Chapter or Lesson changes.
+    """
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if getattr(self, 'building_cache_entry', False):
+            context['omit_user_fields'] = True
+        return context
+
+    def cached_response(self, request, build, **kwargs):
+        if not settings.CATALOG_CACHE_ENABLED:
+            return build()
+
+        # ConditionalGetMixin pins the version its ETag was computed from.
+        key = catalog_key(request, self.basename, self.action, kwargs, getattr(self, 'catalog_version', None))
+        data = catalog_cache().get(key)
+        outcome = 'hit' if data is not None else 'miss'
+        record(outcome)
+        if data is None:
+            self.building_cache_entry = True
+            try:
+                response = build()
+            finally:
+                self.building_cache_entry = False
+            if response.status_code != 200:
+                return response
+            data = response.data
+            catalog_cache().set(key, data, timeout=settings.CATALOG_CACHE_TIMEOUT)
+
+        response = Response(merge_user_fields(data, request.user))
+        response['X-Catalog-Cache'] = outcome
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CatalogCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, lambda: super(CatalogCacheMixin, self).retrieve(request, *args, **kwargs), **kwargs
+        )
@@ -0,0 +1,75 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .cache import catalog_version
+
+
+class ConditionalGetMixin:
+    """
+    Strong ETag validators for list and retrieve, plus Last-Modified for
+    retrieve, computed from one aggregate query (row count + newest
+    ``updated_at``) instead of the serialized payload. Matching If-None-Match /
+    If-Modified-Since requests get a 304 before any serialization or cache
+    lookup happens.
+
+    Chapter and lesson changes bubble up to ``updated_at`` on their chapter and
+    course, and category changes to their courses (see signals.py), so a course
+    validator covers its whole tree. With the catalog cache on, the ETag also
+    covers the catalog version, which CatalogCacheMixin then reads the body
+    under, so a cached body is never sent with a validator it did not come from.
+    """
+    modified_field = 'updated_at'
+
+    def get_validators(self, request, kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        if self.action == 'retrieve':
+            queryset = queryset.filter(pk=kwargs[self.lookup_url_kwarg or self.lookup_field])
+        summary = queryset.aggregate(count=Count('pk'), last_modified=Max(self.modified_field))
+        if self.action == 'retrieve' and not summary['count']:
+            return None, None
+
+        last_modified = summary['last_modified']
+        # Lesson payloads carry per-user partial keys, so the user is part of
+        # the representation.
+        user_id = request.user.pk if request.user.is_authenticated else 'anon'
+        params = '&'.join(f"{key}={value}" for key, value in sorted(request.query_params.items()))
+        if settings.CATALOG_CACHE_ENABLED:
+            self.catalog_version = catalog_version()
+        raw = (
+            f"{self.basename}|{self.action}|{sorted(kwargs.items())}|{params}|{user_id}|"
+            f"{summary['count']}|{last_modified.isoformat() if last_modified else ''}|"
+            f"{getattr(self, 'catalog_version', '')}"
+        )
+        etag = quote_etag(hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32])
+        if self.action != 'retrieve' or last_modified is None:
+            # Deleting a row leaves the newest updated_at of the rest as it
+            # was, so a list has no honest Last-Modified; its ETag covers the
+            # row count.
+            return etag, None
+        return etag, last_modified.timestamp()
+
+    def conditional_response(self, request, build, **kwargs):
+        etag, last_modified = self.get_validators(request, kwargs)
+        if etag is None:
+            return build()
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        response = not_modified or build()
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs), **kwargs
+        )
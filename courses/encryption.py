@@ -0,0 +1,184 @@
+import hashlib
+import io
+import os
+import shutil
+
+from Crypto.Cipher import AES
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Every encrypted file starts with MAGIC + an 8-byte CTR nonce. The header is
+# one AES block, so plaintext offset N lives at ciphertext offset N + 16.
+MAGIC = b'LMSENC01'
+NONCE_SIZE = 8
+HEADER_SIZE = len(MAGIC) + NONCE_SIZE
+BLOCK_SIZE = AES.block_size
+
+
+def media_key():
+    return hashlib.sha256(settings.AES_SECRET.encode('utf-8')).digest()
+
+
+def ctr_cipher(key, nonce, offset):
+    """Return a CTR cipher positioned at plaintext ``offset``."""
+    cipher = AES.new(key, AES.MODE_CTR, nonce=nonce, initial_value=offset // BLOCK_SIZE)
+    skip = offset % BLOCK_SIZE
+    if skip:
+        cipher.encrypt(bytes(skip))
+    return cipher
+
+
+class EncryptingReader(io.RawIOBase):
+    """Read-only view of ``source`` that yields the header and then ciphertext, chunk by chunk."""
+
+    def __init__(self, source, key, nonce=None):
+        self.source = source
+        nonce = nonce or os.urandom(NONCE_SIZE)
+        self.cipher = ctr_cipher(key, nonce, 0)
+        self.pending = MAGIC + nonce
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = settings.MEDIA_ENCRYPTION_CHUNK_SIZE
+        out = self.pending[:size]
+        self.pending = self.pending[size:]
+        if len(out) < size:
+            chunk = self.source.read(size - len(out))
+            if chunk:
+                out += self.cipher.encrypt(chunk)
+        return out
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class DecryptingReader(io.RawIOBase):
+    """
+    Seekable plaintext view over an encrypted file. Seeking re-derives the CTR
+    counter for the target block, so a Range request starting deep inside a
+    video never decrypts the bytes before it.
+    """
+
+    def __init__(self, source, key, size):
+        self.source = source
+        self.key = key
+        self.size = size
+        self.source.seek(0)
+        header = self.source.read(HEADER_SIZE)
+        if header[:len(MAGIC)] != MAGIC:
+            raise ValueError("File is not encrypted with the lesson media key format.")
+        self.nonce = header[len(MAGIC):]
+        self.position = 0
+        self.cipher = ctr_cipher(key, self.nonce, 0)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(offset, 0)
+        self.source.seek(HEADER_SIZE + self.position)
+        self.cipher = ctr_cipher(self.key, self.nonce, self.position)
+        return self.position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.position
+        chunk = self.source.read(size)
+        self.position += len(chunk)
+        # CTR decryption is the same keystream XOR; pycryptodome only allows
+        # one direction per cipher object and ctr_cipher() already used encrypt.
+        return self.cipher.encrypt(chunk) if chunk else b''
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self.source.close()
+        super().close()
+
+
+class EncryptedFile(File):
+    """A decrypted view of a stored file that reopens through the storage, never the raw path."""
+
+    def __init__(self, storage, name):
+        self.storage = storage
+        super().__init__(storage.decrypting_reader(name), name)
+
+    @property
+    def size(self):
+        return self.file.size
+
+    def open(self, mode=None):
+        if not self.closed:
+            self.seek(0)
+        else:
+            self.file = self.storage.decrypting_reader(self.name)
+        return self
+
+
+class EncryptedStorageMixin:
+    """
+    Encrypt files with AES-256-CTR as they are written and decrypt them as they
+    are read. Data moves through fixed-size chunks in both directions, so the
+    whole file is never held in memory. Files without the MAGIC header were
+    stored before encryption was switched on and are read as they are, until
+    encrypt_existing_lesson_media rewrites them.
+    """
+    # Offloading to nginx/sendfile would hand out ciphertext.
+    encrypted_at_rest = True
+
+    def _save(self, name, content):
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        reader = EncryptingReader(content, media_key())
+        return super()._save(name, File(reader, name))
+
+    def is_encrypted(self, name):
+        with super()._open(name, 'rb') as source:
+            return source.read(len(MAGIC)) == MAGIC
+
+    def decrypting_reader(self, name):
+        source = super()._open(name, 'rb')
+        if source.read(len(MAGIC)) != MAGIC:
+            source.seek(0)
+            return source
+        return DecryptingReader(source, media_key(), super().size(name) - HEADER_SIZE)
+
+    def _open(self, name, mode='rb'):
+        if 'w' in mode or 'a' in mode or '+' in mode:
+            raise ValueError("Encrypted lesson media is read-only once stored.")
+        return EncryptedFile(self, name)
+
+    def size(self, name):
+        size = super().size(name)
+        return size - HEADER_SIZE if self.is_encrypted(name) else size
+
+
+@deconstructible
+class EncryptedFileSystemStorage(EncryptedStorageMixin, FileSystemStorage):
+    def encrypt_in_place(self, name):
+        """Encrypt a plaintext file under its own name; readers never see a partial file."""
+        path = self.path(name)
+        staging = f"{path}.encrypting"
+        with open(path, 'rb') as source, open(staging, 'wb') as target:
+            shutil.copyfileobj(EncryptingReader(source, media_key()), target, settings.MEDIA_ENCRYPTION_CHUNK_SIZE)
+        os.replace(staging, path)
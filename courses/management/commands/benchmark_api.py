@@ -0,0 +1,266 @@
+import http.client
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from accounts.authentication import UserClaimsRefreshToken
+from accounts.models import KYC, CustomUser
+from courses.models import Course, UserLessonKey
+from courses.serializers import derive_lesson_key, encode_partial_key
+from courses.management.commands.generate_synthetic_data import PASSWORD, user_email
+
+SCENARIOS = ('login', 'course-list', 'course-detail', 'lesson-watch', 'key-patch', 'kyc-download')
+
+# Distinct users the authenticated scenarios rotate through.
+USER_POOL = 50
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(int(len(sorted_values) * pct / 100), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+    }
+
+
+class Dataset:
+    """Users, tokens and object ids from a generate_synthetic_data dataset."""
+
+    def __init__(self, prefix, rng):
+        emails = [user_email(prefix, n) for n in range(USER_POOL)]
+        self.users = list(CustomUser.objects.filter(email__in=emails).order_by('id'))
+        if not self.users:
+            raise CommandError(f"No {prefix!r} dataset; run generate_synthetic_data first.")
+        # Tokens carry the user claims, so every JWT_AUTH_MODE accepts them.
+        self.tokens = {user.pk: str(UserClaimsRefreshToken.for_user(user).access_token) for user in self.users}
+        self.keys = {
+            user.pk: list(UserLessonKey.objects.filter(user=user).select_related('lesson')[:20])
+            for user in self.users
+        }
+        self.kyc = dict(KYC.objects.filter(user__in=self.users).values_list('user_id', 'pk'))
+        self.course_ids = list(
+            Course.objects.filter(category__name__startswith=f"{prefix} ").values_list('pk', flat=True)[:500]
+        )
+        self.rng = rng
+
+    def user(self, needs_kyc=False):
+        users = [user for user in self.users if user.pk in self.kyc] if needs_kyc else self.users
+        return self.rng.choice(users)
+
+    def request(self, scenario):
+        """(method, path, JSON body or None, user or None) for one request of ``scenario``."""
+        if scenario == 'login':
+            user = self.user()
+            return 'POST', reverse('login'), {'email': user.email, 'password': PASSWORD}, None
+        if scenario == 'course-list':
+            return 'GET', reverse('course-list'), None, self.user()
+        if scenario == 'course-detail':
+            return 'GET', reverse('course-detail', args=[self.rng.choice(self.course_ids)]), None, self.user()
+        if scenario == 'lesson-watch':
+            user = self.user()
+            lesson = self.rng.choice(self.keys[user.pk]).lesson
+            query = urlencode({'partial_decryption_key': encode_partial_key(derive_lesson_key(user, lesson))})
+            return 'GET', f"{reverse('lesson-detail', args=[lesson.pk])}?{query}", None, user
+        if scenario == 'key-patch':
+            user = self.user()
+            key = self.rng.choice(self.keys[user.pk])
+            body = {'partial_decryption_key': encode_partial_key(derive_lesson_key(user, key.lesson))}
+            return 'PATCH', reverse('lesson-partial-key', args=[key.lesson_id]), body, user
+        if scenario == 'kyc-download':
+            user = self.user(needs_kyc=True)
+            return 'GET', reverse('kyc-download', args=[self.kyc[user.pk]]), None, user
+        raise CommandError(f"Unknown scenario {scenario!r}")
+
+    def headers(self, user):
+        return {'Authorization': f"Bearer {self.tokens[user.pk]}"} if user else {}
+
+
+class InProcessTransport:
+    """Django's test client: the full middleware and view stack, no network or server."""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def send(self, method, path, body, headers):
+        # Clients keep cookies and are not thread-safe; one per --concurrency thread.
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client(raise_request_exception=False)
+        response = client.generic(
+            method, path, json.dumps(body) if body is not None else '', content_type='application/json',
+            headers=headers,
+        )
+        if response.streaming:
+            # The client closes the response once the stream is exhausted.
+            for _ in response.streaming_content:
+                pass
+        return response.status_code
+
+
+class HTTPTransport:
+    """A running server (gunicorn, uvicorn, a staging host) over keep-alive connections."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', 'https'):
+            raise CommandError(f"Unsupported --base-url scheme {parts.scheme!r}")
+        self.https = parts.scheme == 'https'
+        self.host, self.port = parts.hostname, parts.port or (443 if self.https else 80)
+        self.local = threading.local()
+
+    def send(self, method, path, body, headers):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            connection = self.local.connection = connection_class(self.host, self.port, timeout=60)
+        headers = dict(headers, **{'Content-Type': 'application/json'})
+        try:
+            connection.request(method, path, json.dumps(body) if body is not None else None, headers=headers)
+            response = connection.getresponse()
+            while response.read(256 * 1024):
+                pass
+            return response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self.local.connection = None
+            return 599
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure throughput and p50/p95/p99 latency of the main API paths against "
+        "a generate_synthetic_data dataset and write the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+        parser.add_argument('--requests', type=int, default=200, help="Measured requests per scenario.")
+        parser.add_argument('--warmup', type=int, default=20, help="Unmeasured requests per scenario.")
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--base-url', help="Benchmark a running server instead of the in-process stack.")
+        parser.add_argument('--prefix', default='synthetic', help="Dataset prefix given to generate_synthetic_data.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+        parser.add_argument('--compare', help="Earlier --output file to print p95 and throughput changes against.")
+
+    def handle(self, *args, **options):
+        scenarios = options['scenarios'].split(',')
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        dataset = Dataset(options['prefix'], random.Random(options['seed']))
+        if options['base_url']:
+            transport = HTTPTransport(options['base_url'])
+        else:
+            transport = InProcessTransport()
+        hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        with override_settings(ALLOWED_HOSTS=hosts, REQUEST_TIMING_LOG=False):
+            results = [
+                dict(scenario=scenario, **self.run(scenario, dataset, transport, options))
+                for scenario in scenarios
+            ]
+
+        report = {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'revision': git_revision(),
+                'target': options['base_url'] or 'in-process',
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'db_connection_mode': settings.DB_CONNECTION_MODE,
+                'password_hasher': settings.PASSWORD_HASHER,
+                'jwt_auth_mode': settings.JWT_AUTH_MODE,
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+
+        self.stdout.write(
+            f"{'scenario':<14} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['scenario']:<14} {row['rps']!s:>8} {row['p50_ms']!s:>8} {row['p95_ms']!s:>8} "
+                f"{row['p99_ms']!s:>8} {row['errors']:>7}"
+            )
+        if options['compare']:
+            self.compare(results, options['compare'])
+
+    def run(self, scenario, dataset, transport, options):
+        # Build every request up front so argument generation is not timed.
+        planned = [dataset.request(scenario) for _ in range(options['warmup'] + options['requests'])]
+        for method, path, body, user in planned[:options['warmup']]:
+            transport.send(method, path, body, dataset.headers(user))
+
+        latencies, errors = [], [0]
+        lock = threading.Lock()
+
+        def send(request):
+            method, path, body, user = request
+            started = time.perf_counter()
+            status = transport.send(method, path, body, dataset.headers(user))
+            elapsed = time.perf_counter() - started
+            with lock:
+                if status >= 400:
+                    errors[0] += 1
+                latencies.append(elapsed)
+
+        started = time.perf_counter()
+        if options['concurrency'] > 1:
+            with ThreadPoolExecutor(options['concurrency']) as pool:
+                list(pool.map(send, planned[options['warmup']:]))
+        else:
+            for request in planned[options['warmup']:]:
+                send(request)
+        return summarize(latencies, errors[0], time.perf_counter() - started)
+
+    def compare(self, results, path):
+        with open(path) as handle:
+            baseline = {row['scenario']: row for row in json.load(handle)['results']}
+        self.stdout.write(f"\nChange against {path}:")
+        for row in results:
+            before = baseline.get(row['scenario'])
+            if not before or not before['p95_ms'] or not before['rps']:
+                continue
+            p95 = 100 * (row['p95_ms'] - before['p95_ms']) / before['p95_ms']
+            rps = 100 * (row['rps'] - before['rps']) / before['rps']
+            self.stdout.write(f"{row['scenario']:<14} p95 {p95:+.1f}%  req/s {rps:+.1f}%")
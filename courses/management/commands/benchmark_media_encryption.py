@@ -0,0 +1,60 @@
+import io
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from courses.encryption import HEADER_SIZE, DecryptingReader, EncryptingReader, media_key
+
+
+class Command(BaseCommand):
+    help = "Measure AES-CTR media encryption and decryption throughput (MB/s) per chunk size."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=64, help="Payload size in MB.")
+        parser.add_argument(
+            '--chunk-sizes', default='16384,65536,262144,1048576,4194304',
+            help="Comma-separated chunk sizes in bytes.",
+        )
+        parser.add_argument('--seeks', type=int, default=200, help="Random seeks for the range-read test.")
+
+    def handle(self, *args, **options):
+        key = media_key()
+        size = options['size_mb'] * 1024 * 1024
+        payload = os.urandom(size)
+
+        self.stdout.write(f"{'chunk':>10} {'encrypt MB/s':>14} {'decrypt MB/s':>14} {'seek+64KB ms':>14}")
+        for chunk_size in [int(value) for value in options['chunk_sizes'].split(',')]:
+            encrypted = io.BytesIO()
+            reader = EncryptingReader(io.BytesIO(payload), key)
+            started = time.perf_counter()
+            while True:
+                chunk = reader.read(chunk_size)
+                if not chunk:
+                    break
+                encrypted.write(chunk)
+            encrypt_seconds = time.perf_counter() - started
+
+            decrypted = 0
+            reader = DecryptingReader(encrypted, key, encrypted.tell() - HEADER_SIZE)
+            started = time.perf_counter()
+            while True:
+                chunk = reader.read(chunk_size)
+                if not chunk:
+                    break
+                decrypted += len(chunk)
+            decrypt_seconds = time.perf_counter() - started
+            assert decrypted == size
+
+            offsets = [int.from_bytes(os.urandom(4), 'big') % size for _ in range(options['seeks'])]
+            started = time.perf_counter()
+            for offset in offsets:
+                reader.seek(offset)
+                reader.read(65536)
+            seek_ms = (time.perf_counter() - started) * 1000 / max(len(offsets), 1)
+
+            megabytes = size / (1024 * 1024)
+            self.stdout.write(
+                f"{chunk_size:>10} {megabytes / encrypt_seconds:>14.1f} "
+                f"{megabytes / decrypt_seconds:>14.1f} {seek_ms:>14.3f}"
+            )
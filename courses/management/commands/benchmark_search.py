@@ -0,0 +1,150 @@
+import io
+import itertools
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from courses.models import Category, Course, Chapter, Lesson
+from courses.search import lesson_results, prefix_query, search_catalog
+
+CHAPTERS_PER_COURSE = 5
+LESSONS_PER_CHAPTER = 4
+
+VOCABULARY_SIZE = 20_000
+SYLLABLES = [c + v for c in "bcdfghklmnprstvz" for v in "aeiou"]
+
+
+def vocabulary(rng):
+    """Pseudo-words with a Zipf-like frequency, so a few words are everywhere and most are rare."""
+    words = sorted({''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(VOCABULARY_SIZE)})
+    rng.shuffle(words)
+    # Cumulative weights, so each draw is a bisect instead of a pass over the vocabulary.
+    return words, list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+
+
+def sentence(rng, vocab, words):
+    return ' '.join(rng.choices(vocab[0], cum_weights=vocab[1], k=words))
+
+
+def seed(rows, batch_size, rng, vocab, stdout):
+    """Insert ``rows`` lessons with random vocabulary titles and bodies, plus their courses."""
+    categories = Category.objects.bulk_create(
+        [Category(name=f"{word.title()} {time.time_ns()}") for word in vocab[0][:10]]
+    )
+    course_count = max(rows // (CHAPTERS_PER_COURSE * LESSONS_PER_CHAPTER), 1)
+    courses = Course.objects.bulk_create(
+        [
+            Course(title=sentence(rng, vocab, 3).title(), description=sentence(rng, vocab, 30),
+                   category=rng.choice(categories), is_published=True)
+            for _ in range(course_count)
+        ],
+        batch_size=batch_size,
+    )
+    chapters = Chapter.objects.bulk_create(
+        [Chapter(course=course, title=f"Chapter {n}", order=n) for course in courses for n in range(CHAPTERS_PER_COURSE)],
+        batch_size=batch_size,
+    )
+    stdout.write(f"  {len(courses)} courses, {len(chapters)} chapters")
+
+    lesson_count = 0
+    for start in range(0, len(chapters), batch_size):
+        lesson_count += len(Lesson.objects.bulk_create(
+            [
+                Lesson(chapter=chapter, title=sentence(rng, vocab, 4).title(), content=sentence(rng, vocab, 60),
+                       content_type='text', order=n)
+                for chapter in chapters[start:start + batch_size] for n in range(LESSONS_PER_CHAPTER)
+            ],
+            batch_size=batch_size,
+        ))
+    stdout.write(f"  {lesson_count} lessons")
+
+    with connection.cursor() as cursor:
+        for model in (Category, Course, Chapter, Lesson):
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+            # New GIN entries wait in an unsorted pending list that every search
+            # reads through until (auto)vacuum merges it; merge it now, so the
+            # searches see the index a live catalog has.
+            cursor.execute(
+                "SELECT gin_clean_pending_list(i.indexrelid) FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid JOIN pg_am a ON a.oid = c.relam "
+                "WHERE a.amname = 'gin' AND i.indrelid = %s::regclass",
+                [model._meta.db_table],
+            )
+
+
+def random_query(rng, vocab):
+    """One or two words, the last one cut short as if the user were still typing."""
+    words = rng.choices(vocab[0], cum_weights=vocab[1], k=rng.choice((1, 2)))
+    words[-1] = words[-1][:rng.randint(3, len(words[-1]))]
+    return ' '.join(words)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a large synthetic catalog into Postgres, run random prefix "
+        "searches through the catalog search and fail if p95 latency is over budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help="Lessons to insert.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--limit', type=int, default=20, help="Results per kind, as the API's ?limit=.")
+        parser.add_argument('--budget-ms', type=float, default=20.0, help="Fail if p95 exceeds this.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed for data and queries.")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("benchmark_search needs PostgreSQL; the search backend is Postgres-only.")
+
+        rng = random.Random(options['seed'])
+        try:
+            with transaction.atomic():
+                # Keep --json output parseable.
+                progress = io.StringIO() if options['json'] else self.stdout
+                progress.write(f"Seeding {options['rows']} lessons...")
+                vocab = vocabulary(rng)
+                seed(options['rows'], options['batch_size'], rng, vocab, progress)
+
+                queries = [random_query(rng, vocab) for _ in range(options['queries'])]
+                # Warm the buffer cache so the first queries do not dominate p95.
+                for text in queries[:20]:
+                    search_catalog(text, options['limit'])
+                latencies = []
+                for text in queries:
+                    started = time.perf_counter()
+                    search_catalog(text, options['limit'])
+                    latencies.append((time.perf_counter() - started) * 1000)
+                plan = lesson_results(prefix_query(queries[0]))[:options['limit']].explain(analyze=True)
+                raise Rollback
+        except Rollback:
+            pass
+
+        latencies.sort()
+        count = len(latencies)
+        result = {
+            'rows': options['rows'],
+            'queries': count,
+            'p50_ms': round(latencies[count // 2], 2),
+            'p95_ms': round(latencies[int(count * 0.95)], 2),
+            'max_ms': round(latencies[-1], 2),
+            'budget_ms': options['budget_ms'],
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(dict(result, plan=plan), indent=2))
+        else:
+            self.stdout.write(f"== lesson search plan for {queries[0]!r}\n{plan}\n")
+            self.stdout.write(
+                f"{count} searches: p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, max {result['max_ms']} ms"
+            )
+        if result['p95_ms'] > options['budget_ms']:
+            raise CommandError(f"p95 {result['p95_ms']} ms is over the {options['budget_ms']} ms budget")
+
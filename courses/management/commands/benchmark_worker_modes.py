@@ -0,0 +1,136 @@
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def wait_for_port(host, port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def run_load(host, port, path, headers, concurrency, duration):
+    """Hammer one path from ``concurrency`` keep-alive clients for ``duration`` seconds."""
+    latencies, errors, received = [], [0], [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        connection = http.client.HTTPConnection(host, port, timeout=60)
+        local, local_errors, local_bytes = [], 0, 0
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                while chunk := response.read(256 * 1024):
+                    local_bytes += len(chunk)
+                if response.status >= 400:
+                    local_errors += 1
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=60)
+                continue
+            local.append(time.perf_counter() - started)
+        connection.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+            received[0] += local_bytes
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+
+    latencies.sort()
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors[0],
+        'rps': round(count / duration, 1),
+        'mb_per_s': round(received[0] / duration / (1024 * 1024), 2),
+        'p50_ms': round(latencies[count // 2] * 1000, 1) if count else None,
+        'p95_ms': round(latencies[int(count * 0.95)] * 1000, 1) if count else None,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 1) if count else None,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Start gunicorn in each worker mode from gunicorn.conf.py and compare "
+        "throughput and latency on the given endpoints."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default='sync,gthread,uvicorn')
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help="Endpoint to load (repeatable), e.g. a lesson stream URL. Defaults to the course list.",
+        )
+        parser.add_argument('--token', help="JWT access token sent as a Bearer header.")
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--duration', type=float, default=15.0, help="Seconds per mode and path.")
+        parser.add_argument('--port', type=int, default=8099)
+        parser.add_argument('--workers', type=int, help="Override GUNICORN_WORKERS for every mode.")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        host, port = '127.0.0.1', options['port']
+        paths = options['paths'] or ['/api/course/courses/']
+        headers = {'Host': 'localhost'}
+        if options['token']:
+            headers['Authorization'] = f"Bearer {options['token']}"
+
+        results = []
+        for mode in options['modes'].split(','):
+            env = dict(
+                os.environ,
+                GUNICORN_WORKER_MODE=mode,
+                GUNICORN_BIND=f"{host}:{port}",
+                GUNICORN_ACCESS_LOG='',
+                GUNICORN_LOG_LEVEL='warning',
+            )
+            if options['workers']:
+                env['GUNICORN_WORKERS'] = str(options['workers'])
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'], cwd=settings.BASE_DIR, env=env,
+            )
+            try:
+                if not wait_for_port(host, port, timeout=30):
+                    raise CommandError(f"gunicorn did not start in {mode} mode")
+                for path in paths:
+                    # Warm up imports, connections and caches before measuring.
+                    run_load(host, port, path, headers, options['concurrency'], 1)
+                    result = run_load(host, port, path, headers, options['concurrency'], options['duration'])
+                    results.append({'mode': mode, 'path': path, **result})
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(
+            f"{'mode':<8} {'path':<45} {'req/s':>8} {'MB/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['mode']:<8} {row['path'][:45]:<45} {row['rps']:>8} {row['mb_per_s']:>8} "
+                f"{row['p50_ms']!s:>8} {row['p95_ms']!s:>8} {row['errors']:>7}"
+            )
@@ -0,0 +1,39 @@
+import posixpath
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.storage import lesson_media_storage
+
+
+def walk(storage, directory=''):
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for child in directories:
+        yield from walk(storage, posixpath.join(directory, child))
+
+
+class Command(BaseCommand):
+    help = (
+        "Encrypt lesson media stored before LESSON_MEDIA_STORAGE=encrypted was switched on. "
+        "Files keep their names and already encrypted files are skipped, so it can be re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only list the files that would be encrypted.")
+
+    def handle(self, *args, **options):
+        storage = lesson_media_storage()
+        if not hasattr(storage, 'encrypt_in_place'):
+            raise CommandError("LESSON_MEDIA_STORAGE is not 'encrypted'.")
+
+        encrypted = 0
+        for name in walk(storage):
+            if name.endswith('.encrypting') or storage.is_encrypted(name):
+                continue
+            self.stdout.write(name)
+            if not options['dry_run']:
+                storage.encrypt_in_place(name)
+            encrypted += 1
+        verb = "Would encrypt" if options['dry_run'] else "Encrypted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {encrypted} files."))
@@ -0,0 +1,161 @@
+import re
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from courses.models import Category, Course, Chapter, Lesson, UserLessonKey
+
+User = get_user_model()
+
+CHAPTERS_PER_COURSE = 5
+LESSONS_PER_CHAPTER = 4
+
+
+def hot_path_queries(course_id, chapter_ids, user_id, lesson_ids):
+    """
+    The queries behind the main endpoints, as (name, table, index, queryset).
+    Each one must be answered from ``index`` (a regex over index names) on
+    ``table`` rather than a sequential scan or some other index.
+    """
+    return [
+        ('course catalog', Course._meta.db_table, 'course_catalog_idx',
+         Course.objects.select_related('category', 'outline').order_by('-created_at', '-id')[:20]),
+        ('published catalog', Course._meta.db_table, 'course_published_idx',
+         Course.objects.filter(is_published=True).order_by('-created_at', '-id')[:20]),
+        ('chapter tree', Chapter._meta.db_table, 'chapter_tree_idx',
+         Chapter.objects.filter(course_id=course_id).order_by('order', 'id')),
+        ('lesson tree', Lesson._meta.db_table, 'lesson_tree_idx',
+         Lesson.objects.filter(chapter_id__in=chapter_ids).order_by('order', 'id')),
+        ('pending KYC users', User._meta.db_table, 'user_pending_kyc_idx',
+         User.objects.filter(kyc_verified=False).order_by('id')[:20]),
+        ('user lesson keys', UserLessonKey._meta.db_table, r'courses_userlessonkey_user_id_lesson_id_\w+_uniq',
+         UserLessonKey.objects.filter(user_id=user_id, lesson_id__in=lesson_ids)),
+        ('transcode queue', Lesson._meta.db_table, 'lesson_transcode_queue_idx',
+         Lesson.objects.filter(transcode_status='queued').order_by('id')[:1]),
+    ]
+
+
+def sequential_scans(plan, table):
+    return re.findall(rf'Seq Scan on {re.escape(table)}\b', plan)
+
+
+def uses_index(plan, index):
+    return re.search(rf'Index (Only )?Scan (Backward )?(using|on) {index}\b', plan) is not None
+
+
+def seed(rows, batch_size, stdout):
+    """Insert ``rows`` users, lessons and lesson keys (plus their courses and chapters)."""
+    now = timezone.now()
+    category = Category.objects.create(name=f"explain-{now.timestamp()}")
+
+    users = [
+        User(email=f"explain-{i}@example.com", full_name="Explain", kyc_verified=i % 100 != 0, date_joined=now)
+        for i in range(rows)
+    ]
+    User.objects.bulk_create(users, batch_size=batch_size)
+    stdout.write(f"  {rows} users")
+
+    course_count = max(rows // (CHAPTERS_PER_COURSE * LESSONS_PER_CHAPTER), 1)
+    courses = Course.objects.bulk_create(
+        [
+            Course(title=f"Course {i}", category=category, is_published=i % 10 != 0)
+            for i in range(course_count)
+        ],
+        batch_size=batch_size,
+    )
+    chapters = Chapter.objects.bulk_create(
+        [Chapter(course=course, title=f"Chapter {n}", order=n) for course in courses for n in range(CHAPTERS_PER_COURSE)],
+        batch_size=batch_size,
+    )
+    stdout.write(f"  {len(courses)} courses, {len(chapters)} chapters")
+
+    lessons = []
+    for start in range(0, len(chapters), batch_size):
+        lessons.extend(Lesson.objects.bulk_create(
+            [
+                Lesson(chapter=chapter, title=f"Lesson {n}", content_type='text', order=n,
+                       transcode_status='queued' if chapter.pk % 1000 == 0 else 'none')
+                for chapter in chapters[start:start + batch_size] for n in range(LESSONS_PER_CHAPTER)
+            ],
+            batch_size=batch_size,
+        ))
+    stdout.write(f"  {len(lessons)} lessons")
+
+    # Lesson keys are spread over the first users, a few hundred lessons each.
+    keys_per_user = 200
+    UserLessonKey.objects.bulk_create(
+        [
+            UserLessonKey(user=users[i // keys_per_user], lesson=lessons[i % len(lessons)], encrypted_key=b'\0' * 32)
+            for i in range(rows)
+        ],
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    stdout.write(f"  {rows} lesson keys")
+
+    with connection.cursor() as cursor:
+        for model in (User, Course, Chapter, Lesson, UserLessonKey):
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+
+    course = courses[len(courses) // 2]
+    return (
+        course.pk,
+        [chapter.pk for chapter in chapters if chapter.course_id == course.pk],
+        users[0].pk,
+        [lesson.pk for lesson in lessons[:keys_per_user]],
+    )
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a large synthetic catalog into Postgres, EXPLAIN the hot request "
+        "paths and fail if any of them is not answered from its intended index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000,
+                            help="Users, lessons and lesson keys to insert.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--keep', action='store_true',
+                            help="Commit the seeded rows instead of rolling them back.")
+        parser.add_argument('--analyze', action='store_true', help="Use EXPLAIN ANALYZE and print timings.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("explain_hot_paths needs PostgreSQL; index choice on other backends says nothing.")
+
+        failures = []
+        try:
+            with transaction.atomic():
+                self.stdout.write(f"Seeding {options['rows']} rows...")
+                started = time.perf_counter()
+                ids = seed(options['rows'], options['batch_size'], self.stdout)
+                self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f}s\n")
+
+                for name, table, index, queryset in hot_path_queries(*ids):
+                    plan = queryset.explain(analyze=options['analyze'])
+                    if sequential_scans(plan, table):
+                        status = "SEQ SCAN"
+                    elif not uses_index(plan, index):
+                        status = f"not using {index}"
+                    else:
+                        status = index
+                    self.stdout.write(f"== {name}: {status}\n{plan}\n")
+                    if status != index:
+                        failures.append(f"{name} ({status})")
+
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            pass
+
+        if failures:
+            raise CommandError(f"Hot paths off their index: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All hot paths use their intended index."))
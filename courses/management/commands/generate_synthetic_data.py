@@ -0,0 +1,179 @@
+import random
+import time
+import uuid
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import KYC, CustomUser, kyc_document_storage
+from courses.models import Category, Course, Chapter, Lesson, UserLessonKey
+from courses.outline import rebuild_outlines
+from courses.management.commands.benchmark_search import sentence, vocabulary
+
+# Rows per unit of --scale.
+CATEGORIES = 20
+COURSES = 1000
+CHAPTERS_PER_COURSE = 5
+LESSONS_PER_CHAPTER = 6
+USERS = 10_000
+KEYS_PER_USER = 20
+KYC_SHARE = 0.5
+COURSES_PER_INSTRUCTOR = 10
+OUTLINE_BATCH = 200
+
+# Every synthetic user logs in with this password (benchmark_api uses it).
+PASSWORD = "synthetic-password"
+
+
+def user_email(prefix, number):
+    return f"{prefix}-user-{number}@example.com"
+
+
+def can_copy():
+    if connection.vendor != 'postgresql':
+        return False
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    return is_psycopg3
+
+
+def insert(model, objs, batch_size):
+    """
+    Insert unsaved ``objs`` with COPY on PostgreSQL (psycopg 3) and
+    bulk_create elsewhere. COPY returns no primary keys; callers that need
+    them read the rows back.
+    """
+    if not can_copy():
+        model.objects.bulk_create(objs, batch_size=batch_size)
+        return
+    fields = [f for f in model._meta.concrete_fields if not f.primary_key and not f.generated]
+    columns = ', '.join(connection.ops.quote_name(f.column) for f in fields)
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        with cursor.cursor.copy(f'COPY {table} ({columns}) FROM STDIN') as copy:
+            for obj in objs:
+                copy.write_row([f.get_db_prep_save(f.pre_save(obj, True), connection) for f in fields])
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic LMS dataset (categories, courses, chapters, lessons, "
+        "users, lesson keys and KYC records) for benchmarks. At --scale 1 that is "
+        f"{COURSES} courses, {COURSES * CHAPTERS_PER_COURSE * LESSONS_PER_CHAPTER} lessons, "
+        f"{USERS} users and {USERS * KEYS_PER_USER} lesson keys."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0)
+        parser.add_argument('--prefix', default='synthetic',
+                            help="Namespace for emails and category names, so several datasets can coexist.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--flush', action='store_true', help="Delete an existing dataset with this prefix first.")
+
+    def handle(self, *args, **options):
+        prefix, scale = options['prefix'], options['scale']
+        existing = CustomUser.objects.filter(email__startswith=f"{prefix}-user-")
+        if existing.exists():
+            if not options['flush']:
+                raise CommandError(f"A dataset with prefix {prefix!r} exists; use --flush or another --prefix.")
+            self.flush(prefix)
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            self.generate(prefix, scale, random.Random(options['seed']), options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Generated in {time.perf_counter() - started:.1f}s"))
+
+    def flush(self, prefix):
+        # Courses only SET_NULL their category and author, so delete them explicitly.
+        Course.objects.filter(category__name__startswith=f"{prefix} ").delete()
+        Category.objects.filter(name__startswith=f"{prefix} ").delete()
+        CustomUser.objects.filter(email__startswith=f"{prefix}-user-").delete()
+        self.stdout.write(f"Deleted the existing {prefix!r} dataset")
+
+    def generate(self, prefix, scale, rng, batch_size):
+        now = timezone.now()
+        vocab = vocabulary(rng)
+        user_count = max(int(USERS * scale), 2)
+        course_count = max(int(COURSES * scale), 1)
+
+        # Users: one shared hash, so generating them costs a single hasher run.
+        password = make_password(PASSWORD)
+        instructors = max(course_count // COURSES_PER_INSTRUCTOR, 1)
+        insert(CustomUser, (
+            CustomUser(
+                email=user_email(prefix, n), full_name=sentence(rng, vocab, 2).title(), password=password,
+                role='instructor' if n < instructors else 'student', is_active=True,
+                kyc_verified=rng.random() < 0.9, encryption_key=uuid.uuid4().hex, date_joined=now,
+            )
+            for n in range(user_count)
+        ), batch_size)
+        user_ids = list(
+            CustomUser.objects.filter(email__startswith=f"{prefix}-user-").order_by('id').values_list('id', flat=True)
+        )
+        self.stdout.write(f"  {len(user_ids)} users")
+
+        categories = Category.objects.bulk_create([
+            Category(name=f"{prefix} {word.title()}", description=sentence(rng, vocab, 12))
+            for word in vocab[0][:CATEGORIES]
+        ])
+        courses = Course.objects.bulk_create([
+            Course(
+                title=sentence(rng, vocab, 3).title(), description=sentence(rng, vocab, 40),
+                category=rng.choice(categories), created_by_id=user_ids[n % instructors],
+                is_published=rng.random() < 0.9,
+            )
+            for n in range(course_count)
+        ], batch_size=batch_size)
+        chapters = Chapter.objects.bulk_create([
+            Chapter(course=course, title=sentence(rng, vocab, 3).title(), order=n)
+            for course in courses for n in range(CHAPTERS_PER_COURSE)
+        ], batch_size=batch_size)
+        self.stdout.write(f"  {len(categories)} categories, {len(courses)} courses, {len(chapters)} chapters")
+
+        insert(Lesson, (
+            Lesson(
+                chapter_id=chapter.pk, title=sentence(rng, vocab, 4).title(), content=sentence(rng, vocab, 80),
+                content_type=rng.choice(('video', 'video', 'text', 'document', 'quiz')), order=n,
+            )
+            for chapter in chapters for n in range(LESSONS_PER_CHAPTER)
+        ), batch_size)
+        lesson_ids = list(
+            Lesson.objects.filter(chapter_id__gte=chapters[0].pk, chapter_id__lte=chapters[-1].pk)
+            .order_by('id').values_list('id', flat=True)
+        )
+        self.stdout.write(f"  {len(lesson_ids)} lessons")
+
+        # Outlines are normally rebuilt on commit of each edit; bulk rows need it done here.
+        course_ids = [course.pk for course in courses]
+        for start in range(0, len(course_ids), OUTLINE_BATCH):
+            rebuild_outlines(Course.objects.filter(pk__in=course_ids[start:start + OUTLINE_BATCH]), OUTLINE_BATCH)
+
+        # Each user holds keys for a run of consecutive lessons, as if enrolled in a course or two.
+        keys_per_user = min(KEYS_PER_USER, len(lesson_ids))
+        insert(UserLessonKey, (
+            UserLessonKey(user_id=user_id, lesson_id=lesson_ids[(start + k) % len(lesson_ids)],
+                          encrypted_key=rng.randbytes(32))
+            for user_id, start in ((user_id, rng.randrange(len(lesson_ids))) for user_id in user_ids)
+            for k in range(keys_per_user)
+        ), batch_size)
+        self.stdout.write(f"  {len(user_ids) * keys_per_user} lesson keys")
+
+        # All KYC rows point at one stored document; the download path is what is measured.
+        document = kyc_document_storage().save(
+            f"kyc/{prefix}/document.pdf", ContentFile(b"%PDF-1.4\n" + rng.randbytes(200 * 1024)),
+        )
+        kyc_users = [user_id for n, user_id in enumerate(user_ids) if n == 0 or rng.random() < KYC_SHARE]
+        insert(KYC, (
+            KYC(user_id=user_id, document_type='passport', document_number=f"P{user_id:09d}",
+                document_name="passport.pdf", document_file=document, submitted_at=now)
+            for user_id in kyc_users
+        ), batch_size)
+        self.stdout.write(f"  {len(kyc_users)} KYC records")
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                for model in (CustomUser, Category, Course, Chapter, Lesson, UserLessonKey, KYC):
+                    cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
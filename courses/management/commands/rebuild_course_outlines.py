@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.models import Course
+from courses.outline import build_outline, outline_chapters, rebuild_outlines
+
+
+class Command(BaseCommand):
+    help = "Rebuild precomputed course outlines in bulk, or check them against the live tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', help="Only this course id (repeatable).")
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Compare stored outlines with the live tree instead of rebuilding; exits non-zero on drift.",
+        )
+        parser.add_argument('--fix', action='store_true', help="With --check, rebuild the outlines that drifted.")
+
+    def handle(self, *args, **options):
+        courses = Course.objects.order_by('pk')
+        if options['course']:
+            courses = courses.filter(pk__in=options['course'])
+        batch_size = options['batch_size']
+
+        if not options['check']:
+            rebuilt = 0
+            for start in range(0, courses.count(), batch_size):
+                batch_ids = list(courses.values_list('pk', flat=True)[start:start + batch_size])
+                rebuilt += rebuild_outlines(Course.objects.filter(pk__in=batch_ids), batch_size)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} course outlines."))
+            return
+
+        drifted = []
+        queryset = courses.select_related('outline').prefetch_related(outline_chapters())
+        for course in queryset.iterator(chunk_size=batch_size):
+            # Read the stored row first: building an unsaved outline replaces
+            # the cached reverse relation on ``course``.
+            stored = getattr(course, 'outline', None)
+            expected = build_outline(course)
+            if stored is None:
+                drifted.append((course.pk, "missing"))
+            elif stored.data != expected.data:
+                drifted.append((course.pk, "tree differs"))
+            elif (stored.chapter_count, stored.lesson_count) != (expected.chapter_count, expected.lesson_count):
+                drifted.append((course.pk, "counts differ"))
+
+        for course_id, reason in drifted:
+            self.stdout.write(f"Course {course_id}: {reason}")
+
+        if drifted and options['fix']:
+            rebuild_outlines(Course.objects.filter(pk__in=[course_id for course_id, _ in drifted]), batch_size)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(drifted)} drifted outlines."))
+        elif drifted:
+            raise CommandError(f"{len(drifted)} course outlines are inconsistent.")
+        else:
+            self.stdout.write(self.style.SUCCESS("All course outlines are consistent."))
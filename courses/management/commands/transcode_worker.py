@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from courses.models import Lesson
+from courses.transcoding import claim_next_job, enqueue_transcode, transcode_lesson
+
+
+class Command(BaseCommand):
+    help = "Transcode queued lesson videos into encrypted HLS renditions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the queue and exit.")
+        parser.add_argument(
+            '--enqueue-missing', action='store_true',
+            help="Queue every lesson that has a video but no renditions yet.",
+        )
+
+    def handle(self, *args, **options):
+        if options['enqueue_missing']:
+            lessons = Lesson.objects.exclude(video_file='').exclude(video_file__isnull=True).filter(
+                transcode_status__in=['none', 'failed']
+            )
+            for lesson in lessons.iterator():
+                enqueue_transcode(lesson)
+                self.stdout.write(f"Queued lesson {lesson.id}")
+
+        while True:
+            lesson = claim_next_job()
+            if lesson is None:
+                if options['once']:
+                    return
+                time.sleep(settings.TRANSCODE_POLL_INTERVAL)
+                continue
+
+            self.stdout.write(f"Transcoding lesson {lesson.id}...")
+            lesson = transcode_lesson(lesson)
+            if lesson.transcode_status == 'ready':
+                self.stdout.write(self.style.SUCCESS(f"Lesson {lesson.id}: {lesson.hls_playlist}"))
+            else:
+                self.stderr.write(self.style.ERROR(f"Lesson {lesson.id} failed: {lesson.transcode_error}"))
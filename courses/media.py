@@ -0,0 +1,215 @@
+import mimetypes
+import re
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+
+from root.metrics import MEDIA_BYTES, MEDIA_RESPONSES
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_etag(field_file, size, modified):
+    stamp = int(modified.timestamp()) if modified else 0
+    return quote_etag(f"{field_file.name}-{size}-{stamp}".replace('"', ''))
+
+
+def file_modified_time(field_file):
+    try:
+        return field_file.storage.get_modified_time(field_file.name)
+    except (NotImplementedError, OSError):
+        return None
+
+
+def parse_range(header, size):
+    """
+    Parse a single ``bytes=`` range into an inclusive (start, end) pair.
+    Returns None when the header should be ignored (missing, malformed or
+    multi-range) and raises ValueError when it cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final N bytes. An empty file has none to give.
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+def if_range_matches(header, etag, modified):
+    if not header:
+        return True
+    header = header.strip()
+    if header.startswith('"') or header.startswith('W/'):
+        # If-Range requires a strong comparison.
+        return not header.startswith('W/') and header == etag
+    since = parse_http_date_safe(header)
+    return since is not None and modified is not None and int(modified.timestamp()) <= since
+
+
+def iter_file_range(field_file, start, length, chunk_size):
+    """Yield ``length`` bytes from ``start`` without holding more than one chunk in memory."""
+    with field_file.open('rb') as handle:
+        handle.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = handle.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            MEDIA_BYTES.inc(len(chunk))
+            yield chunk
+
+
+def in_thread(func):
+    """Wrap blocking storage I/O for await; it need not run on the request's thread."""
+    return sync_to_async(func, thread_sensitive=False)
+
+
+async def aiter_file_range(field_file, start, length, chunk_size):
+    """
+    Async version of iter_file_range. Each blocking read runs in the default
+    executor, so a slow client holds no thread between chunks.
+    """
+    handle = await in_thread(field_file.open)('rb')
+    try:
+        await in_thread(handle.seek)(start)
+        remaining = length
+        while remaining > 0:
+            chunk = await in_thread(handle.read)(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            MEDIA_BYTES.inc(len(chunk))
+            yield chunk
+    finally:
+        await in_thread(handle.close)()
+
+
+def is_async_request(request):
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def file_range_iterator(request, field_file, start, length, chunk_size):
+    """Async iterator under ASGI, plain generator under WSGI."""
+    iterate = aiter_file_range if is_async_request(request) else iter_file_range
+    return iterate(field_file, start, length, chunk_size)
+
+
+def ranged_file_response(request, field_file, chunk_size=None):
+    """
+    Stream a stored file, honouring ``Range`` and ``If-Range`` so players can
+    seek. Full downloads answer 200, satisfiable ranges 206 and anything past
+    the end of the file 416.
+    """
+    chunk_size = chunk_size or settings.MEDIA_STREAM_CHUNK_SIZE
+    size = field_file.size
+    modified = file_modified_time(field_file)
+    etag = file_etag(field_file, size, modified)
+    content_type = mimetypes.guess_type(field_file.name)[0] or 'application/octet-stream'
+
+    start, end = 0, size - 1
+    status = 200
+    range_header = request.headers.get('Range')
+    if range_header and if_range_matches(request.headers.get('If-Range'), etag, modified):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{size}"
+            response['Accept-Ranges'] = 'bytes'
+            return response
+        if byte_range:
+            start, end = byte_range
+            status = 206
+
+    length = max(end - start + 1, 0)
+    response = StreamingHttpResponse(
+        file_range_iterator(request, field_file, start, length, chunk_size),
+        status=status,
+        content_type=content_type,
+    )
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    if modified:
+        response['Last-Modified'] = http_date(modified.timestamp())
+    if status == 206:
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+    return response
+
+
+def offloaded_file_response(field_file, backend):
+    """
+    Hand the byte transfer to the front-end server. Django has already done the
+    authorization; nginx (X-Accel-Redirect) or Apache/lighttpd (X-Sendfile)
+    then serve the file with sendfile, including Range requests.
+    """
+    content_type = mimetypes.guess_type(field_file.name)[0] or 'application/octet-stream'
+    response = HttpResponse(content_type=content_type)
+    if backend == 'nginx':
+        prefix = settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/')
+        response['X-Accel-Redirect'] = quote(f"{prefix}/{field_file.name}")
+    elif backend == 'sendfile':
+        response['X-Sendfile'] = field_file.path
+    else:
+        raise ValueError(f"Unknown media delivery backend: {backend!r}")
+    return response
+
+
+def media_response(request, field_file):
+    if getattr(field_file.storage, 'serves_direct_urls', False):
+        # Object storage serves the bytes (and Range) itself via a presigned URL.
+        MEDIA_RESPONSES.labels('presigned').inc()
+        return HttpResponseRedirect(field_file.url)
+    backend = settings.MEDIA_DELIVERY_BACKEND
+    if backend == 'django' or getattr(field_file.storage, 'encrypted_at_rest', False):
+        # Encrypted files have to be decrypted here, so they are never offloaded.
+        MEDIA_RESPONSES.labels('django').inc()
+        return ranged_file_response(request, field_file)
+    MEDIA_RESPONSES.labels(backend).inc()
+    return offloaded_file_response(field_file, backend)
+
+
+def playlist_response(field_file):
+    """
+    Send an HLS playlist from this server even when its storage serves direct
+    URLs: players resolve the relative variant and segment URIs inside it
+    against the playlist's own URL, which for a presigned redirect would be an
+    unsigned object storage path.
+    """
+    with field_file.open('rb') as handle:
+        content = handle.read()
+    MEDIA_RESPONSES.labels('django').inc()
+    MEDIA_BYTES.inc(len(content))
+    response = HttpResponse(content, content_type='application/vnd.apple.mpegurl')
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def attachment_response(request, field_file, filename):
+    """Stream a whole stored file as a download without loading it into memory."""
+    size = field_file.size
+    response = StreamingHttpResponse(
+        file_range_iterator(request, field_file, 0, size, settings.MEDIA_STREAM_CHUNK_SIZE),
+        content_type='application/octet-stream',
+    )
+    response['Content-Length'] = str(size)
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_userlessonkey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userlessonkey',
+            name='partial_decryption_completed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='userlessonkey',
+            name='partial_decryption_key',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='userlessonkey',
+            name='encrypted_key',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:23
+
+import courses.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_userlessonkey_partial_decryption_completed_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lesson',
+            name='document',
+            field=models.FileField(blank=True, null=True, storage=courses.storage.lesson_media_storage, upload_to='lesson_documents/originals/'),
+        ),
+        migrations.AlterField(
+            model_name='lesson',
+            name='video_file',
+            field=models.FileField(blank=True, null=True, storage=courses.storage.lesson_media_storage, upload_to='lesson_videos/originals/'),
+        ),
+    ]
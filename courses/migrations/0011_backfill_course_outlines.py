@@ -0,0 +1,75 @@
+from collections import defaultdict
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 200
+
+
+def outline_data(chapters, lessons):
+    """What ChapterSerializer renders for an outline (no user fields)."""
+    return [
+        {
+            'id': chapter.pk,
+            'course': chapter.course_id,
+            'title': chapter.title,
+            'order': chapter.order,
+            'lessons': [
+                {'id': lesson.pk, 'title': lesson.title, 'partial_decryption_key': None, 'order': lesson.order}
+                for lesson in lessons[chapter.pk]
+            ],
+        }
+        for chapter in chapters
+    ]
+
+
+def backfill_outlines(apps, schema_editor):
+    """
+    Build the outline of every course that has none, so the first reads after
+    0008 do not each rebuild one. Batches commit separately and the backfill
+    resumes where it stopped.
+    """
+    Course = apps.get_model('courses', 'Course')
+    Chapter = apps.get_model('courses', 'Chapter')
+    Lesson = apps.get_model('courses', 'Lesson')
+    CourseOutline = apps.get_model('courses', 'CourseOutline')
+
+    pending = Course.objects.filter(outline__isnull=True).order_by('pk').only('pk', 'updated_at')
+    while True:
+        courses = list(pending[:BATCH_SIZE])
+        if not courses:
+            break
+        chapters, lessons = defaultdict(list), defaultdict(list)
+        for chapter in Chapter.objects.filter(course__in=courses).order_by('order', 'id'):
+            chapters[chapter.course_id].append(chapter)
+        for lesson in (
+            Lesson.objects.filter(chapter__course__in=courses)
+            .only('pk', 'chapter_id', 'title', 'order')
+            .order_by('order', 'id')
+        ):
+            lessons[lesson.chapter_id].append(lesson)
+
+        outlines = []
+        for course in courses:
+            data = outline_data(chapters[course.pk], lessons)
+            outlines.append(CourseOutline(
+                course=course,
+                data=data,
+                chapter_count=len(data),
+                lesson_count=sum(len(chapter['lessons']) for chapter in data),
+                course_updated_at=course.updated_at,
+            ))
+        with transaction.atomic():
+            # A request may have rebuilt some outline meanwhile; its copy wins.
+            CourseOutline.objects.bulk_create(outlines, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('courses', '0010_search_vectors'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_outlines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:42
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def stamp_running_jobs(apps, schema_editor):
+    # Jobs claimed before this field existed start their stale window now.
+    Lesson = apps.get_model('courses', 'Lesson')
+    Lesson.objects.filter(transcode_status='processing').update(transcode_started_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_backfill_course_outlines'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='transcode_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(condition=models.Q(('transcode_status', 'processing')), fields=['transcode_started_at'], name='lesson_transcode_running_idx'),
+        ),
+        migrations.RunPython(stamp_running_jobs, migrations.RunPython.noop),
+    ]
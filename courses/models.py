@@ -1,10 +1,29 @@
 import os
+import uuid
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 import hashlib
 
+from root.metrics import LESSON_KEYS_ISSUED
+from .storage import lesson_media_storage
+
 User = settings.AUTH_USER_MODEL
 
+# Text search configuration of the generated search_vector columns. Changing
+# it changes the column expressions, i.e. needs a migration.
+SEARCH_CONFIG = 'english'
+
+
+def weighted_search_vector(*weighted_fields):
+    """to_tsvector over (field, weight) pairs, for a stored generated column."""
+    vectors = [SearchVector(field, weight=weight, config=SEARCH_CONFIG) for field, weight in weighted_fields]
+    expression = vectors[0]
+    for vector in vectors[1:]:
+        expression = expression + vector
+    return expression
+
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
@@ -36,22 +55,71 @@ class Course(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=False)
+    # Maintained by Postgres on every write, bulk ones included.
+    search_vector = models.GeneratedField(
+        expression=weighted_search_vector(('title', 'A'), ('description', 'C')),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    # Title words only, so title hits come straight from their own GIN index
+    # (a GIN index does not store weights, so "search_vector matches with
+    # weight A" has to recheck every heap row).
+    title_vector = models.GeneratedField(
+        expression=weighted_search_vector(('title', 'A')),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='course_search_idx'),
+            GinIndex(fields=['title_vector'], name='course_title_search_idx'),
+            # Catalog listing and keyset pagination order by (-created_at, -id).
+            models.Index(fields=['-created_at', '-id'], name='course_catalog_idx'),
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(is_published=True),
+                name='course_published_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class CourseOutline(models.Model):
+    """
+    Precomputed chapter -> lesson tree of a course, stored as JSON so course
+    endpoints read one row instead of walking three tables. ``course_updated_at``
+    records the Course.updated_at it was built from; chapter and lesson changes
+    bump that timestamp, which is how a stale outline is detected.
+    """
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='outline')
+    data = models.JSONField(default=list)
+    chapter_count = models.PositiveIntegerField(default=0)
+    lesson_count = models.PositiveIntegerField(default=0)
+    course_updated_at = models.DateTimeField()
+    built_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Outline for course {self.course_id}"
+
+
 class Chapter(models.Model):
+    # chapter_tree_idx leads with course, so it serves FK lookups too.
     course = models.ForeignKey(
         Course,
         on_delete=models.CASCADE,
-        related_name='chapters'
+        related_name='chapters',
+        db_index=False,
     )
     title = models.CharField(max_length=255)
     order = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['order']
+        indexes = [models.Index(fields=['course', 'order', 'id'], name='chapter_tree_idx')]
 
     def __str__(self):
         return f"{self.course.title} - {self.title}"
@@ -65,30 +133,75 @@ class Lesson(models.Model):
         ('quiz', 'Quiz'),
     ]
 
+    # lesson_tree_idx leads with chapter, so it serves FK lookups too.
     chapter = models.ForeignKey(
         Chapter,
         on_delete=models.CASCADE,
-        related_name='lessons'
+        related_name='lessons',
+        db_index=False,
     )
     title = models.CharField(max_length=255)
     content_type = models.CharField(max_length=20, choices=CONTENT_TYPES)
 
     video_file = models.FileField(
         upload_to="lesson_videos/originals/",
+        storage=lesson_media_storage,
         blank=True,
         null=True
     )
     document = models.FileField(
         upload_to='lesson_documents/originals/',
+        storage=lesson_media_storage,
         blank=True,
         null=True
     )
     content = models.TextField(blank=True)
 
     order = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    search_vector = models.GeneratedField(
+        expression=weighted_search_vector(('title', 'A'), ('content', 'C')),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    title_vector = models.GeneratedField(
+        expression=weighted_search_vector(('title', 'A')),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    TRANSCODE_STATUSES = [
+        ('none', 'Not transcoded'),
+        ('queued', 'Queued'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
+    # HLS renditions built by the transcode worker. Segments are AES-128
+    # encrypted with hls_key, which is only released to users holding a valid
+    # partial key for the lesson.
+    transcode_status = models.CharField(max_length=20, choices=TRANSCODE_STATUSES, default='none')
+    transcode_error = models.TextField(blank=True)
+    transcode_started_at = models.DateTimeField(null=True, blank=True)
+    transcoded_at = models.DateTimeField(null=True, blank=True)
+    hls_playlist = models.CharField(max_length=500, blank=True)
+    hls_key = models.BinaryField(blank=True, null=True, editable=False)
 
     class Meta:
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['chapter', 'order', 'id'], name='lesson_tree_idx'),
+            GinIndex(fields=['search_vector'], name='lesson_search_idx'),
+            GinIndex(fields=['title_vector'], name='lesson_title_search_idx'),
+            # The transcode worker polls for the oldest queued lesson.
+            models.Index(fields=['id'], condition=models.Q(transcode_status='queued'), name='lesson_transcode_queue_idx'),
+            # ... and for jobs whose worker died mid-transcode.
+            models.Index(
+                fields=['transcode_started_at'], condition=models.Q(transcode_status='processing'),
+                name='lesson_transcode_running_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.chapter.title} - {self.title}"
@@ -97,14 +210,50 @@ class Lesson(models.Model):
         return os.urandom(32)
 
 
+class UserLessonKeyManager(models.Manager):
+    def issue_for(self, user, lessons):
+        """
+        Return {lesson_id: raw key} for every lesson, creating missing keys in
+        one bulk insert. Conflicting rows created by a concurrent request are
+        skipped and re-read so both requests hand out the same key.
+        """
+        lessons = {lesson.id: lesson for lesson in lessons}
+        if not lessons:
+            return {}
+
+        keys = {
+            lesson_id: bytes(key)
+            for lesson_id, key in self.filter(user=user, lesson_id__in=lessons)
+            .values_list('lesson_id', 'encrypted_key')
+        }
+        missing = [
+            self.model(user=user, lesson=lesson, encrypted_key=lesson.generate_key())
+            for lesson_id, lesson in lessons.items()
+            if lesson_id not in keys
+        ]
+        if missing:
+            self.bulk_create(missing, ignore_conflicts=True)
+            LESSON_KEYS_ISSUED.inc(len(missing))
+            keys.update(
+                (lesson_id, bytes(key))
+                for lesson_id, key in self.filter(
+                    user=user, lesson_id__in=[key_obj.lesson_id for key_obj in missing]
+                ).values_list('lesson_id', 'encrypted_key')
+            )
+        return keys
+
+
 class UserLessonKey(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lesson_keys')
+    # The (user, lesson) unique index serves user lookups too.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lesson_keys', db_index=False)
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='user_keys')
     encrypted_key = models.BinaryField(blank=True, null=True) 
     partial_decryption_key = models.CharField(max_length=255, blank=True, null=True)
     partial_decryption_completed = models.BooleanField(default=False)  
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = UserLessonKeyManager()
+
     class Meta:
         unique_together = ('user', 'lesson')
 
@@ -124,3 +273,57 @@ class UserLessonKey(models.Model):
         if not self.encrypted_key:
             self.encrypted_key = self.generate_key_from_user()
         super().save(*args, **kwargs)
+
+
+class LessonUpload(models.Model):
+    """A resumable, chunked upload of a lesson's video or document."""
+    FIELD_CHOICES = [
+        ('video_file', 'Video'),
+        ('document', 'Document'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('completed', 'Completed'),
+        ('aborted', 'Aborted'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='uploads')
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lesson_uploads')
+    field = models.CharField(max_length=20, choices=FIELD_CHOICES)
+    filename = models.CharField(max_length=255)
+    storage_name = models.CharField(max_length=500)
+    total_size = models.PositiveBigIntegerField()
+    part_size = models.PositiveIntegerField()
+    s3_upload_id = models.CharField(max_length=1024, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Upload {self.id} for lesson {self.lesson_id}"
+
+    @property
+    def part_count(self):
+        return max(-(-self.total_size // self.part_size), 1)
+
+    def expected_part_size(self, number):
+        if number < self.part_count:
+            return self.part_size
+        return self.total_size - self.part_size * (self.part_count - 1)
+
+
+class LessonUploadPart(models.Model):
+    upload = models.ForeignKey(LessonUpload, on_delete=models.CASCADE, related_name='parts')
+    number = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+    etag = models.CharField(max_length=255, blank=True)
+    received_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('upload', 'number')
+        ordering = ['number']
+
+    def __str__(self):
+        return f"Part {self.number} of upload {self.upload_id}"
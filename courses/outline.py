@@ -0,0 +1,105 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, prefetch_related_objects
+
+from .models import Course, Chapter, Lesson, CourseOutline
+
+OUTLINE_FIELDS = ['data', 'chapter_count', 'lesson_count', 'course_updated_at']
+
+
+def outline_chapters():
+    return Prefetch(
+        'chapters',
+        queryset=Chapter.objects.order_by('order', 'id').prefetch_related(
+            Prefetch('lessons', queryset=Lesson.objects.order_by('order', 'id'))
+        ),
+    )
+
+
+def build_outline(course):
+    """Build (without saving) the outline for a course whose chapters -> lessons are prefetched."""
+    from .serializers import ChapterSerializer
+
+    data = ChapterSerializer(course.chapters.all(), many=True, context={'omit_user_fields': True}).data
+    data = [dict(chapter, lessons=[dict(lesson) for lesson in chapter['lessons']]) for chapter in data]
+    return CourseOutline(
+        course=course,
+        data=data,
+        chapter_count=len(data),
+        lesson_count=sum(len(chapter['lessons']) for chapter in data),
+        course_updated_at=course.updated_at,
+    )
+
+
+def rebuild_outline(course_id):
+    """Rebuild one course's outline. A no-op if the course has been deleted meanwhile."""
+    course = Course.objects.filter(pk=course_id).prefetch_related(outline_chapters()).first()
+    if course is None:
+        return None
+    outline = build_outline(course)
+    try:
+        with transaction.atomic():
+            CourseOutline.objects.update_or_create(
+                course=course, defaults={field: getattr(outline, field) for field in OUTLINE_FIELDS}
+            )
+    except IntegrityError:
+        # A concurrent rebuild created the row first; its copy is just as fresh.
+        pass
+    return outline
+
+
+def save_outlines(courses, batch_size=200):
+    """
+    Build and upsert the outlines of ``courses`` (a queryset or a list of
+    instances), one statement per batch.
+    """
+    courses = list(courses)
+    prefetch_related_objects(courses, outline_chapters())
+    outlines = [build_outline(course) for course in courses]
+    CourseOutline.objects.bulk_create(
+        outlines,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['course'],
+        update_fields=OUTLINE_FIELDS,
+    )
+    return outlines
+
+
+def rebuild_outlines(courses, batch_size=200):
+    """Rebuild many outlines with one upsert per batch."""
+    return len(save_outlines(courses, batch_size))
+
+
+def is_fresh(course):
+    try:
+        outline = course.outline
+    except ObjectDoesNotExist:
+        return False
+    return outline is not None and outline.course_updated_at == course.updated_at
+
+
+def course_outline(course):
+    """
+    Return a fresh outline for ``course``, rebuilding it if it is missing or
+    older than the course. Normally signals have already rebuilt it on commit.
+    """
+    if not is_fresh(course):
+        course.outline = rebuild_outline(course.pk)
+    return course.outline
+
+
+def refresh_outlines(courses):
+    """
+    Make sure every course in ``courses`` (a page of instances) carries a fresh
+    outline, rebuilding the missing or stale ones together in a fixed number
+    of queries instead of one rebuild per course.
+    """
+    stale = [course for course in courses if not is_fresh(course)]
+    if stale:
+        for outline in save_outlines(stale):
+            outline.course.outline = outline
+
+
+def schedule_outline_rebuild(course_id):
+    transaction.on_commit(lambda: rebuild_outline(course_id))
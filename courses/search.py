@@ -0,0 +1,111 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import Case, F, FloatField, OuterRef, Subquery, Value, When
+
+from .models import SEARCH_CONFIG, Category, Chapter, Course, Lesson
+
+MAX_TERMS = 8
+# Upper bound on the rows ts_rank is computed for, per candidate source. A
+# short prefix can match a large part of the catalog; title hits are capped
+# separately from hits anywhere so they can't be crowded out by body hits.
+MAX_RANKED = 200
+WORD_RE = re.compile(r'\w+')
+
+
+def prefix_query(text):
+    """
+    Turn free text into a tsquery for search-as-you-type: the last word matches
+    as a prefix and the words before it as whole (stemmed) words, so
+    "python basi" finds "Python basics". Returns None for text without words.
+    """
+    words = WORD_RE.findall(text.lower())[:MAX_TERMS]
+    if not words:
+        return None
+    # GIN has to collect every posting of a prefix into a bitmap before it can
+    # AND terms, while whole words are skipped through. Only the word being
+    # typed needs the prefix. Words are \w+ only, so quoting them cannot break
+    # out of the tsquery syntax.
+    terms = [f"'{word}'" for word in words[:-1]] + [f"'{words[-1]}':*"]
+    return SearchQuery(' & '.join(terms), search_type='raw', config=SEARCH_CONFIG)
+
+
+def matching(model, query, *extra):
+    """
+    Rows of ``model`` matching ``query``: the UNION of up to MAX_RANKED title
+    hits and up to MAX_RANKED hits anywhere, each LIMITed subquery driven by
+    its own GIN index. The best-ranked rows always make it to ranking however
+    many body hits a short prefix has, and the cost stays bounded. ``extra``
+    are more ``pk`` querysets to take candidates from; OR-ing them into the
+    filter instead would turn the lookup into a scan of the whole table.
+    """
+    hits = model.objects.order_by().values('pk')
+    candidates = hits.filter(title_vector=query)[:MAX_RANKED].union(
+        hits.filter(search_vector=query)[:MAX_RANKED], *extra,
+    )
+    return model.objects.filter(pk__in=candidates)
+
+
+def search_categories(query, limit):
+    # A few hundred rows at most; not worth a stored vector.
+    return list(
+        Category.objects.annotate(vector=SearchVector('name', config=SEARCH_CONFIG))
+        .filter(vector=query)
+        .order_by('name')
+        .values('id', 'name')[:limit]
+    )
+
+
+def search_courses(query, limit, category_ids=()):
+    """
+    Courses whose title/description match, ranked with title hits (weight A)
+    above description hits (C). Courses in a matching category are included
+    with a small fixed rank so they sort after direct hits.
+    """
+    rank = SearchRank(F('search_vector'), query)
+    extra = []
+    if category_ids:
+        # Category-only hits tie on rank and sort newest first, so the newest
+        # MAX_RANKED of them are the only ones that can make a page.
+        extra.append(Course.objects.filter(category_id__in=category_ids).order_by('-pk').values('pk')[:MAX_RANKED])
+        rank = rank + Case(
+            When(category_id__in=category_ids, then=Value(0.05)), default=Value(0.0), output_field=FloatField(),
+        )
+    return list(
+        matching(Course, query, *extra).annotate(rank=rank)
+        .order_by('-rank', '-id')
+        .values('id', 'title', 'category_id', 'is_published', 'rank')[:limit]
+    )
+
+
+def lesson_results(query):
+    return (
+        matching(Lesson, query)
+        .annotate(rank=SearchRank(F('search_vector'), query))
+        .order_by('-rank', '-id')
+        .values('id', 'title', 'content_type', 'chapter_id', 'rank')
+    )
+
+
+def search_lessons(query, limit):
+    # A correlated subquery, which Postgres evaluates after the LIMIT for the
+    # page only; joining chapters before it would hash the whole chapter table
+    # on every search, and a separate lookup costs another round trip.
+    course_id = Chapter.objects.filter(pk=OuterRef('chapter_id')).order_by().values('course_id')
+    return list(lesson_results(query).annotate(course_id=Subquery(course_id))[:limit])
+
+
+def search_catalog(text, limit=20, kinds=('courses', 'lessons', 'categories')):
+    query = prefix_query(text)
+    if query is None:
+        return {kind: [] for kind in kinds}
+
+    results = {}
+    categories = search_categories(query, limit)
+    if 'categories' in kinds:
+        results['categories'] = categories
+    if 'courses' in kinds:
+        results['courses'] = search_courses(query, limit, [category['id'] for category in categories])
+    if 'lessons' in kinds:
+        results['lessons'] = search_lessons(query, limit)
+    return results
@@ -1,11 +1,12 @@
 import base64
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_field
-from .models import Category, Course, Chapter, Lesson, UserLessonKey
-import boto3
-from botocore.client import Config
+from .models import Category, Course, Chapter, Lesson, UserLessonKey, LessonUpload
+from .outline import course_outline, refresh_outlines
 import hashlib
 from django.conf import settings
+from django.db import models
+from django.urls import reverse
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -13,6 +14,44 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description']
 
 
+def encode_partial_key(full_key):
+    part_len = (len(full_key) * 3) // 4
+    return base64.b64encode(full_key[:part_len]).decode('utf-8')
+
+
+def collect_lessons(instance):
+    """Walk a course / chapter / lesson instance (or a list of them) and return its lessons."""
+    if instance is None:
+        return []
+    if isinstance(instance, Lesson):
+        return [instance]
+    if isinstance(instance, Chapter):
+        return list(instance.lessons.all())
+    if isinstance(instance, Course):
+        outline = course_outline(instance)
+        return [Lesson(id=lesson['id']) for chapter in outline.data for lesson in chapter['lessons']]
+    return [lesson for item in instance for lesson in collect_lessons(item)]
+
+
+def response_lesson_key(serializer, user, lesson_id):
+    """
+    Return the user's key for ``lesson_id``. Keys for every lesson in the
+    response are resolved on first use and shared through the root
+    serializer's context.
+    """
+    lesson_keys = serializer.context.get('lesson_keys')
+    if lesson_keys is None:
+        lessons = collect_lessons(serializer.root.instance)
+        lesson_keys = UserLessonKey.objects.issue_for(user, lessons)
+        serializer.context['lesson_keys'] = lesson_keys
+
+    full_key = lesson_keys.get(lesson_id)
+    if full_key is None:
+        full_key = UserLessonKey.objects.issue_for(user, [Lesson(id=lesson_id)])[lesson_id]
+        lesson_keys[lesson_id] = full_key
+    return full_key
+
+
 class LessonSerializer(serializers.ModelSerializer):
     partial_decryption_key = serializers.SerializerMethodField()
 
@@ -29,21 +68,34 @@ class LessonSerializer(serializers.ModelSerializer):
     def get_partial_decryption_key(self, obj):
         request = self.context.get('request')
         user = request.user if request else None
-        if not user or user.is_anonymous:
+        if not user or user.is_anonymous or self.context.get('omit_user_fields'):
             return None
 
-        key_obj, created = UserLessonKey.objects.get_or_create(user=user, lesson=obj)
-        if created:
-            full_key = obj.generate_key()
-            key_obj.encrypted_key = full_key
-            key_obj.save()
-        else:
-            full_key = key_obj.get_raw_key()
-
-        part_len = (len(full_key) * 3) // 4
-        partial_key = full_key[:part_len]
-        return base64.b64encode(partial_key).decode('utf-8')
-    
+        return encode_partial_key(response_lesson_key(self, user, obj.id))
+
+
+def derive_lesson_key(user, lesson):
+    user_identifier = getattr(user, 'slug', None) or getattr(user, 'email', None) or str(user.pk)
+    key_input = f"{user_identifier}-{lesson.id}"
+    return hashlib.sha256(key_input.encode('utf-8')).digest()
+
+
+def partial_key_matches(partial_key_b64, full_key):
+    try:
+        partial_key = base64.b64decode(partial_key_b64)
+    except Exception:
+        return False
+
+    expected_partial_len = (len(full_key) * 3) // 4
+    expected_partial_key = full_key[:expected_partial_len]
+
+    return partial_key == expected_partial_key
+
+
+def can_access_lesson_media(user, lesson, partial_key_b64):
+    if not user or user.is_anonymous or not partial_key_b64:
+        return False
+    return partial_key_matches(partial_key_b64, derive_lesson_key(user, lesson))
 
 
 class LessonDetailSerializer(serializers.ModelSerializer):
@@ -51,31 +103,24 @@ class LessonDetailSerializer(serializers.ModelSerializer):
     full_decryption_key = serializers.SerializerMethodField()
     video_file = serializers.SerializerMethodField()
     document = serializers.SerializerMethodField()
+    hls_playlist = serializers.SerializerMethodField()
 
     class Meta:
         model = Lesson
         fields = [
             'id', 'chapter', 'title', 'content_type',
             'video_file', 'document', 'content', 'order',
+            'transcode_status', 'hls_playlist',
             'partial_decryption_key',  
             'full_decryption_key',     
         ]
+        read_only_fields = ['transcode_status']
 
     def generate_key_from_user(self, user, lesson):
-        user_identifier = getattr(user, 'slug', None) or getattr(user, 'email', None) or str(user.pk)
-        key_input = f"{user_identifier}-{lesson.id}"
-        return hashlib.sha256(key_input.encode('utf-8')).digest()
+        return derive_lesson_key(user, lesson)
 
     def validate_partial_key(self, partial_key_b64, full_key):
-        try:
-            partial_key = base64.b64decode(partial_key_b64)
-        except Exception:
-            return False
-
-        expected_partial_len = (len(full_key) * 3) // 4
-        expected_partial_key = full_key[:expected_partial_len]
-
-        return partial_key == expected_partial_key
+        return partial_key_matches(partial_key_b64, full_key)
 
     def get_full_decryption_key(self, obj):
         request = self.context.get('request')
@@ -93,41 +138,36 @@ class LessonDetailSerializer(serializers.ModelSerializer):
 
         return base64.b64encode(full_key).decode('utf-8')
 
-    def get_video_file(self, obj):
+    def media_url(self, obj, field_file):
+        """
+        Return the file URL once the caller's partial key checks out. With the
+        S3 lesson storage this is a short-lived presigned GET URL.
+        """
         request = self.context.get('request')
         user = request.user if request else None
-        if not user or user.is_anonymous:
+        partial_key_b64 = getattr(self, 'initial_data', {}).get('partial_decryption_key')
+        if not partial_key_b64 and request:
+            partial_key_b64 = request.query_params.get('partial_decryption_key')
+        if not can_access_lesson_media(user, obj, partial_key_b64):
             return None
 
-        partial_key_b64 = self.initial_data.get('partial_decryption_key')
-        if not partial_key_b64:
-            return None
-
-        full_key = self.generate_key_from_user(user, obj)
-        if not self.validate_partial_key(partial_key_b64, full_key):
-            return None
-
-        if obj.video_file:
-            return request.build_absolute_uri(obj.video_file.url) if request else obj.video_file.url
+        if field_file:
+            return request.build_absolute_uri(field_file.url) if request else field_file.url
         return None
 
-    def get_document(self, obj):
-        request = self.context.get('request')
-        user = request.user if request else None
-        if not user or user.is_anonymous:
-            return None
+    def get_video_file(self, obj):
+        return self.media_url(obj, obj.video_file)
 
-        partial_key_b64 = self.initial_data.get('partial_decryption_key')
-        if not partial_key_b64:
-            return None
+    def get_document(self, obj):
+        return self.media_url(obj, obj.document)
 
-        full_key = self.generate_key_from_user(user, obj)
-        if not self.validate_partial_key(partial_key_b64, full_key):
+    @extend_schema_field(serializers.URLField(allow_null=True))
+    def get_hls_playlist(self, obj):
+        if obj.transcode_status != 'ready':
             return None
-
-        if obj.document:
-            return request.build_absolute_uri(obj.document.url) if request else obj.document.url
-        return None
+        request = self.context.get('request')
+        url = reverse('lesson-hls', args=[obj.id, 'master.m3u8'])
+        return request.build_absolute_uri(url) if request else url
 
 
 class UserLessonKeySerializer(serializers.ModelSerializer):
@@ -143,7 +183,49 @@ class ChapterSerializer(serializers.ModelSerializer):
         fields = ['id', 'course', 'title', 'order', 'lessons']
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseOutlinePageSerializer(serializers.ListSerializer):
+    """Refresh the page's outlines in one batch before its courses are serialized."""
+
+    def to_representation(self, data):
+        courses = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        refresh_outlines(courses)
+        return super().to_representation(courses)
+
+
+class CourseOutlineCountsMixin(serializers.Serializer):
+    chapter_count = serializers.SerializerMethodField()
+    lesson_count = serializers.SerializerMethodField()
+
+    def get_chapter_count(self, obj) -> int:
+        return course_outline(obj).chapter_count
+
+    def get_lesson_count(self, obj) -> int:
+        return course_outline(obj).lesson_count
+
+
+class CourseListSerializer(CourseOutlineCountsMixin, serializers.ModelSerializer):
+    category = CategorySerializer(read_only=True)
+    created_by = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    class Meta:
+        model = Course
+        list_serializer_class = CourseOutlinePageSerializer
+        fields = [
+            'id',
+            'title',
+            'description',
+            'category',
+            'created_by',
+            'created_at',
+            'updated_at',
+            'is_published',
+            'chapter_count',
+            'lesson_count',
+        ]
+        read_only_fields = fields
+
+
+class CourseSerializer(CourseOutlineCountsMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
@@ -153,10 +235,11 @@ class CourseSerializer(serializers.ModelSerializer):
         allow_null=True
     )
     created_by = serializers.PrimaryKeyRelatedField(read_only=True) 
-    chapters = ChapterSerializer(many=True, read_only=True)
+    chapters = serializers.SerializerMethodField()
 
     class Meta:
         model = Course
+        list_serializer_class = CourseOutlinePageSerializer
         fields = [
             'id',
             'title',
@@ -167,7 +250,71 @@ class CourseSerializer(serializers.ModelSerializer):
             'created_at',
             'updated_at',
             'is_published',
+            'chapter_count',
+            'lesson_count',
             'chapters'
         ]
         read_only_fields = ['created_by', 'created_at', 'updated_at']
 
+    @extend_schema_field(ChapterSerializer(many=True))
+    def get_chapters(self, obj):
+        # Served from the precomputed outline; only the per-user partial keys
+        # are filled in here.
+        chapters = course_outline(obj).data
+        request = self.context.get('request')
+        user = request.user if request else None
+        if not user or user.is_anonymous or self.context.get('omit_user_fields'):
+            return chapters
+
+        chapters = [dict(chapter, lessons=[dict(lesson) for lesson in chapter['lessons']]) for chapter in chapters]
+        for chapter in chapters:
+            for lesson in chapter['lessons']:
+                lesson['partial_decryption_key'] = encode_partial_key(response_lesson_key(self, user, lesson['id']))
+        return chapters
+
+
+
+class LessonUploadSerializer(serializers.ModelSerializer):
+    received_parts = serializers.SerializerMethodField()
+    part_count = serializers.IntegerField(read_only=True)
+    part_size = serializers.IntegerField(required=False, min_value=1)
+    total_size = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = LessonUpload
+        fields = [
+            'id', 'lesson', 'field', 'filename', 'total_size', 'part_size',
+            'part_count', 'received_parts', 'status', 'created_at', 'completed_at',
+        ]
+        read_only_fields = ['id', 'lesson', 'status', 'created_at', 'completed_at']
+
+    @extend_schema_field(serializers.ListField(child=serializers.DictField()))
+    def get_received_parts(self, obj):
+        return [
+            {'number': part.number, 'size': part.size, 'sha256': part.sha256}
+            for part in obj.parts.all()
+        ]
+
+
+class OutlineLessonWriteSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False, help_text="Existing lesson; omit to create one.")
+    title = serializers.CharField(max_length=255)
+    content_type = serializers.ChoiceField(choices=Lesson.CONTENT_TYPES, required=False)
+    content = serializers.CharField(required=False, allow_blank=True)
+
+
+class OutlineChapterWriteSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False, help_text="Existing chapter; omit to create one.")
+    title = serializers.CharField(max_length=255)
+    lessons = OutlineLessonWriteSerializer(many=True, required=False, default=list)
+
+
+class CourseOutlineWriteSerializer(serializers.Serializer):
+    """
+    A full chapter -> lesson outline. List position is the order; lessons may
+    move between chapters by listing their id under a different chapter.
+    """
+    chapters = OutlineChapterWriteSerializer(many=True)
+    delete_missing = serializers.BooleanField(
+        default=True, help_text="Delete existing chapters and lessons the outline leaves out.",
+    )
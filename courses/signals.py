@@ -0,0 +1,74 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.utils.timezone import now
+
+from .cache import bump_catalog_version
+from .models import Category, Course, Chapter, Lesson
+from .outline import schedule_outline_rebuild
+
+_muted = ContextVar('catalog_signals_muted', default=False)
+
+
+@contextmanager
+def muted_catalog_signals():
+    """
+    Skip the per-row receivers below for writes made in this block (and this
+    thread or task only). The caller touches the parents, bumps the catalog
+    version and schedules the outline rebuild itself, once.
+    """
+    token = _muted.set(True)
+    try:
+        yield
+    finally:
+        _muted.reset(token)
+
+
+def catalog_changed(sender, **kwargs):
+    if not _muted.get():
+        bump_catalog_version()
+
+
+def touch_courses_for_category(sender, instance, **kwargs):
+    Course.objects.filter(category=instance).update(updated_at=now())
+
+
+def touch_course_for_chapter(sender, instance, **kwargs):
+    if _muted.get():
+        return
+    Course.objects.filter(pk=instance.course_id).update(updated_at=now())
+    schedule_outline_rebuild(instance.course_id)
+
+
+def touch_tree_for_lesson(sender, instance, **kwargs):
+    if _muted.get():
+        return
+    timestamp = now()
+    Chapter.objects.filter(pk=instance.chapter_id).update(updated_at=timestamp)
+    Course.objects.filter(chapters__pk=instance.chapter_id).update(updated_at=timestamp)
+    course_id = Chapter.objects.filter(pk=instance.chapter_id).values_list('course_id', flat=True).first()
+    if course_id:
+        schedule_outline_rebuild(course_id)
+
+
+def rebuild_course_outline(sender, instance, created, **kwargs):
+    schedule_outline_rebuild(instance.pk)
+
+
+def connect_catalog_invalidation():
+    for model in (Category, Course, Chapter, Lesson):
+        post_save.connect(catalog_changed, sender=model, dispatch_uid=f'catalog-save-{model.__name__}')
+        post_delete.connect(catalog_changed, sender=model, dispatch_uid=f'catalog-delete-{model.__name__}')
+
+    # Keep updated_at on the parents current so conditional GETs and course
+    # outlines notice changes anywhere below them.
+    for signal in (post_save, post_delete):
+        signal.connect(touch_course_for_chapter, sender=Chapter, dispatch_uid=f'touch-course-{signal}')
+        signal.connect(touch_tree_for_lesson, sender=Lesson, dispatch_uid=f'touch-tree-{signal}')
+    # Course payloads embed their category. Deletes are handled before the
+    # SET_NULL update detaches the courses.
+    post_save.connect(touch_courses_for_category, sender=Category, dispatch_uid='touch-courses-category-save')
+    pre_delete.connect(touch_courses_for_category, sender=Category, dispatch_uid='touch-courses-category-delete')
+    # The outline of the affected course only is rebuilt once the transaction commits.
+    post_save.connect(rebuild_course_outline, sender=Course, dispatch_uid='outline-course-save')
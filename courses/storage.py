@@ -0,0 +1,136 @@
+import mimetypes
+import posixpath
+import tempfile
+import threading
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.client import Config
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import Storage, storages
+from django.utils.deconstruct import deconstructible
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """
+    Return the process-wide S3 client. boto3 clients are thread-safe and keep
+    their own connection pool, so every request in a worker shares one.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                config = Config(
+                    signature_version='s3v4',
+                    max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                    retries={'max_attempts': 3, 'mode': 'standard'},
+                    # MinIO and other S3 stand-ins expect path-style URLs.
+                    s3={'addressing_style': 'path' if settings.MY_S3_ENDPOINT_URL else 'auto'},
+                )
+                _client = boto3.client(
+                    's3',
+                    aws_access_key_id=settings.MY_ACCESS_KEY_ID,
+                    aws_secret_access_key=settings.MY_SECRET_KEY,
+                    region_name=settings.MY_AWS_REGION,
+                    endpoint_url=settings.MY_S3_ENDPOINT_URL,
+                    config=config,
+                )
+    return _client
+
+
+def reset_s3_client():
+    global _client
+    with _client_lock:
+        _client = None
+
+
+@deconstructible
+class S3MediaStorage(Storage):
+    """
+    Lesson media in an S3-compatible bucket. ``url()`` returns a short-lived
+    presigned GET URL so clients download straight from object storage.
+    """
+    # Tells the media views to redirect instead of proxying bytes.
+    serves_direct_urls = True
+
+    def __init__(self, bucket_name=None, location='', querystring_expire=None):
+        self.bucket_name = bucket_name or settings.MY_BUCKET_NAME
+        self.location = location
+        self.querystring_expire = querystring_expire or settings.MEDIA_PRESIGNED_URL_EXPIRY
+
+    @property
+    def client(self):
+        return get_s3_client()
+
+    def key(self, name):
+        return posixpath.join(self.location, name) if self.location else name
+
+    def head(self, name):
+        return self.client.head_object(Bucket=self.bucket_name, Key=self.key(name))
+
+    def _save(self, name, content):
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        # upload_fileobj switches to multipart above the threshold and reads the
+        # file in chunks, so large videos never sit in memory whole.
+        self.client.upload_fileobj(
+            content,
+            self.bucket_name,
+            self.key(name),
+            ExtraArgs={'ContentType': content_type},
+            Config=TransferConfig(multipart_chunksize=settings.S3_MULTIPART_CHUNK_SIZE),
+        )
+        return name
+
+    def _open(self, name, mode='rb'):
+        buffer = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        self.client.download_fileobj(self.bucket_name, self.key(name), buffer)
+        buffer.seek(0)
+        return File(buffer, name)
+
+    def exists(self, name):
+        try:
+            self.head(name)
+        except ClientError as exc:
+            if exc.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        return True
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket_name, Key=self.key(name))
+
+    def listdir(self, path):
+        prefix = self.key(path).rstrip('/')
+        prefix = f"{prefix}/" if prefix else ''
+        directories, files = [], []
+        pages = self.client.get_paginator('list_objects_v2').paginate(
+            Bucket=self.bucket_name, Prefix=prefix, Delimiter='/',
+        )
+        for page in pages:
+            directories.extend(entry['Prefix'][len(prefix):].rstrip('/') for entry in page.get('CommonPrefixes', []))
+            files.extend(entry['Key'][len(prefix):] for entry in page.get('Contents', []))
+        return directories, files
+
+    def size(self, name):
+        return self.head(name)['ContentLength']
+
+    def get_modified_time(self, name):
+        return self.head(name)['LastModified']
+
+    def url(self, name, expire=None):
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket_name, 'Key': self.key(name)},
+            ExpiresIn=expire or self.querystring_expire,
+        )
+
+
+def lesson_media_storage():
+    return storages['lesson_media']
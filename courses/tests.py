@@ -1,3 +1,1280 @@
-from django.test import TestCase
+import base64
+import hashlib
+import json
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from urllib.parse import urljoin
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+from django.utils.timezone import now
+from drf_spectacular.drainage import GENERATOR_STATS
+from drf_spectacular.generators import SchemaGenerator
+from prometheus_client import REGISTRY
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+from rest_framework.views import exception_handler
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.authentication import StatelessJWTAuthentication
+from accounts.models import KYC
+from root.pagination import KeysetPagination
+from root.profiling import ProfilingMiddleware, StackSampler
+from root.timing import QueryBudgetExceeded
+
+from .cache import VERSION_KEY, catalog_version, increment_version
+from .encryption import EncryptedFileSystemStorage
+from .management.commands.benchmark_api import SCENARIOS as BENCHMARK_SCENARIOS, Dataset, HTTPTransport
+from .management.commands.explain_hot_paths import hot_path_queries, sequential_scans, uses_index
+from .management.commands.generate_synthetic_data import CHAPTERS_PER_COURSE, LESSONS_PER_CHAPTER
+from .models import Category, Chapter, Course, CourseOutline, Lesson, LessonUploadPart, UserLessonKey
+from .outline import build_outline, outline_chapters, rebuild_outline
+from .search import lesson_results, prefix_query
+from .serializers import derive_lesson_key
+from .storage import S3MediaStorage, get_s3_client, reset_s3_client
+from .transcoding import build_ffmpeg_command, claim_next_job, enqueue_transcode
+from .views import CourseViewSet
+
+try:
+    import moto
+except ImportError:
+    moto = None
+
+
+def make_course(category, title, chapters=2, lessons=3):
+    course = Course.objects.create(title=title, category=category, is_published=True)
+    for c in range(chapters):
+        chapter = Chapter.objects.create(course=course, title=f"{title} ch{c}", order=c)
+        for l in range(lessons):
+            Lesson.objects.create(chapter=chapter, title=f"{title} l{l}", content_type='text', order=l)
+    # Outlines are rebuilt on commit, which a TestCase transaction never reaches.
+    rebuild_outline(course.pk)
+    return course
+
+
+@override_settings(QUERY_BUDGET_ACTION='raise')
+class CourseTreeQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Programming")
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('course-list'), {'expand': 'chapters'})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_list_query_count_is_constant(self):
+        make_course(self.category, "Python")
+        small = self.count_list_queries()
+
+        for i in range(5):
+            make_course(self.category, f"Course {i}", chapters=3, lessons=4)
+        large = self.count_list_queries()
+
+        self.assertEqual(small, large)
+
+    def test_missing_and_stale_outlines_are_rebuilt_per_page(self):
+        make_course(self.category, "Python")
+        CourseOutline.objects.all().delete()
+        small = self.count_list_queries()
+
+        CourseOutline.objects.all().delete()
+        for i in range(5):
+            make_course(self.category, f"Course {i}", chapters=3, lessons=4)
+        CourseOutline.objects.filter(course__title="Course 0").delete()
+        Course.objects.exclude(title="Course 0").update(updated_at=now())
+        large = self.count_list_queries()
+
+        self.assertEqual(small, large)
+        self.assertEqual(CourseOutline.objects.count(), 6)
+        # The rebuild is chapters, lessons and one upsert for the whole page.
+        self.assertEqual(self.count_list_queries(), small - 3)
+
+    def test_retrieve_keeps_chapter_and_lesson_order(self):
+        course = Course.objects.create(title="Ordered", category=self.category)
+        second = Chapter.objects.create(course=course, title="second", order=2)
+        first = Chapter.objects.create(course=course, title="first", order=1)
+        Lesson.objects.create(chapter=first, title="b", content_type='text', order=2)
+        Lesson.objects.create(chapter=first, title="a", content_type='text', order=1)
+
+        response = self.client.get(reverse('course-detail', args=[course.pk]))
+
+        chapters = response.data['chapters']
+        self.assertEqual([c['id'] for c in chapters], [first.pk, second.pk])
+        self.assertEqual([l['title'] for l in chapters[0]['lessons']], ['a', 'b'])
+
+
+class OutlineBackfillMigrationTests(TransactionTestCase):
+    migrate_from = [('courses', '0010_search_vectors')]
+
+    def migrate(self, targets=None):
+        """Migrate to ``targets`` (default: latest) and return their historical apps."""
+        executor = MigrationExecutor(connection)
+        targets = targets or executor.loader.graph.leaf_nodes()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate()
+
+    def test_builds_missing_outlines_from_historical_models(self):
+        old_apps = self.migrate(self.migrate_from)
+        course = old_apps.get_model('courses', 'Course').objects.create(title="Python")
+        Chapter = old_apps.get_model('courses', 'Chapter')
+        Lesson = old_apps.get_model('courses', 'Lesson')
+        for c in range(2):
+            chapter = Chapter.objects.create(course=course, title=f"ch{c}", order=1 - c)
+            for l in range(3):
+                Lesson.objects.create(chapter=chapter, title=f"l{l}", content_type='text', order=l)
+
+        # Later migrations change Lesson, so the backfill must not use the live model.
+        self.migrate()
+
+        outline = CourseOutline.objects.get(course_id=course.pk)
+        expected = build_outline(Course.objects.prefetch_related(outline_chapters()).get(pk=course.pk))
+        self.assertEqual((outline.chapter_count, outline.lesson_count), (2, 6))
+        self.assertEqual(outline.data, expected.data)
+        self.assertEqual(outline.course_updated_at, expected.course_updated_at)
+
+
+@override_settings(QUERY_BUDGET_ACTION='raise')
+class LessonKeyIssuanceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="student@example.com", password="pass1234", full_name="Student"
+        )
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(name="Programming")
+
+    def list_courses(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('course-list'), {'expand': 'chapters', 'limit': 100})
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def partial_keys(self, response):
+        return {
+            lesson['id']: lesson['partial_decryption_key']
+            for course in response.data['results']
+            for chapter in course['chapters']
+            for lesson in chapter['lessons']
+        }
+
+    def test_keys_are_issued_in_bulk_and_reused(self):
+        make_course(self.category, "Python")
+        _, small = self.list_courses()
+        for i in range(4):
+            make_course(self.category, f"Course {i}", chapters=3, lessons=4)
+
+        first, issuing = self.list_courses()
+        second, cached = self.list_courses()
+
+        self.assertEqual(small, issuing)
+        self.assertLess(cached, issuing)
+        self.assertEqual(UserLessonKey.objects.filter(user=self.user).count(), Lesson.objects.count())
+        self.assertEqual(self.partial_keys(first), self.partial_keys(second))
+        self.assertTrue(all(self.partial_keys(first).values()))
+
+    def test_existing_keys_are_not_replaced(self):
+        course = make_course(self.category, "Python", chapters=1, lessons=2)
+        lesson = course.chapters.get().lessons.first()
+        UserLessonKey.objects.issue_for(self.user, [lesson])
+        key = bytes(UserLessonKey.objects.get(user=self.user, lesson=lesson).encrypted_key)
+
+        keys = UserLessonKey.objects.issue_for(self.user, Lesson.objects.all())
+
+        self.assertEqual(keys[lesson.id], key)
+        self.assertEqual(len(keys), 2)
+
+
+class CoursePaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Programming")
+        for i in range(5):
+            make_course(self.category, f"Course {i}", chapters=1, lessons=1)
+
+    def test_list_omits_chapters_unless_expanded(self):
+        flat = self.client.get(reverse('course-list'))
+        expanded = self.client.get(reverse('course-list'), {'expand': 'chapters'})
+
+        self.assertNotIn('chapters', flat.data['results'][0])
+        self.assertIn('chapters', expanded.data['results'][0])
+
+    def test_limit_offset_pages(self):
+        response = self.client.get(reverse('course-list'), {'limit': 2, 'offset': 4})
+
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_cursor_walks_every_course_once(self):
+        seen = []
+        with mock.patch.object(CourseViewSet, 'pagination_class', KeysetPagination):
+            url = reverse('course-list') + '?page_size=2'
+            while url:
+                response = self.client.get(url)
+                seen += [course['id'] for course in response.data['results']]
+                url = response.data['next']
+
+        expected = list(Course.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+
+class LessonMediaStreamTests(TestCase):
+    payload = bytes(range(256)) * 40
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_STREAM_CHUNK_SIZE=1000)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="student@example.com", password="pass1234", full_name="Student"
+        )
+        self.client.force_authenticate(self.user)
+        course = make_course(Category.objects.create(name="Video"), "Video", chapters=1, lessons=0)
+        self.lesson = Lesson.objects.create(
+            chapter=course.chapters.get(), title="Intro", content_type='video',
+            video_file=SimpleUploadedFile("intro.mp4", self.payload),
+        )
+        full_key = derive_lesson_key(self.user, self.lesson)
+        self.partial_key = base64.b64encode(full_key[:len(full_key) * 3 // 4]).decode()
+
+    def stream(self, **headers):
+        url = reverse('lesson-stream', args=[self.lesson.pk, 'video'])
+        return self.client.get(url, {'partial_decryption_key': self.partial_key}, headers=headers)
+
+    def test_full_download(self):
+        response = self.stream()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.payload)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_byte_range(self):
+        served = REGISTRY.get_sample_value('lms_media_bytes_served_total')
+        response = self.stream(Range='bytes=1000-2999')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f"bytes 1000-2999/{len(self.payload)}")
+        self.assertEqual(b''.join(response.streaming_content), self.payload[1000:3000])
+        self.assertEqual(REGISTRY.get_sample_value('lms_media_bytes_served_total') - served, 2000)
+
+    def test_suffix_range(self):
+        response = self.stream(Range='bytes=-10')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.payload[-10:])
+
+    def test_unsatisfiable_range(self):
+        response = self.stream(Range=f'bytes={len(self.payload)}-')
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f"bytes */{len(self.payload)}")
+
+    def test_suffix_range_of_empty_file(self):
+        self.lesson.video_file = SimpleUploadedFile("empty.mp4", b"")
+        self.lesson.save()
+
+        response = self.stream(Range='bytes=-10')
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], "bytes */0")
+
+    def test_stale_if_range_returns_whole_file(self):
+        etag = self.stream()['ETag']
+
+        self.assertEqual(self.stream(Range='bytes=0-9', **{'If-Range': etag}).status_code, 206)
+        self.assertEqual(self.stream(Range='bytes=0-9', **{'If-Range': '"stale"'}).status_code, 200)
+
+    def test_requires_partial_key(self):
+        self.partial_key = base64.b64encode(b"wrong").decode()
+
+        self.assertEqual(self.stream().status_code, 403)
+
+    @override_settings(MEDIA_DELIVERY_BACKEND='nginx', MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_nginx_offload(self):
+        response = self.stream()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f"/protected-media/{self.lesson.video_file.name}")
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_DELIVERY_BACKEND='sendfile')
+    def test_sendfile_offload(self):
+        response = self.stream()
+
+        self.assertEqual(response['X-Sendfile'], self.lesson.video_file.path)
+
+    async def test_asgi_streams_with_async_iterator(self):
+        # JWT authentication only accepts active users (new accounts wait for KYC).
+        await get_user_model().objects.filter(pk=self.user.pk).aupdate(is_active=True)
+        url = reverse('lesson-stream', args=[self.lesson.pk, 'video'])
+        headers = {'Authorization': f"Bearer {AccessToken.for_user(self.user)}", 'Range': 'bytes=10-2509'}
+
+        response = await AsyncClient().get(url, {'partial_decryption_key': self.partial_key}, headers=headers)
+
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), self.payload[10:2510])
+
+    async def test_asgi_rejects_missing_token(self):
+        url = reverse('lesson-stream', args=[self.lesson.pk, 'video'])
+
+        response = await AsyncClient().get(url, {'partial_decryption_key': self.partial_key})
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_player_accept_header_is_not_refused(self):
+        self.assertEqual(self.stream(Accept='video/mp4').status_code, 200)
+
+    def test_errors_go_through_the_configured_exception_handler(self):
+        def handler(exc, context):
+            response = exception_handler(exc, context)
+            response['X-Handled-By'] = type(context['view']).__name__
+            return response
+
+        with mock.patch.object(api_settings, 'EXCEPTION_HANDLER', handler):
+            response = self.client.get(reverse('lesson-detail', args=[self.lesson.pk + 1]))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response['X-Handled-By'], 'LessonDetailView')
+        self.assertIn('detail', response.json())
+
+    def test_watch_endpoint_is_in_the_schema(self):
+        with GENERATOR_STATS.silence():
+            schema = SchemaGenerator().get_schema(request=None, public=True)
+
+        operation = schema['paths']['/api/course/lessons/{id}/watch/']['get']
+        self.assertEqual(operation['responses']['200']['content']['application/json']['schema']['$ref'],
+                         '#/components/schemas/LessonDetail')
+
+
+@override_settings(
+    MY_ACCESS_KEY_ID='testing', MY_SECRET_KEY='testing', MY_BUCKET_NAME='lms-media',
+    MY_AWS_REGION='us-east-1', MY_S3_ENDPOINT_URL=None, MEDIA_PRESIGNED_URL_EXPIRY=120,
+)
+class S3MediaStorageTests(TestCase):
+    def setUp(self):
+        reset_s3_client()
+        self.addCleanup(reset_s3_client)
+
+    def test_client_is_shared(self):
+        self.assertIs(get_s3_client(), get_s3_client())
+
+    def test_url_is_presigned_and_short_lived(self):
+        url = S3MediaStorage().url("lesson_videos/originals/intro.mp4")
+
+        self.assertIn("lms-media", url)
+        self.assertIn("X-Amz-Expires=120", url)
+        self.assertIn("X-Amz-Signature=", url)
+
+    @unittest.skipIf(moto is None, "moto is not installed")
+    def test_round_trip(self):
+        with moto.mock_aws():
+            get_s3_client().create_bucket(Bucket='lms-media')
+            storage = S3MediaStorage()
+
+            name = storage.save("lesson_documents/originals/notes.pdf", ContentFile(b"%PDF-1.7"))
+
+            self.assertTrue(storage.exists(name))
+            self.assertEqual(storage.size(name), 8)
+            with storage.open(name) as handle:
+                self.assertEqual(handle.read(), b"%PDF-1.7")
+            self.assertEqual(S3MediaStorage(location="lesson_documents").listdir(""), (["originals"], []))
+            storage.delete(name)
+            self.assertFalse(storage.exists(name))
+
+    @unittest.skipIf(moto is None, "moto is not installed")
+    def test_hls_playlists_lead_to_presigned_segments(self):
+        import requests
+
+        user = get_user_model().objects.create_user(email="s@example.com", password="pass1234", full_name="S")
+        client = APIClient()
+        client.force_authenticate(user)
+        course = make_course(Category.objects.create(name="Video"), "Video", chapters=1, lessons=0)
+        lesson = Lesson.objects.create(
+            chapter=course.chapters.get(), title="Intro", content_type='video',
+            transcode_status='ready', hls_playlist="lesson_videos/hls/1/abc/master.m3u8",
+        )
+        with moto.mock_aws():
+            get_s3_client().create_bucket(Bucket='lms-media')
+            storage = S3MediaStorage()
+            storage.save("lesson_videos/hls/1/abc/master.m3u8", ContentFile(b"#EXTM3U\nv0/index.m3u8\n"))
+            storage.save("lesson_videos/hls/1/abc/v0/index.m3u8", ContentFile(b"#EXTM3U\nseg_00000.ts\n"))
+            storage.save("lesson_videos/hls/1/abc/v0/seg_00000.ts", ContentFile(b"segment"))
+
+            with mock.patch.object(Lesson._meta.get_field('video_file'), 'storage', storage):
+                url = reverse('lesson-hls', args=[lesson.pk, 'master.m3u8'])
+                for _ in range(2):
+                    playlist = client.get(url)
+                    self.assertEqual(playlist.status_code, 200)
+                    # Resolve the last URI the way a player does.
+                    url = urljoin(url, playlist.content.decode().split()[-1])
+                segment = client.get(url)
+
+            self.assertEqual(segment.status_code, 302)
+            self.assertIn("X-Amz-Signature=", segment['Location'])
+            self.assertEqual(requests.get(segment['Location']).content, b"segment")
+
+
+class ChunkedUploadTests(TestCase):
+    payload = bytes(range(256)) * 10
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=f"{root}/media", UPLOAD_STAGING_ROOT=f"{root}/staging",
+            UPLOAD_MIN_PART_SIZE=1, UPLOAD_PART_SIZE=1000,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="instructor@example.com", password="pass1234", full_name="Instructor", role='instructor'
+        )
+        self.client.force_authenticate(self.user)
+        course = make_course(Category.objects.create(name="Video"), "Video", chapters=1, lessons=0)
+        self.lesson = Lesson.objects.create(chapter=course.chapters.get(), title="Intro", content_type='video')
+
+    def start(self):
+        response = self.client.post(
+            reverse('lesson-upload-create', args=[self.lesson.pk]),
+            {'field': 'video_file', 'filename': 'intro.mp4', 'total_size': len(self.payload)},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def put_part(self, upload_id, number, data, checksum=None):
+        headers = {'X-Checksum-SHA256': checksum} if checksum else {}
+        return self.client.put(
+            reverse('lesson-upload-part', args=[upload_id, number]),
+            data, content_type='application/octet-stream', headers=headers,
+        )
+
+    def test_parts_resume_and_assemble(self):
+        upload = self.start()
+        self.assertEqual(upload['part_count'], 3)
+        chunks = [self.payload[i:i + 1000] for i in range(0, len(self.payload), 1000)]
+
+        self.assertEqual(self.put_part(upload['id'], 3, chunks[2]).status_code, 200)
+        self.assertEqual(self.put_part(upload['id'], 1, chunks[0]).status_code, 200)
+        incomplete = self.client.post(reverse('lesson-upload-complete', args=[upload['id']]))
+        self.assertEqual(incomplete.status_code, 400)
+        self.assertEqual(incomplete.data['missing_parts'], ['2'])
+
+        status = self.client.get(reverse('lesson-upload-detail', args=[upload['id']]))
+        self.assertEqual([part['number'] for part in status.data['received_parts']], [1, 3])
+
+        checksum = hashlib.sha256(chunks[1]).hexdigest()
+        self.assertEqual(self.put_part(upload['id'], 2, chunks[1], checksum).status_code, 200)
+        response = self.client.post(reverse('lesson-upload-complete', args=[upload['id']]))
+
+        self.assertEqual(response.data['status'], 'completed')
+        self.lesson.refresh_from_db()
+        with self.lesson.video_file.open('rb') as handle:
+            self.assertEqual(handle.read(), self.payload)
+        self.assertEqual(self.lesson.transcode_status, 'queued')
+
+    def test_rejects_bad_checksum_and_size(self):
+        upload = self.start()
+        chunk = self.payload[:1000]
+
+        self.assertEqual(self.put_part(upload['id'], 1, chunk, hashlib.sha256(b"x").hexdigest()).status_code, 400)
+        self.assertEqual(self.put_part(upload['id'], 1, chunk[:10]).status_code, 400)
+        self.assertEqual(self.put_part(upload['id'], 1, chunk + b"extra").status_code, 400)
+        self.assertFalse(LessonUploadPart.objects.exists())
+
+    def test_abort(self):
+        upload = self.start()
+        self.put_part(upload['id'], 1, self.payload[:1000])
+
+        response = self.client.delete(reverse('lesson-upload-detail', args=[upload['id']]))
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.put_part(upload['id'], 2, self.payload[1000:2000]).status_code, 400)
+
+
+def fake_ffmpeg(command, **kwargs):
+    """Stand in for ffprobe/ffmpeg: write the playlist layout ffmpeg would produce."""
+    if command[0] == 'ffprobe':
+        return subprocess.CompletedProcess(command, 0, stdout="1\n", stderr="")
+    output_dir = Path(command[-1]).parent.parent
+    (output_dir / 'master.m3u8').write_text("#EXTM3U\nv0/index.m3u8\n")
+    (output_dir / 'v0').mkdir()
+    (output_dir / 'v0' / 'index.m3u8').write_text("#EXTM3U\n#EXT-X-KEY:METHOD=AES-128\nseg_00000.ts\n")
+    (output_dir / 'v0' / 'seg_00000.ts').write_bytes(b"segment")
+    return subprocess.CompletedProcess(command, 0, stdout=b"", stderr=b"")
+
+
+@override_settings(FFMPEG_BINARY='ffmpeg', FFPROBE_BINARY='ffprobe', HLS_LADDER='360:800k,720:2800k')
+class TranscodeTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="student@example.com", password="pass1234", full_name="Student"
+        )
+        self.client.force_authenticate(self.user)
+        course = make_course(Category.objects.create(name="Video"), "Video", chapters=1, lessons=0)
+        self.lesson = Lesson.objects.create(
+            chapter=course.chapters.get(), title="Intro", content_type='video',
+            video_file=SimpleUploadedFile("intro.mp4", b"not really a video"),
+        )
+        full_key = derive_lesson_key(self.user, self.lesson)
+        self.partial_key = base64.b64encode(full_key[:len(full_key) * 3 // 4]).decode()
+
+    def test_command_builds_encrypted_ladder(self):
+        command = build_ffmpeg_command('in.mp4', '/out', '/tmp/key.info', [(360, '800k'), (720, '2800k')])
+
+        self.assertIn('[0:v]split=2[v0][v1];[v0]scale=w=-2:h=360[v0out];[v1]scale=w=-2:h=720[v1out]', command)
+        self.assertEqual(command[command.index('-hls_key_info_file') + 1], '/tmp/key.info')
+        self.assertEqual(command[command.index('-var_stream_map') + 1], 'v:0,a:0 v:1,a:1')
+
+    def test_worker_publishes_playlist_and_gates_key(self):
+        enqueue_transcode(self.lesson)
+        with mock.patch('courses.transcoding.subprocess.run', side_effect=fake_ffmpeg):
+            call_command('transcode_worker', '--once', stdout=mock.Mock())
+
+        self.lesson.refresh_from_db()
+        self.assertEqual(self.lesson.transcode_status, 'ready')
+        self.assertEqual(len(bytes(self.lesson.hls_key)), 16)
+
+        playlist = self.client.get(reverse('lesson-hls', args=[self.lesson.pk, 'v0/index.m3u8']))
+        self.assertEqual(playlist.status_code, 200)
+        self.assertIn(b"AES-128", b''.join(playlist.streaming_content))
+        escape = self.client.get(reverse('lesson-hls', args=[self.lesson.pk, '../../intro.mp4']))
+        self.assertEqual(escape.status_code, 404)
+
+        key_url = reverse('lesson-hls-key', args=[self.lesson.pk])
+        self.assertEqual(self.client.get(key_url).status_code, 403)
+        key = self.client.get(key_url, {'partial_decryption_key': self.partial_key})
+        self.assertEqual(key.content, bytes(self.lesson.hls_key))
+
+    def test_failed_transcode_is_recorded(self):
+        enqueue_transcode(self.lesson)
+        error = subprocess.CalledProcessError(1, 'ffmpeg', stderr=b"Invalid data found")
+        with mock.patch('courses.transcoding.subprocess.run', side_effect=error):
+            call_command('transcode_worker', '--once', stdout=mock.Mock(), stderr=mock.Mock())
+
+        self.lesson.refresh_from_db()
+        self.assertEqual(self.lesson.transcode_status, 'failed')
+        self.assertIn("Invalid data found", self.lesson.transcode_error)
+
+    @override_settings(HLS_LADDER='360')
+    def test_unexpected_error_marks_lesson_failed(self):
+        enqueue_transcode(self.lesson)
+        with mock.patch('courses.transcoding.subprocess.run', side_effect=fake_ffmpeg):
+            call_command('transcode_worker', '--once', stdout=mock.Mock(), stderr=mock.Mock())
+
+        self.lesson.refresh_from_db()
+        self.assertEqual(self.lesson.transcode_status, 'failed')
+        self.assertIn("ValueError", self.lesson.transcode_error)
+
+    @override_settings(TRANSCODE_STALE_AFTER=60)
+    def test_job_of_a_dead_worker_is_reclaimed(self):
+        enqueue_transcode(self.lesson)
+        self.assertEqual(claim_next_job().pk, self.lesson.pk)
+        self.assertIsNone(claim_next_job())
+
+        Lesson.objects.filter(pk=self.lesson.pk).update(transcode_started_at=now() - timedelta(seconds=61))
+
+        self.assertEqual(claim_next_job().pk, self.lesson.pk)
+
+
+class EncryptedStorageTests(TestCase):
+    payload = os.urandom(300 * 1024 + 7)
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.storage = EncryptedFileSystemStorage(location=self.location)
+
+    def test_round_trip_and_ciphertext_on_disk(self):
+        name = self.storage.save("lesson_videos/originals/intro.mp4", ContentFile(self.payload))
+
+        with open(self.storage.path(name), 'rb') as raw:
+            self.assertNotIn(self.payload[:64], raw.read())
+        self.assertEqual(self.storage.size(name), len(self.payload))
+        with self.storage.open(name) as handle:
+            self.assertEqual(handle.read(), self.payload)
+
+    def test_random_access_reads(self):
+        name = self.storage.save("lesson_videos/originals/intro.mp4", ContentFile(self.payload))
+
+        with self.storage.open(name) as handle:
+            for offset in (0, 1, 15, 16, 17, 123457, len(self.payload) - 3):
+                handle.seek(offset)
+                self.assertEqual(handle.read(4096), self.payload[offset:offset + 4096])
+
+    def test_stream_endpoint_decrypts_ranges(self):
+        user = get_user_model().objects.create_user(
+            email="student@example.com", password="pass1234", full_name="Student"
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        course = make_course(Category.objects.create(name="Video"), "Video", chapters=1, lessons=0)
+        field = Lesson._meta.get_field('video_file')
+        with mock.patch.object(field, 'storage', self.storage), \
+                override_settings(MEDIA_DELIVERY_BACKEND='nginx'):
+            lesson = Lesson.objects.create(
+                chapter=course.chapters.get(), title="Intro", content_type='video',
+                video_file=SimpleUploadedFile("intro.mp4", self.payload),
+            )
+            full_key = derive_lesson_key(user, lesson)
+            response = client.get(
+                reverse('lesson-stream', args=[lesson.pk, 'video']),
+                {'partial_decryption_key': base64.b64encode(full_key[:24]).decode()},
+                headers={'Range': 'bytes=100000-100099'},
+            )
+
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(b''.join(response.streaming_content), self.payload[100000:100100])
+
+    def test_files_stored_before_encryption_are_readable_then_encrypted(self):
+        plain = FileSystemStorage(location=self.location).save("lesson_videos/originals/old.mp4", ContentFile(self.payload))
+        self.assertEqual(self.storage.size(plain), len(self.payload))
+        with self.storage.open(plain) as handle:
+            handle.seek(123457)
+            self.assertEqual(handle.read(10), self.payload[123457:123467])
+
+        with mock.patch('courses.management.commands.encrypt_existing_lesson_media.lesson_media_storage',
+                        return_value=self.storage):
+            call_command('encrypt_existing_lesson_media', stdout=StringIO())
+            output = StringIO()
+            call_command('encrypt_existing_lesson_media', stdout=output)
+
+        self.assertIn("Encrypted 0 files", output.getvalue())
+        self.assertTrue(self.storage.is_encrypted(plain))
+        self.assertEqual(self.storage.size(plain), len(self.payload))
+        with self.storage.open(plain) as handle:
+            self.assertEqual(handle.read(), self.payload)
+
+
+@override_settings(QUERY_BUDGET_ACTION='raise', CATALOG_CACHE_ENABLED=True)
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Programming")
+        self.course = make_course(self.category, "Python")
+
+    def get_course(self, client=None):
+        return (client or self.client).get(reverse('course-detail', args=[self.course.pk]))
+
+    def test_second_read_is_served_from_cache(self):
+        self.assertEqual(self.get_course()['X-Catalog-Cache'], 'miss')
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.get_course()
+
+        self.assertEqual(response['X-Catalog-Cache'], 'hit')
+        # Only the ETag / Last-Modified aggregate reaches the database.
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(response.data['title'], "Python")
+
+    def test_saving_any_catalog_model_invalidates(self):
+        self.get_course()
+
+        lesson = Lesson.objects.first()
+        lesson.title = "Renamed"
+        lesson.save()
+        response = self.get_course()
+
+        self.assertEqual(response['X-Catalog-Cache'], 'miss')
+        titles = [l['title'] for chapter in response.data['chapters'] for l in chapter['lessons']]
+        self.assertIn("Renamed", titles)
+
+    def test_version_is_bumped_again_on_commit(self):
+        lesson = Lesson.objects.first()
+        with self.captureOnCommitCallbacks() as callbacks:
+            lesson.save()
+            self.get_course()
+            stale_version = catalog_version()
+
+        for callback in callbacks:
+            callback()
+        self.assertGreater(catalog_version(), stale_version)
+        self.assertEqual(self.get_course()['X-Catalog-Cache'], 'miss')
+
+    def test_evicted_version_does_not_restart_from_one(self):
+        version = catalog_version()
+        cache.delete(VERSION_KEY)
+        self.assertGreater(catalog_version(), version)
+
+    def test_user_keys_are_merged_after_lookup(self):
+        users = [
+            get_user_model().objects.create_user(email=f"u{i}@example.com", password="pass1234", full_name="U")
+            for i in range(2)
+        ]
+        payloads = []
+        for user in users:
+            client = APIClient()
+            client.force_authenticate(user)
+            payloads.append(self.get_course(client))
+
+        self.assertEqual(payloads[1]['X-Catalog-Cache'], 'hit')
+        first_lessons = payloads[0].data['chapters'][0]['lessons']
+        second_lessons = payloads[1].data['chapters'][0]['lessons']
+        self.assertTrue(all(lesson['partial_decryption_key'] for lesson in second_lessons))
+        self.assertNotEqual(first_lessons[0]['partial_decryption_key'], second_lessons[0]['partial_decryption_key'])
+        anonymous = self.get_course()
+        self.assertIsNone(anonymous.data['chapters'][0]['lessons'][0]['partial_decryption_key'])
+
+    def test_stats_endpoint(self):
+        admin = get_user_model().objects.create_superuser(email="admin@example.com", password="pass1234", full_name="A")
+        self.get_course()
+        self.get_course()
+        self.client.force_authenticate(admin)
+
+        stats = self.client.get(reverse('catalog-cache-stats')).data
+
+        self.assertGreaterEqual(stats['hits'], 1)
+        self.assertGreaterEqual(stats['misses'], 1)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.course = make_course(Category.objects.create(name="Programming"), "Python")
+        self.url = reverse('course-detail', args=[self.course.pk])
+
+    def test_matching_etag_returns_304(self):
+        first = self.client.get(self.url)
+        self.assertIn('ETag', first)
+        self.assertIn('Last-Modified', first)
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(self.url, headers={'If-None-Match': first['ETag']})
+
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_lesson_change_bubbles_up_to_course_validators(self):
+        etag = self.client.get(self.url)['ETag']
+        chapter = self.course.chapters.first()
+        chapter_url = reverse('chapter-detail', args=[chapter.pk])
+        chapter_etag = self.client.get(chapter_url)['ETag']
+
+        lesson = chapter.lessons.first()
+        lesson.title = "Changed"
+        lesson.save()
+
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': etag}).status_code, 200)
+        self.assertEqual(self.client.get(chapter_url, headers={'If-None-Match': chapter_etag}).status_code, 200)
+
+    def test_list_validators_change_when_a_lesson_is_deleted(self):
+        url = reverse('lesson-list')
+        first = self.client.get(url)
+        # The newest updated_at survives a delete, so lists carry no Last-Modified.
+        self.assertNotIn('Last-Modified', first)
+
+        Lesson.objects.first().delete()
+
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': first['ETag']}).status_code, 200)
+        self.assertEqual(self.client.get(url, headers={'If-Modified-Since': http_date()}).status_code, 200)
+
+    def test_etag_is_per_user(self):
+        anonymous = self.client.get(self.url)['ETag']
+        user = get_user_model().objects.create_user(email="u@example.com", password="pass1234", full_name="U")
+        self.client.force_authenticate(user)
+
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': anonymous}).status_code, 200)
+
+    def test_category_change_invalidates_course_validators(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.course.category.name = "Software"
+        self.course.category.save()
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['category']['name'], "Software")
+
+        etag = response['ETag']
+        self.course.category.delete()
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': etag}).status_code, 200)
+
+    @override_settings(CATALOG_CACHE_ENABLED=True)
+    def test_etag_follows_the_catalog_version(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first['X-Catalog-Cache'], 'miss')
+
+        # A new version means the cached body may differ even though no
+        # course row did.
+        increment_version()
+        second = self.client.get(self.url, headers={'If-None-Match': first['ETag']})
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second['X-Catalog-Cache'], 'miss')
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': second['ETag']}).status_code, 304)
+
+
+class CourseOutlineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.course = make_course(Category.objects.create(name="Programming"), "Python")
+        self.url = reverse('course-detail', args=[self.course.pk])
+
+    def test_lesson_change_rebuilds_outline_on_commit(self):
+        lesson = Lesson.objects.filter(chapter__course=self.course).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson.title = "Renamed"
+            lesson.save()
+
+        outline = CourseOutline.objects.get(course=self.course)
+        self.assertEqual(outline.data[0]['lessons'][0]['title'], "Renamed")
+        self.assertEqual((outline.chapter_count, outline.lesson_count), (2, 6))
+
+    def test_stale_outline_is_repaired_on_read(self):
+        CourseOutline.objects.filter(course=self.course).delete()
+        Chapter.objects.filter(course=self.course, order=1).delete()
+
+        data = self.client.get(self.url).data
+
+        self.assertEqual(len(data['chapters']), 1)
+        self.assertEqual(data['lesson_count'], 3)
+        self.assertTrue(CourseOutline.objects.filter(course=self.course).exists())
+
+    def test_check_command_reports_and_fixes_drift(self):
+        CourseOutline.objects.filter(course=self.course).update(lesson_count=0)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_course_outlines', '--check', stdout=StringIO())
+        call_command('rebuild_course_outlines', '--check', '--fix', stdout=StringIO())
+
+        self.assertEqual(CourseOutline.objects.get(course=self.course).lesson_count, 6)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "index plans are only checked on PostgreSQL")
+class HotPathIndexTests(TestCase):
+    def test_hot_paths_use_their_index(self):
+        # Tiny tables always favour a sequential scan, so disable it and check
+        # that every hot path falls back on the index meant for it. The
+        # full-size check is `manage.py explain_hot_paths`.
+        course = make_course(Category.objects.create(name="Programming"), "Python")
+        user = get_user_model().objects.create_user(email="u@example.com", password="pass1234", full_name="U")
+        lessons = list(Lesson.objects.filter(chapter__course=course))
+        UserLessonKey.objects.issue_for(user, lessons)
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        queries = hot_path_queries(
+            course.pk, list(course.chapters.values_list('pk', flat=True)), user.pk, [lesson.pk for lesson in lessons]
+        )
+        for name, table, index, queryset in queries:
+            with self.subTest(name):
+                plan = queryset.explain()
+                self.assertEqual(sequential_scans(plan, table), [])
+                self.assertTrue(uses_index(plan, index), plan)
+
+
+class CourseOutlineAuthoringTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(email="teacher@example.com", password="pass1234", full_name="T")
+        )
+        self.course = make_course(Category.objects.create(name="Programming"), "Python")
+        self.url = reverse('course-outline', args=[self.course.pk])
+        first, second = self.course.chapters.order_by('order')
+        self.first = list(first.lessons.order_by('order'))
+        self.second = list(second.lessons.order_by('order'))
+        self.outline = {'chapters': [
+            {'id': first.pk, 'title': first.title, 'lessons': [{'id': l.pk, 'title': l.title} for l in self.first]},
+            {'id': second.pk, 'title': second.title, 'lessons': [{'id': l.pk, 'title': l.title} for l in self.second]},
+        ]}
+
+    def put(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.put(self.url, self.outline, format='json')
+
+    def statuses(self, response):
+        return {(item['type'], item['id']): item['status'] for item in response.data['results']}
+
+    def test_unchanged_outline_writes_nothing(self):
+        updated_at = Course.objects.get(pk=self.course.pk).updated_at
+        response = self.put()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(self.statuses(response).values()), {'unchanged'})
+        self.assertEqual(Course.objects.get(pk=self.course.pk).updated_at, updated_at)
+
+    def test_diff_is_applied_in_bulk(self):
+        chapters = self.outline['chapters']
+        chapters[0]['title'] = "Basics"
+        chapters[0]['lessons'].reverse()
+        chapters[0]['lessons'].append(chapters[1]['lessons'].pop(0))
+        chapters[1]['lessons'].append({'title': "New", 'content_type': 'text'})
+        chapters.append({'title': "Extra", 'lessons': [{'title': "Extra 1", 'content_type': 'quiz'}]})
+        moved = self.second[0]
+
+        response = self.put()
+
+        self.assertEqual(response.status_code, 200)
+        statuses = self.statuses(response)
+        self.assertEqual(statuses[('chapter', chapters[0]['id'])], 'updated')
+        self.assertEqual(statuses[('lesson', self.first[1].pk)], 'unchanged')
+        self.assertEqual(statuses[('lesson', self.first[0].pk)], 'reordered')
+        self.assertEqual(statuses[('lesson', moved.pk)], 'moved')
+        self.assertEqual(list(statuses.values()).count('created'), 3)
+
+        moved.refresh_from_db()
+        self.assertEqual((moved.chapter_id, moved.order), (chapters[0]['id'], 3))
+        self.assertEqual(
+            [l['title'] for l in CourseOutline.objects.get(course=self.course).data[1]['lessons']],
+            ["Python l1", "Python l2", "New"],
+        )
+
+    def test_missing_rows_are_deleted(self):
+        del self.outline['chapters'][1]
+        self.outline['chapters'][0]['lessons'].pop()
+
+        response = self.put()
+
+        # The dropped chapter, its three lessons and the last lesson of the first.
+        self.assertEqual(list(self.statuses(response).values()).count('deleted'), 5)
+        self.assertEqual(Lesson.objects.filter(chapter__course=self.course).count(), 2)
+
+    def test_deletes_run_a_fixed_number_of_queries(self):
+        user = get_user_model().objects.create_user(email="s@example.com", password="pass1234", full_name="S")
+
+        def drop_lessons(count):
+            course = make_course(self.course.category, f"Drop {count}", chapters=1, lessons=count + 1)
+            chapter = course.chapters.get()
+            kept, *dropped = chapter.lessons.order_by('order')
+            UserLessonKey.objects.issue_for(user, [kept, *dropped])
+            outline = {'chapters': [
+                {'id': chapter.pk, 'title': chapter.title, 'lessons': [{'id': kept.pk, 'title': kept.title}]},
+            ]}
+            with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+                response = self.client.put(reverse('course-outline', args=[course.pk]), outline, format='json')
+
+            self.assertEqual(list(self.statuses(response).values()).count('deleted'), count)
+            self.assertEqual(UserLessonKey.objects.filter(lesson__chapter=chapter).count(), 1)
+            # The chapter lost lessons, so its validators must change.
+            self.assertGreater(Chapter.objects.get(pk=chapter.pk).updated_at, chapter.updated_at)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(drop_lessons(1), drop_lessons(5))
+
+    def test_foreign_ids_are_rejected(self):
+        other = make_course(Category.objects.create(name="Other"), "Other", chapters=1, lessons=1)
+        self.outline['chapters'][0]['lessons'].append({'id': Lesson.objects.get(chapter__course=other).pk, 'title': "x"})
+
+        response = self.put()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('chapters[0].lessons[3].id', response.data)
+
+
+@override_settings(QUERY_BUDGET_ACTION='raise')
+class CatalogSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('catalog-search')
+        programming = Category.objects.create(name="Programming")
+        self.in_title = Course.objects.create(title="Python Basics", description="Start here.", category=programming)
+        self.in_description = Course.objects.create(
+            title="Data Analysis", description="Uses Python and pandas.", category=programming,
+        )
+        self.unrelated = Course.objects.create(title="Watercolour", description="Painting.")
+        chapter = Chapter.objects.create(course=self.unrelated, title="Intro", order=0)
+        self.lesson = Lesson.objects.create(
+            chapter=chapter, title="Mixing", content="Pythons make poor brushes.", content_type='text', order=0,
+        )
+
+    def test_prefix_match_ranks_title_above_description(self):
+        response = self.client.get(self.url, {'q': "pyth", 'type': 'courses'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c['id'] for c in response.data['courses']], [self.in_title.pk, self.in_description.pk])
+        self.assertNotIn('lessons', response.data)
+
+    def test_only_the_last_word_is_a_prefix(self):
+        def found(text):
+            return [c['id'] for c in self.client.get(self.url, {'q': text, 'type': 'courses'}).data['courses']]
+
+        self.assertEqual(found("python basi"), [self.in_title.pk])
+        self.assertEqual(found("pyth basi"), [])
+
+    def test_title_hits_survive_the_candidate_cap(self):
+        for i in range(5):
+            Course.objects.create(title=f"Course {i}", description="More python exercises.")
+        latest = Course.objects.create(title="Python Idioms", description="Write it well.")
+
+        with mock.patch('courses.search.MAX_RANKED', 2):
+            response = self.client.get(self.url, {'q': "pyth", 'type': 'courses'})
+
+        self.assertEqual({c['id'] for c in response.data['courses'][:2]}, {self.in_title.pk, latest.pk})
+
+    def test_candidates_come_from_the_gin_indexes(self):
+        # Tiny tables favour sequential scans; see explain_hot_paths for why.
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+        plan = lesson_results(prefix_query("pyth"))[:20].explain()
+
+        for index in ('lesson_title_search_idx', 'lesson_search_idx'):
+            self.assertTrue(uses_index(plan, index), plan)
+        self.assertNotIn('SubPlan', plan)
+
+    def test_lessons_and_categories(self):
+        response = self.client.get(self.url, {'q': "python"})
+        self.assertEqual(response.data['lessons'][0]['course_id'], self.unrelated.pk)
+        self.assertEqual(response.data['categories'], [])
+
+        # Courses in a matching category are returned even without a text hit.
+        response = self.client.get(self.url, {'q': "program"})
+        self.assertEqual([c['name'] for c in response.data['categories']], ["Programming"])
+        self.assertEqual({c['id'] for c in response.data['courses']}, {self.in_title.pk, self.in_description.pk})
+
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'q': "?!"}).data['courses'], [])
+
+
+class RequestTimingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        make_course(Category.objects.create(name="Programming"), "Python")
+
+    @override_settings(SERVER_TIMING_HEADER=True, CATALOG_CACHE_ENABLED=True)
+    def test_server_timing_header_and_log_line(self):
+        with self.assertLogs('root.timing', 'DEBUG') as logs:
+            response = self.client.get(reverse('course-list'))
+
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", serializer;dur=[\d.]+, ')
+        self.assertIn('cache;desc="0 hits, 1 misses"', response['Server-Timing'])
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((record['view'], record['status'], record['cache_misses']), ('course-list', 200, 1))
+        self.assertGreater(record['db_queries'], 0)
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_can_be_turned_off(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('course-list')))
+
+    @override_settings(QUERY_BUDGETS={'course-list': 1})
+    def test_query_budget(self):
+        with self.assertLogs('root.timing', 'WARNING') as logs:
+            self.assertEqual(self.client.get(reverse('course-list')).status_code, 200)
+        self.assertIn("budget is 1", logs.output[-1])
+
+        cache.clear()
+        with override_settings(QUERY_BUDGET_ACTION='raise'), self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('course-list'))
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(email="student@example.com", password="pass1234", full_name="S")
+        )
+        self.course = make_course(Category.objects.create(name="Programming"), "Python")
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_and_key_issuance_are_counted(self):
+        requests = self.sample('lms_http_request_duration_seconds_count', view='course-detail', method='GET')
+        issued = self.sample('lms_lesson_keys_issued_total')
+
+        self.client.get(reverse('course-detail', args=[self.course.pk]))
+
+        self.assertEqual(self.sample('lms_http_request_duration_seconds_count', view='course-detail', method='GET'),
+                         requests + 1)
+        self.assertEqual(self.sample('lms_lesson_keys_issued_total'), issued + 6)
+        with override_settings(METRICS_PUBLIC=True):
+            body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('lms_db_queries_per_request_bucket{le="0.0",view="course-detail"}', body)
+
+    @override_settings(METRICS_TOKEN="scrape-secret")
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), headers={'Authorization': "Bearer scrape-secret"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_exposed_without_token_or_opt_in(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        with override_settings(METRICS_ENABLED=False, METRICS_PUBLIC=True):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+
+class RequestProfilingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        self.storage = FileSystemStorage(location=location)
+        storage_patch = mock.patch('root.profiling.profile_storage', return_value=self.storage)
+        storage_patch.start()
+        self.addCleanup(storage_patch.stop)
+
+        self.course = make_course(Category.objects.create(name="Programming"), "Python")
+        self.staff = get_user_model().objects.create_user(
+            email="staff@example.com", password="pass1234", full_name="Staff", is_staff=True, is_active=True,
+        )
+        self.student = get_user_model().objects.create_user(
+            email="student@example.com", password="pass1234", full_name="Student", is_active=True,
+        )
+
+    def get(self, url, user, **headers):
+        return APIClient().get(url, headers={'Authorization': f"Bearer {AccessToken.for_user(user)}", **headers})
+
+    def test_staff_header_profiles_one_request(self):
+        response = self.get(reverse('course-list'), self.staff, X_Profile='1')
+
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+        with self.storage.open(f"{profile_id}.json") as handle:
+            report = json.load(handle)
+        self.assertEqual((report['view'], report['status']), ('course-list', 200))
+        self.assertTrue(self.storage.exists(f"{profile_id}.collapsed"))
+
+        listing = self.get(reverse('profile-list'), self.staff)
+        self.assertEqual([entry['id'] for entry in listing.data], [profile_id])
+        download = self.get(reverse('profile-download', args=[f"{profile_id}.json"]), self.staff)
+        self.assertEqual(json.loads(b''.join(download.streaming_content))['id'], profile_id)
+
+    def test_header_is_ignored_for_other_users(self):
+        response = self.get(reverse('course-list'), self.student, X_Profile='1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(self.get(reverse('profile-list'), self.student).status_code, 403)
+
+    @override_settings(PROFILE_SAMPLE_RATE=1.0, PROFILE_VIEWS=['course-detail'])
+    def test_sampling_is_limited_to_profile_views(self):
+        self.assertNotIn('X-Profile-Id', self.get(reverse('course-list'), self.student))
+        self.assertIn('X-Profile-Id', self.get(reverse('course-detail', args=[self.course.pk]), self.student))
+
+    @override_settings(PROFILE_MAX_COUNT=2)
+    def test_only_the_newest_profiles_are_kept(self):
+        for stamp in ('20260101T000000', '20260102T000000'):
+            self.storage.save(f"{stamp}-old-1.json", ContentFile(b"{}"))
+            self.storage.save(f"{stamp}-old-1.collapsed", ContentFile(b""))
+
+        profile_id = self.get(reverse('course-list'), self.staff, X_Profile='1')['X-Profile-Id']
+
+        self.assertEqual(sorted(self.storage.listdir('')[1]), sorted([
+            f"{profile_id}.json", f"{profile_id}.collapsed", "20260102T000000-old-1.json", "20260102T000000-old-1.collapsed",
+        ]))
+
+    async def test_async_view_is_profiled_on_the_event_loop(self):
+        lesson = await Lesson.objects.filter(chapter__course=self.course).afirst()
+        headers = {'Authorization': f"Bearer {AccessToken.for_user(self.staff)}", 'X-Profile': '1'}
+
+        response = await AsyncClient().get(reverse('lesson-detail', args=[lesson.pk]), headers=headers)
+
+        self.assertEqual(response.status_code, 200)
+        with self.storage.open(f"{response['X-Profile-Id']}.json") as handle:
+            self.assertEqual(json.load(handle)['view'], 'lesson-detail')
+
+    def test_middleware_follows_the_handler_mode(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(ProfilingMiddleware(get_response)))
+        self.assertFalse(iscoroutinefunction(ProfilingMiddleware(lambda request: HttpResponse())))
+
+    def test_sampler_output_is_collapsed_stacks(self):
+        def busy_loop():
+            deadline = time.perf_counter() + 0.1
+            while time.perf_counter() < deadline:
+                pass
+
+        sampler = StackSampler(0.001)
+        sampler.start()
+        busy_loop()
+        sampler.stop()
+
+        lines = sampler.collapsed().splitlines()
+        self.assertRegex(lines[0], r'^[^;]+(;[^;]+)* \d+$')
+        self.assertTrue(any('busy_loop (' in line for line in lines))
+        self.assertTrue(any(
+            entry['function'].startswith('busy_loop (') and entry['self'] > 0 for entry in sampler.top_functions()
+        ))
+
+
+class BenchmarkSuiteTests(TestCase):
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        storage = FileSystemStorage(location=location)
+        for patch in (
+            mock.patch.object(KYC._meta.get_field('document_file'), 'storage', storage),
+            mock.patch('courses.management.commands.generate_synthetic_data.kyc_document_storage',
+                       return_value=storage),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    @override_settings(PBKDF2_ITERATIONS=1000, QUERY_BUDGET_ACTION='raise')
+    def test_generate_then_benchmark_every_scenario(self):
+        call_command('generate_synthetic_data', '--scale', '0.002', stdout=StringIO())
+        self.assertEqual(Lesson.objects.count(), 2 * CHAPTERS_PER_COURSE * LESSONS_PER_CHAPTER)
+        self.assertEqual(CourseOutline.objects.count(), 2)
+
+        output = os.path.join(tempfile.mkdtemp(), "results.json")
+        self.addCleanup(shutil.rmtree, os.path.dirname(output))
+        call_command('benchmark_api', '--requests', '3', '--warmup', '0', '--output', output, stdout=StringIO())
+
+        with open(output) as handle:
+            results = {row['scenario']: row for row in json.load(handle)['results']}
+        self.assertEqual(set(results), set(BENCHMARK_SCENARIOS))
+        for scenario, row in results.items():
+            with self.subTest(scenario):
+                self.assertEqual((row['requests'], row['errors']), (3, 0))
+                self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+
+        # The tokens also work with JWT_AUTH_MODE=stateless.
+        token = next(iter(Dataset('synthetic', random.Random(0)).tokens.values()))
+        self.assertEqual(StatelessJWTAuthentication().get_user(AccessToken(token)).role, 'instructor')
+
+    def test_https_base_url(self):
+        transport = HTTPTransport('https://staging.example.com')
+        self.assertEqual((transport.https, transport.port), (True, 443))
+        self.assertEqual(HTTPTransport('http://localhost:8001').port, 8001)
@@ -0,0 +1,163 @@
+import os
+import posixpath
+import shutil
+import subprocess
+import tempfile
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.urls import reverse
+from django.utils.timezone import now
+
+from .models import Lesson
+
+
+def parse_ladder(value):
+    """Parse "360:800k,720:2800k" into [(360, "800k"), (720, "2800k")]."""
+    ladder = []
+    for rung in value.split(','):
+        height, bitrate = rung.strip().split(':')
+        ladder.append((int(height), bitrate))
+    return ladder
+
+
+def enqueue_transcode(lesson):
+    """Queue a lesson's video for the transcode worker, creating its segment key once."""
+    if not lesson.hls_key:
+        lesson.hls_key = os.urandom(16)
+    lesson.transcode_status = 'queued'
+    lesson.transcode_error = ''
+    lesson.save(update_fields=['hls_key', 'transcode_status', 'transcode_error'])
+
+
+def claim_next_job():
+    """
+    Mark the oldest queued lesson as processing and return it. Rows are locked
+    with SKIP LOCKED so several workers can drain the queue side by side. A
+    lesson still processing TRANSCODE_STALE_AFTER seconds after it was claimed
+    belongs to a worker that died, and is claimed again.
+    """
+    stale = now() - timedelta(seconds=settings.TRANSCODE_STALE_AFTER)
+    with transaction.atomic():
+        pending = Lesson.objects.select_for_update(skip_locked=True).order_by('id')
+        lesson = (
+            pending.filter(transcode_status='queued').first()
+            or pending.filter(transcode_status='processing', transcode_started_at__lt=stale).first()
+        )
+        if lesson is None:
+            return None
+        lesson.transcode_status = 'processing'
+        lesson.transcode_started_at = now()
+        lesson.save(update_fields=['transcode_status', 'transcode_started_at'])
+    return lesson
+
+
+def has_audio(source):
+    result = subprocess.run(
+        [settings.FFPROBE_BINARY, '-v', 'error', '-select_streams', 'a',
+         '-show_entries', 'stream=index', '-of', 'csv=p=0', str(source)],
+        capture_output=True, text=True, check=True,
+    )
+    return bool(result.stdout.strip())
+
+
+def build_ffmpeg_command(source, output_dir, key_info_file, ladder, audio=True):
+    """Build one ffmpeg run that writes every rendition plus a master playlist."""
+    split = ''.join(f'[v{i}]' for i in range(len(ladder)))
+    filters = [f'[0:v]split={len(ladder)}{split}']
+    filters += [f'[v{i}]scale=w=-2:h={height}[v{i}out]' for i, (height, _) in enumerate(ladder)]
+
+    command = [settings.FFMPEG_BINARY, '-y', '-i', str(source), '-filter_complex', ';'.join(filters)]
+    stream_map = []
+    for i, (_, bitrate) in enumerate(ladder):
+        command += [
+            '-map', f'[v{i}out]', f'-c:v:{i}', 'libx264', f'-b:v:{i}', bitrate,
+        ]
+        if audio:
+            command += ['-map', '0:a:0', f'-c:a:{i}', 'aac', f'-b:a:{i}', '128k']
+            stream_map.append(f'v:{i},a:{i}')
+        else:
+            stream_map.append(f'v:{i}')
+
+    command += [
+        '-preset', 'veryfast',
+        # Keyframes on every segment boundary keep renditions switchable.
+        '-force_key_frames', f'expr:gte(t,n_forced*{settings.HLS_SEGMENT_SECONDS})',
+        '-sc_threshold', '0',
+        '-f', 'hls',
+        '-hls_time', str(settings.HLS_SEGMENT_SECONDS),
+        '-hls_playlist_type', 'vod',
+        '-hls_key_info_file', str(key_info_file),
+        '-hls_segment_filename', str(Path(output_dir) / 'v%v' / 'seg_%05d.ts'),
+        '-master_pl_name', 'master.m3u8',
+        '-var_stream_map', ' '.join(stream_map),
+        str(Path(output_dir) / 'v%v' / 'index.m3u8'),
+    ]
+    return command
+
+
+def local_source(lesson, workdir):
+    """
+    Return a filesystem path for the original, downloading it from remote
+    storage (or decrypting it) into the work directory if needed.
+    """
+    try:
+        if not getattr(lesson.video_file.storage, 'encrypted_at_rest', False):
+            return lesson.video_file.path
+    except NotImplementedError:
+        pass
+    target = Path(workdir) / Path(lesson.video_file.name).name
+    with lesson.video_file.open('rb') as source, open(target, 'wb') as destination:
+        shutil.copyfileobj(source, destination, settings.MEDIA_STREAM_CHUNK_SIZE)
+    return target
+
+
+def transcode_lesson(lesson):
+    """Transcode one lesson to an encrypted HLS ladder and record the outcome on the lesson."""
+    storage = lesson.video_file.storage
+    prefix = posixpath.join('lesson_videos', 'hls', str(lesson.id), uuid.uuid4().hex)
+
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            source = local_source(lesson, workdir)
+            output_dir = Path(workdir) / 'out'
+            output_dir.mkdir()
+
+            key_file = Path(workdir) / 'segment.key'
+            key_file.write_bytes(bytes(lesson.hls_key))
+            key_info_file = Path(workdir) / 'segment.keyinfo'
+            key_uri = settings.HLS_KEY_URL_BASE + reverse('lesson-hls-key', args=[lesson.id])
+            key_info_file.write_text(f"{key_uri}\n{key_file}\n")
+
+            command = build_ffmpeg_command(
+                source, output_dir, key_info_file,
+                parse_ladder(settings.HLS_LADDER), audio=has_audio(source),
+            )
+            subprocess.run(command, capture_output=True, check=True, timeout=settings.TRANSCODE_TIMEOUT)
+
+            for path in sorted(output_dir.rglob('*')):
+                if path.is_file():
+                    name = posixpath.join(prefix, path.relative_to(output_dir).as_posix())
+                    with open(path, 'rb') as handle:
+                        storage.save(name, File(handle, name))
+    except Exception as exc:
+        # Anything left uncaught (a bad HLS_LADDER, a storage error while
+        # uploading segments) would leave the lesson processing for good.
+        stderr = getattr(exc, 'stderr', None) or b''
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode('utf-8', 'replace')
+        lesson.transcode_status = 'failed'
+        lesson.transcode_error = (stderr[-2000:] or f"{type(exc).__name__}: {exc}")
+        lesson.save(update_fields=['transcode_status', 'transcode_error'])
+        return lesson
+
+    lesson.transcode_status = 'ready'
+    lesson.transcode_error = ''
+    lesson.hls_playlist = posixpath.join(prefix, 'master.m3u8')
+    lesson.transcoded_at = now()
+    lesson.save(update_fields=['transcode_status', 'transcode_error', 'hls_playlist', 'transcoded_at'])
+    return lesson
@@ -0,0 +1,203 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils.timezone import now
+from rest_framework.exceptions import ValidationError
+
+from .models import Lesson, LessonUpload, LessonUploadPart
+from .storage import S3MediaStorage
+from .transcoding import enqueue_transcode
+
+SPOOL_SIZE = 1024 * 1024
+
+
+class AssembledFile(File):
+    """
+    A file assembled in the staging area. Exposing temporary_file_path lets
+    FileSystemStorage move it into place instead of copying it again.
+    """
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def staging_dir(upload):
+    return Path(settings.UPLOAD_STAGING_ROOT) / str(upload.id)
+
+
+def part_path(upload, number):
+    return staging_dir(upload) / f"{number:05d}.part"
+
+
+def upload_storage(upload):
+    return Lesson._meta.get_field(upload.field).storage
+
+
+def uses_s3(upload):
+    return isinstance(upload_storage(upload), S3MediaStorage)
+
+
+def start_upload(lesson, user, field, filename, total_size, part_size=None):
+    part_size = part_size or settings.UPLOAD_PART_SIZE
+    if not settings.UPLOAD_MIN_PART_SIZE <= part_size <= settings.UPLOAD_MAX_PART_SIZE:
+        raise ValidationError({"part_size": (
+            f"Must be between {settings.UPLOAD_MIN_PART_SIZE} and {settings.UPLOAD_MAX_PART_SIZE} bytes."
+        )})
+
+    model_field = Lesson._meta.get_field(field)
+    storage = model_field.storage
+    name = storage.get_available_name(
+        model_field.generate_filename(lesson, filename), max_length=model_field.max_length
+    )
+    upload = LessonUpload(
+        lesson=lesson,
+        created_by=user,
+        field=field,
+        filename=filename,
+        storage_name=name,
+        total_size=total_size,
+        part_size=part_size,
+    )
+    if isinstance(storage, S3MediaStorage):
+        response = storage.client.create_multipart_upload(
+            Bucket=storage.bucket_name, Key=storage.key(name)
+        )
+        upload.s3_upload_id = response['UploadId']
+    else:
+        staging_dir(upload).mkdir(parents=True, exist_ok=True)
+    upload.save()
+    return upload
+
+
+def receive_part(upload, number, stream, expected_sha256=None):
+    """
+    Read one part from ``stream`` in bounded chunks, verify its size and
+    SHA-256, and store it. Re-sending a part replaces it, which is how clients
+    resume after a dropped connection.
+    """
+    if upload.status != 'pending':
+        raise ValidationError({"detail": f"Upload is {upload.status}."})
+    if not 1 <= number <= upload.part_count:
+        raise ValidationError({"detail": f"Part number must be between 1 and {upload.part_count}."})
+
+    expected_size = upload.expected_part_size(number)
+    digest = hashlib.sha256()
+    size = 0
+    chunk_size = settings.MEDIA_STREAM_CHUNK_SIZE
+
+    if uses_s3(upload):
+        target = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    else:
+        tmp_path = part_path(upload, number).with_suffix('.tmp')
+        target = open(tmp_path, 'wb')
+
+    with target:
+        while stream is not None:
+            chunk = stream.read(min(chunk_size, expected_size + 1 - size))
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > expected_size:
+                break
+            digest.update(chunk)
+            target.write(chunk)
+
+        sha256 = digest.hexdigest()
+        error = None
+        if size != expected_size:
+            error = f"Part {number} must be exactly {expected_size} bytes."
+        elif expected_sha256 and expected_sha256.lower() != sha256:
+            error = f"Checksum mismatch for part {number}."
+
+        if error:
+            if not uses_s3(upload):
+                target.close()
+                os.unlink(tmp_path)
+            raise ValidationError({"detail": error})
+
+        etag = ''
+        if uses_s3(upload):
+            target.seek(0)
+            storage = upload_storage(upload)
+            response = storage.client.upload_part(
+                Bucket=storage.bucket_name,
+                Key=storage.key(upload.storage_name),
+                UploadId=upload.s3_upload_id,
+                PartNumber=number,
+                Body=target,
+            )
+            etag = response['ETag']
+
+    if not uses_s3(upload):
+        os.replace(tmp_path, part_path(upload, number))
+
+    part, _ = LessonUploadPart.objects.update_or_create(
+        upload=upload, number=number,
+        defaults={'size': size, 'sha256': sha256, 'etag': etag},
+    )
+    return part
+
+
+def complete_upload(upload):
+    if upload.status != 'pending':
+        raise ValidationError({"detail": f"Upload is {upload.status}."})
+
+    parts = list(upload.parts.order_by('number'))
+    missing = sorted(set(range(1, upload.part_count + 1)) - {part.number for part in parts})
+    if missing:
+        raise ValidationError({"detail": "Upload is incomplete.", "missing_parts": missing})
+
+    storage = upload_storage(upload)
+    if isinstance(storage, S3MediaStorage):
+        storage.client.complete_multipart_upload(
+            Bucket=storage.bucket_name,
+            Key=storage.key(upload.storage_name),
+            UploadId=upload.s3_upload_id,
+            MultipartUpload={'Parts': [{'ETag': part.etag, 'PartNumber': part.number} for part in parts]},
+        )
+        name = upload.storage_name
+    else:
+        assembled = staging_dir(upload) / 'assembled'
+        with open(assembled, 'wb') as target:
+            for part in parts:
+                with open(part_path(upload, part.number), 'rb') as source:
+                    shutil.copyfileobj(source, target, settings.MEDIA_STREAM_CHUNK_SIZE)
+        with open(assembled, 'rb') as source:
+            name = storage.save(upload.storage_name, AssembledFile(source, upload.filename))
+        shutil.rmtree(staging_dir(upload), ignore_errors=True)
+
+    with transaction.atomic():
+        lesson = upload.lesson
+        setattr(lesson, upload.field, name)
+        lesson.save(update_fields=[upload.field])
+        upload.storage_name = name
+        upload.status = 'completed'
+        upload.completed_at = now()
+        upload.save(update_fields=['storage_name', 'status', 'completed_at'])
+        if upload.field == 'video_file':
+            enqueue_transcode(lesson)
+    return upload
+
+
+def abort_upload(upload):
+    if upload.status != 'pending':
+        raise ValidationError({"detail": f"Upload is {upload.status}."})
+
+    storage = upload_storage(upload)
+    if isinstance(storage, S3MediaStorage):
+        storage.client.abort_multipart_upload(
+            Bucket=storage.bucket_name,
+            Key=storage.key(upload.storage_name),
+            UploadId=upload.s3_upload_id,
+        )
+    else:
+        shutil.rmtree(staging_dir(upload), ignore_errors=True)
+
+    upload.status = 'aborted'
+    upload.save(update_fields=['status'])
+    return upload
@@ -1,6 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CategoryViewSet, CourseViewSet, ChapterViewSet, LessonViewSet, UserLessonKeyUpdateView, LessonDetailView
+from .views import (
+    CategoryViewSet, CourseViewSet, ChapterViewSet, LessonViewSet,
+    UserLessonKeyUpdateView, LessonDetailView, LessonMediaStreamView,
+    LessonUploadCreateView, LessonUploadDetailView, LessonUploadPartView, LessonUploadCompleteView,
+    LessonHLSView, LessonHLSKeyView, CatalogCacheStatsView, CatalogSearchView,
+)
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet)
@@ -11,7 +16,16 @@ router.register(r'lessons', LessonViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('search/', CatalogSearchView.as_view(), name='catalog-search'),
+    path('cache/stats/', CatalogCacheStatsView.as_view(), name='catalog-cache-stats'),
     path('lesson/<int:lesson_id>/partial-key/', UserLessonKeyUpdateView.as_view(), name='lesson-partial-key'),
     path('lesson/playback/<int:lesson_id>/', UserLessonKeyUpdateView.as_view(), name='lesson-playback'),
     path('lessons/<int:pk>/watch/', LessonDetailView.as_view(), name='lesson-detail'),
+    path('lessons/<int:pk>/stream/<str:kind>/', LessonMediaStreamView.as_view(), name='lesson-stream'),
+    path('lessons/<int:pk>/hls/key/', LessonHLSKeyView.as_view(), name='lesson-hls-key'),
+    path('lessons/<int:pk>/hls/<path:name>', LessonHLSView.as_view(), name='lesson-hls'),
+    path('lessons/<int:pk>/uploads/', LessonUploadCreateView.as_view(), name='lesson-upload-create'),
+    path('uploads/<uuid:upload_id>/', LessonUploadDetailView.as_view(), name='lesson-upload-detail'),
+    path('uploads/<uuid:upload_id>/parts/<int:number>/', LessonUploadPartView.as_view(), name='lesson-upload-part'),
+    path('uploads/<uuid:upload_id>/complete/', LessonUploadCompleteView.as_view(), name='lesson-upload-complete'),
 ]
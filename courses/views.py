@@ -1,47 +1,259 @@
-from rest_framework import viewsets, generics, permissions
+from rest_framework import viewsets, permissions
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
-from .models import Category, Course, Chapter, Lesson, UserLessonKey
-from .serializers import CategorySerializer, CourseSerializer, ChapterSerializer, LessonSerializer, UserLessonKeySerializer, LessonDetailSerializer
+from .models import Category, Course, Chapter, Lesson, UserLessonKey, LessonUpload
+from .serializers import CategorySerializer, CourseSerializer, CourseListSerializer, ChapterSerializer, LessonSerializer, UserLessonKeySerializer, LessonDetailSerializer, LessonUploadSerializer, CourseOutlineWriteSerializer, can_access_lesson_media
+from .media import in_thread, media_response, playlist_response
+from .cache import CatalogCacheMixin, cache_stats
+from .conditional import ConditionalGetMixin
+from .uploads import start_upload, receive_part, complete_upload, abort_upload
+from .authoring import apply_outline
+from .search import search_catalog
 from rest_framework.views import APIView
+from rest_framework.decorators import action
+from drf_spectacular.utils import extend_schema
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from django.shortcuts import get_object_or_404
- 
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from django.http import Http404, HttpResponse
+from root.async_views import AsyncAPIView
+from root.metrics import LESSON_KEYS_ISSUED
+from django.db.models.fields.files import FieldFile
+import posixpath
+from django.conf import settings
+from django.db.models import Prefetch
 
-class CategoryViewSet(viewsets.ModelViewSet):
-    queryset = Category.objects.all()
+
+def lesson_tree_prefetch():
+    return Prefetch('lessons', queryset=Lesson.objects.order_by('order', 'id'))
+
+
+class CategoryViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
+    queryset = Category.objects.order_by('id')
+    cursor_ordering = 'id'
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
 
-class CourseViewSet(viewsets.ModelViewSet):
-    queryset = Course.objects.all()
+class CourseViewSet(ConditionalGetMixin, CatalogCacheMixin, viewsets.ModelViewSet):
+    # category and the precomputed outline are joined, so list and retrieve run
+    # a fixed number of queries regardless of catalog size.
+    queryset = Course.objects.select_related('category').order_by('-created_at', '-id')
     serializer_class = CourseSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    cursor_ordering = ('-created_at', '-id')
+
+    def expand_chapters(self):
+        # The list is a flat catalog unless the caller opts into the tree with
+        # ?expand=chapters; detail and write responses always include it.
+        if self.action != 'list':
+            return True
+        return 'chapters' in self.request.query_params.get('expand', '').split(',')
+
+    def get_queryset(self):
+        # Chapter/lesson trees and counts come from the one-row CourseOutline.
+        return super().get_queryset().select_related('outline')
+
+    def get_serializer_class(self):
+        if self.expand_chapters():
+            return CourseSerializer
+        return CourseListSerializer
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    @extend_schema(request=CourseOutlineWriteSerializer)
+    @action(detail=True, methods=['put'], url_path='outline')
+    def outline(self, request, pk=None):
+        """
+        Replace the course's whole chapter -> lesson outline in one request and
+        one transaction. Only rows that differ are written; the response lists
+        what happened to each chapter and lesson.
+        """
+        course = self.get_object()
+        serializer = CourseOutlineWriteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'results': apply_outline(course, serializer.validated_data)})
 
-class ChapterViewSet(viewsets.ModelViewSet):
-    queryset = Chapter.objects.all()
+
+class ChapterViewSet(ConditionalGetMixin, CatalogCacheMixin, viewsets.ModelViewSet):
+    queryset = Chapter.objects.prefetch_related(lesson_tree_prefetch()).order_by('order', 'id')
+    cursor_ordering = 'id'
     serializer_class = ChapterSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
 
-class LessonViewSet(viewsets.ModelViewSet):
-    queryset = Lesson.objects.all()
+class LessonViewSet(ConditionalGetMixin, CatalogCacheMixin, viewsets.ModelViewSet):
+    queryset = Lesson.objects.order_by('order', 'id')
+    cursor_ordering = 'id'
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
 
 
-class LessonDetailView(generics.RetrieveAPIView):
-    queryset = Lesson.objects.all()
+class LessonDetailView(AsyncAPIView):
+    """
+    Watch a lesson: its metadata, plus media URLs and the full key once the
+    ?partial_decryption_key= checks out.
+    """
+    permission_classes = [permissions.IsAuthenticated]
     serializer_class = LessonDetailSerializer
+
+    async def get(self, request, pk):
+        lesson = await aget_object_or_404(Lesson, pk=pk)
+        # Media URLs may be presigned against S3, which stays off the event loop.
+        data = await in_thread(lambda: self.serializer_class(lesson, context={'request': request}).data)()
+        return Response(data)
+
+
+class LessonMediaStreamView(AsyncAPIView):
+    """
+    Stream a lesson's video or document with Range support. Access requires the
+    same partial key as the watch endpoint, passed as ?partial_decryption_key=.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    media_fields = {'video': 'video_file', 'document': 'document'}
+
+    async def get(self, request, pk, kind):
+        if kind not in self.media_fields:
+            raise Http404
+        lesson = await aget_object_or_404(Lesson, pk=pk)
+
+        partial_key_b64 = request.query_params.get('partial_decryption_key')
+        if not can_access_lesson_media(request.user, lesson, partial_key_b64):
+            return Response({"detail": "Invalid or missing partial decryption key."}, status=status.HTTP_403_FORBIDDEN)
+
+        field_file = getattr(lesson, self.media_fields[kind])
+        if not field_file:
+            raise Http404
+        # Stat/presign calls block; under ASGI the body then streams without a thread.
+        return await in_thread(media_response)(request, field_file)
+
+
+class CatalogSearchView(APIView):
+    """
+    Ranked prefix search over courses, lessons and categories:
+    ?q=<text>[&type=courses,lessons,categories][&limit=20]. Backed by the
+    generated search_vector columns and their GIN indexes.
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    kinds = ('courses', 'lessons', 'categories')
+
+    def get(self, request):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({"detail": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
+        kinds = [kind for kind in request.query_params.get('type', ','.join(self.kinds)).split(',') if kind in self.kinds]
+        try:
+            limit = min(int(request.query_params.get('limit', settings.API_PAGE_SIZE)), settings.API_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({"detail": "'limit' must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(search_catalog(text, max(limit, 1), kinds))
+
+
+class CatalogCacheStatsView(APIView):
+    """Catalog cache hit/miss counters for the worker process that answers."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats())
+
+
+class LessonHLSView(AsyncAPIView):
+    """
+    Serve the HLS master playlist, variant playlists and segments of a
+    transcoded lesson. Segments are encrypted; the key is gated separately.
+    Playlists always come from here so their relative URIs lead back to this
+    view; only segments are redirected to presigned object storage URLs.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
+    async def get(self, request, pk, name):
+        lesson = await aget_object_or_404(Lesson, pk=pk, transcode_status='ready')
+        name = posixpath.normpath(name)
+        if name.startswith(('.', '/')):
+            raise Http404
+        field_file = FieldFile(
+            lesson, Lesson._meta.get_field('video_file'),
+            posixpath.join(posixpath.dirname(lesson.hls_playlist), name),
+        )
+        if not await in_thread(field_file.storage.exists)(field_file.name):
+            raise Http404
+        if name.endswith('.m3u8') and getattr(field_file.storage, 'serves_direct_urls', False):
+            return await in_thread(playlist_response)(field_file)
+        return await in_thread(media_response)(request, field_file)
+
+
+class LessonHLSKeyView(AsyncAPIView):
+    """
+    Release a lesson's AES-128 segment key to users holding a valid partial key.
+    Players append ?partial_decryption_key= to the key URI in the playlist.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def get(self, request, pk):
+        lesson = await aget_object_or_404(Lesson, pk=pk)
+        partial_key_b64 = request.query_params.get('partial_decryption_key')
+        if not lesson.hls_key or not can_access_lesson_media(request.user, lesson, partial_key_b64):
+            return Response({"detail": "Invalid or missing partial decryption key."}, status=status.HTTP_403_FORBIDDEN)
+
+        response = HttpResponse(bytes(lesson.hls_key), content_type='application/octet-stream')
+        response['Cache-Control'] = 'private, no-store'
+        return response
+
+
+class LessonUploadCreateView(APIView):
+    """Start a chunked upload for a lesson's video_file or document."""
+    permission_classes = [IsAuthenticated]
+    serializer_class = LessonUploadSerializer
+
+    def post(self, request, pk):
+        lesson = get_object_or_404(Lesson, pk=pk)
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = start_upload(lesson, request.user, **serializer.validated_data)
+        return Response(self.serializer_class(upload).data, status=status.HTTP_201_CREATED)
+
+
+class LessonUploadMixin:
+    permission_classes = [IsAuthenticated]
+    serializer_class = LessonUploadSerializer
+
+    def get_upload(self, upload_id):
+        return get_object_or_404(
+            LessonUpload.objects.prefetch_related('parts'), pk=upload_id, created_by=self.request.user
+        )
+
+
+class LessonUploadDetailView(LessonUploadMixin, APIView):
+    """Report received parts so a client can resume, or abort the upload."""
+
+    def get(self, request, upload_id):
+        return Response(self.serializer_class(self.get_upload(upload_id)).data)
+
+    def delete(self, request, upload_id):
+        abort_upload(self.get_upload(upload_id))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class LessonUploadPartView(LessonUploadMixin, APIView):
+    """
+    PUT the raw bytes of part N. The body is streamed to the staging area (or an
+    S3 multipart part) in chunks; send X-Checksum-SHA256 to have it verified.
+    """
+
+    def put(self, request, upload_id, number):
+        upload = self.get_upload(upload_id)
+        part = receive_part(upload, number, request.stream, request.headers.get('X-Checksum-SHA256'))
+        return Response({'number': part.number, 'size': part.size, 'sha256': part.sha256})
+
+
+class LessonUploadCompleteView(LessonUploadMixin, APIView):
+
+    def post(self, request, upload_id):
+        upload = complete_upload(self.get_upload(upload_id))
+        return Response(self.serializer_class(upload).data)
+
 
 class UserLessonKeyUpdateView(APIView):
     permission_classes = [IsAuthenticated]
@@ -50,7 +262,9 @@ class UserLessonKeyUpdateView(APIView):
     def patch(self, request, lesson_id):
         user = request.user
         lesson = get_object_or_404(Lesson, id=lesson_id)
-        key_obj, _ = UserLessonKey.objects.get_or_create(user=user, lesson=lesson)
+        key_obj, created = UserLessonKey.objects.get_or_create(user=user, lesson=lesson)
+        if created:
+            LESSON_KEYS_ISSUED.inc()
 
         serializer = self.serializer_class(key_obj, data=request.data, partial=True)
         if serializer.is_valid():
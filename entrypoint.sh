@@ -28,4 +28,4 @@ echo "📦 Collecting static files..."
 python manage.py collectstatic --noinput
 
 echo "🚀 Starting Gunicorn server..."
-exec gunicorn root.wsgi:application --bind 0.0.0.0:8001
+exec gunicorn -c gunicorn.conf.py
@@ -0,0 +1,91 @@
+"""
+Gunicorn configuration, driven by environment variables.
+
+GUNICORN_WORKER_MODE:
+  "sync"    - one request per worker process; only for CPU-bound loads
+  "gthread" - GUNICORN_THREADS requests per worker; the default, because most
+              time goes to Postgres, S3 and media streaming
+  "uvicorn" - serve root/asgi.py with uvicorn workers. Sync views still run
+              in a worker's thread pool, so only async views gain concurrency.
+              DB_CONNECTION_MODE defaults to "pool" here; root/asgi.py
+              refuses "persistent" and "pgbouncer", which leak under ASGI.
+
+In DB_CONNECTION_MODE=pool, keep DB_POOL_MAX_SIZE >= GUNICORN_THREADS or
+threads will queue for connections.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+cpu_count = multiprocessing.cpu_count()
+
+worker_mode = os.getenv("GUNICORN_WORKER_MODE", "gthread")
+if worker_mode not in ("sync", "gthread", "uvicorn"):
+    raise ValueError(f"Unknown GUNICORN_WORKER_MODE {worker_mode!r}")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8001")
+
+if worker_mode == "uvicorn":
+    wsgi_app = "root.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+    workers = int(os.getenv("GUNICORN_WORKERS", str(cpu_count)))
+elif worker_mode == "gthread":
+    wsgi_app = "root.wsgi:application"
+    worker_class = "gthread"
+    workers = int(os.getenv("GUNICORN_WORKERS", str(cpu_count)))
+    threads = int(os.getenv("GUNICORN_THREADS", "8"))
+else:
+    wsgi_app = "root.wsgi:application"
+    worker_class = "sync"
+    workers = int(os.getenv("GUNICORN_WORKERS", str(cpu_count * 2 + 1)))
+
+# Recycle workers periodically; the jitter keeps them from restarting together.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "200"))
+
+# Long enough for a chunked upload part or a slow ranged download, but a
+# stuck worker still gets killed. In-flight requests get graceful_timeout to
+# finish on reload/shutdown.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Workers write Prometheus metrics to files here and /metrics merges them
+# (root/metrics.py). Must be set before prometheus_client is imported.
+prometheus_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "lms-prometheus")
+)
+os.makedirs(prometheus_dir, exist_ok=True)
+
+# Import Django once in the master so workers fork with it loaded.
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-") or None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    # Nothing opened in the master (DB connections, the shared S3 client) may
+    # be inherited by a worker.
+    if preload_app:
+        from django.db import connections
+
+        from courses.storage import reset_s3_client
+
+        connections.close_all()
+        reset_s3_client()
+
+
+def on_starting(server):
+    # Drop the previous run's metric files so counters start from zero.
+    shutil.rmtree(prometheus_dir, ignore_errors=True)
+    os.makedirs(prometheus_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Stop counting the dead worker's live gauges (the pool connection gauges).
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -9,8 +9,20 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
+from django.core.exceptions import ImproperlyConfigured
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'root.settings')
+# Persistent connections are unsafe under ASGI: connections opened in
+# sync_to_async threads are never closed by request_finished, so each one
+# leaks. Default to the pool here and refuse the persistent modes.
+os.environ.setdefault('DB_CONNECTION_MODE', 'pool')
 
 application = get_asgi_application()
+
+if settings.DB_CONNECTION_MODE in ('persistent', 'pgbouncer'):
+    raise ImproperlyConfigured(
+        f"DB_CONNECTION_MODE={settings.DB_CONNECTION_MODE!r} leaks connections under ASGI; "
+        "use 'pool' or 'per_request'."
+    )
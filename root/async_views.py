@@ -0,0 +1,45 @@
+from inspect import isawaitable
+
+from asgiref.sync import sync_to_async
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """
+    Async counterpart of APIView for long-lived, I/O-bound endpoints (media and
+    file downloads). Content negotiation, authentication, permission and
+    throttle checks run once in a worker thread; after that the handler only
+    awaits, so under ASGI a streaming response holds no thread while the
+    client reads.
+
+    Handlers may return DRF ``Response`` objects or plain Django responses.
+    Errors go through the configured EXCEPTION_HANDLER like any other view.
+    """
+
+    def perform_content_negotiation(self, request, force=False):
+        # Media handlers return their own bytes, so a player's Accept: video/*
+        # must not be turned into a 406; fall back to the first renderer.
+        return super().perform_content_negotiation(request, force=True)
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            # options() and http_method_not_allowed() are APIView's sync ones.
+            if isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.db import connections
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+def database_stats(alias='default'):
+    """Connection strategy and, in pool mode, psycopg pool counters for this worker process."""
+    connection = connections[alias]
+    stats = {
+        'mode': settings.DB_CONNECTION_MODE,
+        'vendor': connection.vendor,
+        'conn_max_age': connection.settings_dict.get('CONN_MAX_AGE'),
+        'health_checks': connection.settings_dict.get('CONN_HEALTH_CHECKS'),
+        'server_side_cursors': not connection.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'),
+        'connected': connection.connection is not None,
+        'pool': None,
+    }
+    pool = getattr(connection, 'pool', None)
+    if pool is not None:
+        stats['pool'] = pool.get_stats()
+    return stats
+
+
+class DatabaseStatsView(APIView):
+    """Database connection / pool counters for the worker process that answers."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(database_stats())
@@ -0,0 +1,106 @@
+"""
+Prometheus metrics for the API process, served at /metrics.
+
+Under gunicorn each worker is its own process, so values are kept in mmap'd
+files under PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py sets and wipes it) and
+/metrics merges every worker's files. Without that variable (runserver, tests)
+the in-process default registry is used.
+"""
+import hmac
+import os
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+# Pool counters are copied into the gauges at most this often per process.
+POOL_STATS_INTERVAL = 5.0
+
+REQUEST_LATENCY = Histogram(
+    'lms_http_request_duration_seconds', "Request latency by URL name.", ['view', 'method'],
+    buckets=LATENCY_BUCKETS,
+)
+RESPONSES = Counter('lms_http_responses', "Responses by URL name and status.", ['view', 'method', 'status'])
+RESPONSE_SIZE = Histogram(
+    'lms_http_response_size_bytes', "Response body size; streamed bodies use Content-Length.", ['view'],
+    buckets=SIZE_BUCKETS,
+)
+DB_QUERIES = Histogram('lms_db_queries_per_request', "Database queries per request.", ['view'], buckets=QUERY_BUCKETS)
+DB_POOL = Gauge(
+    'lms_db_pool_connections', "psycopg pool connections summed over live workers (DB_CONNECTION_MODE=pool).",
+    ['state'], multiprocess_mode='livesum',
+)
+LESSON_KEYS_ISSUED = Counter('lms_lesson_keys_issued', "UserLessonKey rows created.")
+MEDIA_BYTES = Counter('lms_media_bytes_served', "Lesson media and KYC bytes streamed by Django.")
+MEDIA_RESPONSES = Counter(
+    'lms_media_responses', "Lesson media responses by who sends the bytes.", ['delivery'],
+)
+
+_pool_updated = 0.0
+
+
+def response_size(response):
+    if response.streaming:
+        length = response.get('Content-Length')
+        return int(length) if length else None
+    return len(response.content)
+
+
+def update_pool_gauges():
+    global _pool_updated
+    now = time.monotonic()
+    if now - _pool_updated < POOL_STATS_INTERVAL:
+        return
+    _pool_updated = now
+    pool = getattr(connections['default'], 'pool', None)
+    if pool is None:
+        return
+    stats = pool.get_stats()
+    DB_POOL.labels('size').set(stats.get('pool_size', 0))
+    DB_POOL.labels('available').set(stats.get('pool_available', 0))
+    DB_POOL.labels('waiting').set(stats.get('requests_waiting', 0))
+
+
+def observe_request(record, response):
+    """Record one finished request; ``record`` comes from root.timing."""
+    view = record['view'] or 'unmatched'
+    REQUEST_LATENCY.labels(view, record['method']).observe(record['total_ms'] / 1000)
+    RESPONSES.labels(view, record['method'], str(record['status'])).inc()
+    DB_QUERIES.labels(view).observe(record['db_queries'])
+    size = response_size(response)
+    if size is not None:
+        RESPONSE_SIZE.labels(view).observe(size)
+    if settings.DB_CONNECTION_MODE == 'pool':
+        update_pool_gauges()
+
+
+def registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    merged = CollectorRegistry()
+    multiprocess.MultiProcessCollector(merged)
+    return merged
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition. Scrapers send METRICS_TOKEN as a Bearer token;
+    without a token the endpoint only exists when METRICS_PUBLIC is on.
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+            return HttpResponse(status=401)
+    elif not settings.METRICS_PUBLIC:
+        raise Http404
+    return HttpResponse(generate_latest(registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,29 @@
+from django.conf import settings
+from rest_framework import pagination
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+
+class LimitOffsetPagination(pagination.LimitOffsetPagination):
+    max_limit = settings.API_MAX_PAGE_SIZE
+
+
+class KeysetPagination(pagination.CursorPagination):
+    """
+    Cursor (keyset) pagination. Views choose the key with ``cursor_ordering``,
+    e.g. ``('-created_at', '-id')``; deep pages then cost the same as the first
+    one because Postgres seeks on the index instead of counting an OFFSET.
+    """
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None)
+        if ordering:
+            return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+        return super().get_ordering(request, queryset, view)
+
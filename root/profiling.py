@@ -0,0 +1,266 @@
+"""
+On-demand sampling profiler for single requests.
+
+A staff user sends ``X-Profile: 1`` to profile that request, and
+PROFILE_SAMPLE_RATE profiles a random fraction of requests to the URL names in
+PROFILE_VIEWS. While a request is profiled a background thread samples the
+Python stacks of the threads running it every PROFILE_SAMPLE_INTERVAL seconds.
+The report is saved to the "profiles" storage in two files:
+
+- ``<id>.collapsed``: one "frame;frame;frame count" line per distinct stack,
+  the input format of flamegraph.pl and speedscope
+- ``<id>.json``: request metadata and the top functions by self and total samples
+
+Only the newest PROFILE_MAX_COUNT profiles are kept; older ones are deleted
+whenever a new one is saved.
+
+Requests that are not profiled pay for one header lookup and, with sampling
+on, one random number.
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.http import FileResponse, Http404
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from rest_framework import exceptions, permissions
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+PROFILE_HEADER = 'X-Profile'
+TOP_FUNCTIONS = 30
+PROFILE_NAME_RE = re.compile(r'^[\w-]+\.(collapsed|json)$')
+
+# One profile at a time per process, so a burst of sampled requests cannot
+# pile sampler threads onto a worker.
+_active = threading.Lock()
+
+
+def profile_storage():
+    return storages['profiles']
+
+
+def frame_label(code):
+    filename = code.co_filename
+    for prefix in sorted(sys.path, key=len, reverse=True):
+        if prefix and filename.startswith(prefix + os.sep):
+            filename = filename[len(prefix) + 1:]
+            break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+
+
+def collapse(frame):
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class StackSampler:
+    """Count the stacks of ``thread_ids`` every ``interval`` seconds until stopped."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.thread_ids = {threading.get_ident()}
+        self.stacks = Counter()
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in tuple(self.thread_ids):
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[collapse(frame)] += 1
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit=TOP_FUNCTIONS):
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for label in set(frames):
+                total[label] += count
+        samples = sum(self.stacks.values()) or 1
+        return [
+            {'function': label, 'self': own[label], 'total': count, 'total_pct': round(100 * count / samples, 1)}
+            for label, count in total.most_common(limit)
+        ]
+
+
+def is_staff_request(request):
+    """Session or API (JWT) staff user; only evaluated when the profile header is present."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return True
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        return bool(drf_request.user and drf_request.user.is_staff)
+    except exceptions.APIException:
+        return False
+
+
+def is_sampled(request):
+    if not settings.PROFILE_SAMPLE_RATE or random.random() >= settings.PROFILE_SAMPLE_RATE:
+        return False
+    if not settings.PROFILE_VIEWS:
+        return True
+    # The handler resolves the URL only after the middleware chain has run.
+    try:
+        match = resolve(request.path_info, getattr(request, 'urlconf', None))
+    except Resolver404:
+        return False
+    return match.url_name in settings.PROFILE_VIEWS
+
+
+def should_profile(request):
+    if request.headers.get(PROFILE_HEADER) == '1':
+        return is_staff_request(request)
+    return is_sampled(request)
+
+
+def saved_profile_ids(storage):
+    """Saved profile ids, newest first (ids start with their timestamp)."""
+    _, files = storage.listdir('')
+    return sorted((name[:-len('.json')] for name in files if name.endswith('.json')), reverse=True)
+
+
+def prune_profiles(storage, keep):
+    for profile_id in saved_profile_ids(storage)[keep:]:
+        for suffix in ('.json', '.collapsed'):
+            storage.delete(f"{profile_id}{suffix}")
+
+
+def save_report(request, sampler, response):
+    view = getattr(request.resolver_match, 'url_name', None) or 'unnamed'
+    profile_id = f"{timezone.now():%Y%m%dT%H%M%S}-{view}-{uuid.uuid4().hex[:8]}"
+    report = {
+        'id': profile_id,
+        'method': request.method,
+        'path': request.path,
+        'view': view,
+        'status': response.status_code,
+        'duration_ms': round(sampler.duration * 1000, 2),
+        'interval_ms': sampler.interval * 1000,
+        'samples': sum(sampler.stacks.values()),
+        'top_functions': sampler.top_functions(),
+    }
+    storage = profile_storage()
+    storage.save(f"{profile_id}.collapsed", ContentFile(sampler.collapsed().encode()))
+    storage.save(f"{profile_id}.json", ContentFile(json.dumps(report, indent=2).encode()))
+    prune_profiles(storage, settings.PROFILE_MAX_COUNT)
+    return profile_id
+
+
+class ProfilingMiddleware:
+    """
+    Keep last in MIDDLEWARE: the profile covers what runs inside it, i.e. URL
+    resolution and the view, including DRF authentication, serialization and
+    rendering for DRF views. Runs in the handler's mode, so under ASGI async
+    views stay on the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.PROFILING_ENABLED or not should_profile(request):
+            return self.get_response(request)
+        if not _active.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            sampler = StackSampler(settings.PROFILE_SAMPLE_INTERVAL)
+            sampler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                sampler.stop()
+            response['X-Profile-Id'] = save_report(request, sampler, response)
+            return response
+        finally:
+            _active.release()
+
+    async def __acall__(self, request):
+        if not settings.PROFILING_ENABLED:
+            return await self.get_response(request)
+        if request.headers.get(PROFILE_HEADER) == '1':
+            # Resolving the user may hit the database.
+            profile = await sync_to_async(is_staff_request)(request)
+        else:
+            profile = is_sampled(request)
+        if not profile or not _active.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            # The event loop thread runs async views; sync views and sync
+            # middleware run in the request's thread-sensitive executor thread.
+            sampler = StackSampler(settings.PROFILE_SAMPLE_INTERVAL)
+            sampler.thread_ids.add(await sync_to_async(threading.get_ident)())
+            sampler.start()
+            try:
+                response = await self.get_response(request)
+            finally:
+                sampler.stop()
+            response['X-Profile-Id'] = await sync_to_async(save_report)(request, sampler, response)
+            return response
+        finally:
+            _active.release()
+
+
+class ProfileListView(APIView):
+    """Saved request profiles, newest first."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        ids = saved_profile_ids(profile_storage())
+        return Response([
+            {
+                'id': profile_id,
+                'report': request.build_absolute_uri(f"{profile_id}.json"),
+                'collapsed': request.build_absolute_uri(f"{profile_id}.collapsed"),
+            }
+            for profile_id in ids
+        ])
+
+
+class ProfileDownloadView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, name):
+        storage = profile_storage()
+        if not PROFILE_NAME_RE.match(name) or not storage.exists(name):
+            raise Http404
+        return FileResponse(storage.open(name, 'rb'), as_attachment=True, filename=name)
@@ -18,6 +18,9 @@ MY_SECRET_KEY = os.getenv('MY_SECRET_KEY')
 MY_BUCKET_NAME = os.getenv('MY_BUCKET_NAME')
 MY_AWS_REGION = os.getenv('MY_AWS_REGION', 'us-east-1')
 MY_S3_ENDPOINT_URL = os.getenv('MY_S3_ENDPOINT_URL') 
+S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', '50'))
+S3_MULTIPART_CHUNK_SIZE = int(os.getenv('S3_MULTIPART_CHUNK_SIZE', str(16 * 1024 * 1024)))
+MEDIA_PRESIGNED_URL_EXPIRY = int(os.getenv('MEDIA_PRESIGNED_URL_EXPIRY', '300'))
 
 if not AES_SECRET:
     raise ValueError("AES_SECRET must be set in your .env file")
@@ -33,6 +36,61 @@ STATICFILES_DIRS = [BASE_DIR / "static"]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Where Lesson.video_file / Lesson.document live: "local" (MEDIA_ROOT),
+# "encrypted" (MEDIA_ROOT, AES-CTR encrypted with AES_SECRET) or "s3"
+# (MY_BUCKET_NAME, served through presigned URLs). Switching from "local" to
+# "encrypted" keeps existing files readable as plaintext; run
+# "manage.py encrypt_existing_lesson_media" afterwards to encrypt them.
+LESSON_MEDIA_STORAGE = os.getenv("LESSON_MEDIA_STORAGE", "local")
+MEDIA_STORAGE_BACKENDS = {
+    "local": "django.core.files.storage.FileSystemStorage",
+    "encrypted": "courses.encryption.EncryptedFileSystemStorage",
+    "s3": "courses.storage.S3MediaStorage",
+}
+MEDIA_ENCRYPTION_CHUNK_SIZE = int(os.getenv("MEDIA_ENCRYPTION_CHUNK_SIZE", str(1024 * 1024)))
+
+# KYC documents use the same backends but never live under MEDIA_ROOT, which is
+# publicly served in DEBUG. KYC_STORAGE_LOCATION is a directory for the local
+# backends and a key prefix for s3.
+KYC_DOCUMENT_STORAGE = os.getenv("KYC_DOCUMENT_STORAGE", "encrypted")
+KYC_STORAGE_LOCATION = os.getenv(
+    "KYC_STORAGE_LOCATION",
+    "kyc" if KYC_DOCUMENT_STORAGE == "s3" else str(BASE_DIR / "private_media" / "kyc"),
+)
+
+# Request profiles (root/profiling.py) hold stack traces, so like KYC documents
+# they stay out of MEDIA_ROOT. PROFILE_STORAGE_LOCATION is a directory for
+# "local" and a key prefix for "s3".
+PROFILE_STORAGE = os.getenv("PROFILE_STORAGE", "local")
+PROFILE_STORAGE_LOCATION = os.getenv(
+    "PROFILE_STORAGE_LOCATION",
+    "profiles" if PROFILE_STORAGE == "s3" else str(BASE_DIR / "private_media" / "profiles"),
+)
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    "lesson_media": {"BACKEND": MEDIA_STORAGE_BACKENDS[LESSON_MEDIA_STORAGE]},
+    "kyc_documents": {
+        "BACKEND": MEDIA_STORAGE_BACKENDS[KYC_DOCUMENT_STORAGE],
+        "OPTIONS": {"location": KYC_STORAGE_LOCATION},
+    },
+    "profiles": {
+        "BACKEND": MEDIA_STORAGE_BACKENDS[PROFILE_STORAGE],
+        "OPTIONS": {"location": PROFILE_STORAGE_LOCATION},
+    },
+}
+
+# Bytes read per iteration when streaming lesson media.
+MEDIA_STREAM_CHUNK_SIZE = int(os.getenv("MEDIA_STREAM_CHUNK_SIZE", str(512 * 1024)))
+
+# Who sends lesson media bytes once Django has authorized the request:
+# "django" streams from the worker, "nginx" returns X-Accel-Redirect and
+# "sendfile" returns X-Sendfile. For nginx, MEDIA_ACCEL_REDIRECT_PREFIX must be
+# an `internal;` location aliased to MEDIA_ROOT.
+MEDIA_DELIVERY_BACKEND = os.getenv("MEDIA_DELIVERY_BACKEND", "django")
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -40,6 +98,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     "corsheaders",
     'drf_spectacular',
@@ -49,6 +108,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'root.timing.ServerTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',      
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -57,6 +117,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'root.profiling.ProfilingMiddleware',
 ]
 
 CORS_ALLOWED_ORIGINS = [
@@ -90,6 +151,24 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'root.wsgi.application'
 
+# DB_CONNECTION_MODE:
+#   "per_request" - open and close a connection per request (Django default)
+#   "persistent"  - keep one connection per worker thread for DB_CONN_MAX_AGE
+#                   seconds, health-checked before reuse
+#   "pool"        - psycopg3 native pool shared by a worker's threads
+#                   (needs the psycopg[pool] package)
+#   "pgbouncer"   - persistent connections to a pgbouncer running in
+#                   transaction mode; server-side cursors are disabled
+#                   because they do not survive across transactions there
+# Under ASGI (root/asgi.py) the default is "pool" and the two persistent
+# modes are refused: they leak connections opened in sync_to_async threads.
+DB_CONNECTION_MODE = os.getenv("DB_CONNECTION_MODE", "persistent")
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+DB_CONN_HEALTH_CHECKS = os.getenv("DB_CONN_HEALTH_CHECKS", "true").lower() == "true"
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -98,9 +177,104 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", "sabnocksid"),
         "HOST": os.getenv("DB_HOST", "db"),
         "PORT": os.getenv("DB_PORT", "5432"),
+        "CONN_MAX_AGE": DB_CONN_MAX_AGE if DB_CONNECTION_MODE in ("persistent", "pgbouncer") else 0,
+        # Checks reused persistent connections, or pooled ones on checkout.
+        "CONN_HEALTH_CHECKS": DB_CONN_HEALTH_CHECKS,
+        "DISABLE_SERVER_SIDE_CURSORS": DB_CONNECTION_MODE == "pgbouncer",
+        "OPTIONS": (
+            {
+                "pool": {
+                    "min_size": DB_POOL_MIN_SIZE,
+                    "max_size": DB_POOL_MAX_SIZE,
+                    "timeout": DB_POOL_TIMEOUT,
+                },
+            }
+            if DB_CONNECTION_MODE == "pool"
+            else {}
+        ),
     }
 }
 
+# CACHE_BACKEND: "locmem" (per process) or "redis" (shared, needs REDIS_URL).
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem")
+CACHES = {
+    "default": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+        }
+        if CACHE_BACKEND == "redis"
+        else {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "lms"}
+    ),
+}
+
+# Read-through cache for catalog list/retrieve payloads, invalidated by a
+# version bump whenever a Category, Course, Chapter or Lesson is saved/deleted.
+# A bump only reaches the process that made the write unless the cache is
+# shared, so it is off by default with the per-process locmem backend.
+CATALOG_CACHE_ENABLED = os.getenv("CATALOG_CACHE_ENABLED", str(CACHE_BACKEND == "redis")).lower() == "true"
+CATALOG_CACHE_ALIAS = "default"
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", "300"))
+
+# Per-request timing (root.timing.ServerTimingMiddleware): query count/time,
+# serializer time, catalog cache hits/misses and total time. The Server-Timing
+# header shows them to any client, so it is off unless DEBUG; the JSON log line
+# goes to the "root.timing" logger at DEBUG, so it is only written with
+# REQUEST_TIMING_LOG_LEVEL=DEBUG (query budget warnings are always written).
+REQUEST_TIMING_ENABLED = os.getenv("REQUEST_TIMING_ENABLED", "true").lower() == "true"
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", str(DEBUG)).lower() == "true"
+REQUEST_TIMING_LOG = os.getenv("REQUEST_TIMING_LOG", "true").lower() == "true"
+
+# Most queries a request to each URL name may run. Over-budget requests are
+# logged as warnings, or raise QueryBudgetExceeded with QUERY_BUDGET_ACTION=raise.
+QUERY_BUDGET_ACTION = os.getenv("QUERY_BUDGET_ACTION", "log")
+QUERY_BUDGETS = {
+    "course-list": 6,
+    "course-detail": 13,
+    "lesson-list": 4,
+    "catalog-search": 4,
+    "login": 2,
+}
+
+# Prometheus metrics at /metrics (root/metrics.py), fed by the timing
+# middleware. Scrapers authenticate with "Authorization: Bearer <METRICS_TOKEN>";
+# with no token the endpoint answers 404 unless METRICS_PUBLIC=true opts into
+# serving it to anyone (e.g. behind a private network).
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "false").lower() == "true"
+
+# On-demand profiling (root.profiling.ProfilingMiddleware). Staff users get a
+# profile of any request sent with "X-Profile: 1"; PROFILE_SAMPLE_RATE also
+# profiles that fraction of requests to PROFILE_VIEWS (URL names, empty = all).
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "true").lower() == "true"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_VIEWS = [name for name in os.getenv("PROFILE_VIEWS", "").split(",") if name]
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.001"))
+# Saving a profile deletes all but the newest PROFILE_MAX_COUNT.
+PROFILE_MAX_COUNT = int(os.getenv("PROFILE_MAX_COUNT", "200"))
+
+# Preferred password hasher: "pbkdf2" (PBKDF2_ITERATIONS, 0 = Django's
+# default), "argon2" (needs argon2-cffi) or "bcrypt" (needs bcrypt). The others
+# stay installed so existing hashes still verify; they are rehashed to the
+# preferred one on the user's next successful login.
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "pbkdf2")
+PBKDF2_ITERATIONS = int(os.getenv("PBKDF2_ITERATIONS", "0"))
+PASSWORD_HASHER_CLASSES = {
+    "pbkdf2": "accounts.hashers.TunedPBKDF2PasswordHasher",
+    "argon2": "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "bcrypt": "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "pbkdf2_sha1": "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "scrypt": "django.contrib.auth.hashers.ScryptPasswordHasher",
+}
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + [
+    path for name, path in PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHER
+]
+# Run login password checks on a bounded per-process thread pool of this size
+# (0 = inline). Caps how many CPU-heavy hashes a worker runs at once during a
+# login storm, and lets async callers await the check instead of blocking.
+PASSWORD_HASH_THREADS = int(os.getenv("PASSWORD_HASH_THREADS", "0"))
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',},
@@ -119,20 +293,91 @@ USE_I18N = True
 USE_TZ = True
 
 
-DATA_UPLOAD_MAX_MEMORY_SIZE = 524288000
-FILE_UPLOAD_MAX_MEMORY_SIZE = 524288000
+# Keep request bodies out of worker RAM: multipart uploads above this spill to
+# a temporary file, and large lesson media goes through the chunked upload API.
+DATA_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv("DATA_UPLOAD_MAX_MEMORY_SIZE", str(2621440)))
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv("FILE_UPLOAD_MAX_MEMORY_SIZE", str(2621440)))
+
+# Chunked lesson media uploads. Parts are staged on disk (or sent straight to an
+# S3 multipart upload, which needs parts of at least 5 MB).
+UPLOAD_STAGING_ROOT = os.getenv("UPLOAD_STAGING_ROOT", str(BASE_DIR / "upload_staging"))
+UPLOAD_PART_SIZE = int(os.getenv("UPLOAD_PART_SIZE", str(8 * 1024 * 1024)))
+UPLOAD_MIN_PART_SIZE = int(os.getenv("UPLOAD_MIN_PART_SIZE", str(5 * 1024 * 1024)))
+UPLOAD_MAX_PART_SIZE = int(os.getenv("UPLOAD_MAX_PART_SIZE", str(64 * 1024 * 1024)))
+
+# HLS transcoding (python manage.py transcode_worker). HLS_LADDER lists
+# height:video-bitrate rungs; HLS_KEY_URL_BASE prefixes the key URI written into
+# playlists when they are served from another host (e.g. presigned S3 URLs).
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+HLS_LADDER = os.getenv("HLS_LADDER", "360:800k,720:2800k,1080:5000k")
+HLS_SEGMENT_SECONDS = int(os.getenv("HLS_SEGMENT_SECONDS", "6"))
+HLS_KEY_URL_BASE = os.getenv("HLS_KEY_URL_BASE", "")
+TRANSCODE_TIMEOUT = int(os.getenv("TRANSCODE_TIMEOUT", "7200"))
+TRANSCODE_POLL_INTERVAL = float(os.getenv("TRANSCODE_POLL_INTERVAL", "5"))
+# A lesson still "processing" this long after it was claimed is re-queued; the
+# default allows the full ffmpeg timeout plus an hour to upload segments.
+TRANSCODE_STALE_AFTER = int(os.getenv("TRANSCODE_STALE_AFTER", str(TRANSCODE_TIMEOUT + 3600)))
+
+# How JWT requests resolve request.user:
+#   "database"  - one SELECT per request (simplejwt's default)
+#   "cached"    - in-process cache (AUTH_USER_LOCAL_TTL seconds) in front of
+#                 the shared cache (AUTH_USER_CACHE_TIMEOUT); user saves
+#                 invalidate both in the writing process, other processes
+#                 keep their in-process copy for up to AUTH_USER_LOCAL_TTL.
+#                 Needs CACHE_BACKEND=redis: locmem is per process, so it is
+#                 not the default there and its TTL is capped at the local one.
+#   "stateless" - trust the claims embedded in the access token; no query at
+#                 all. Role, staff, KYC and is_active changes only apply once
+#                 the token is refreshed (see ACCESS_TOKEN_LIFETIME below).
+JWT_AUTH_MODE = os.getenv("JWT_AUTH_MODE", "cached" if CACHE_BACKEND == "redis" else "database")
+AUTH_USER_CACHE_ALIAS = "default"
+AUTH_USER_LOCAL_TTL = int(os.getenv("AUTH_USER_LOCAL_TTL", "5"))
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv("AUTH_USER_CACHE_TIMEOUT", "60"))
+if CACHE_BACKEND != "redis":
+    AUTH_USER_CACHE_TIMEOUT = min(AUTH_USER_CACHE_TIMEOUT, AUTH_USER_LOCAL_TTL)
 
 SIMPLE_JWT = {
-    "ACCESS_TOKEN_LIFETIME": timedelta(days=7),
+    # In stateless mode a demoted or deactivated user keeps the old claims
+    # until the access token expires; refreshing re-reads them from the
+    # database and refuses inactive users. Keep it short in that mode.
+    "ACCESS_TOKEN_LIFETIME": timedelta(minutes=int(os.getenv(
+        "ACCESS_TOKEN_LIFETIME_MINUTES", "15" if JWT_AUTH_MODE == "stateless" else str(7 * 24 * 60),
+    ))),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=14),
     "ROTATE_REFRESH_TOKENS": False,
     "BLACKLIST_AFTER_ROTATION": True,
     "AUTH_HEADER_TYPES": ("Bearer",),
+    # Tokens carry role/staff/KYC claims for the stateless mode; refreshes
+    # take them from the current user row, not from the refresh token.
+    "TOKEN_OBTAIN_SERIALIZER": "accounts.authentication.UserClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "accounts.authentication.UserClaimsTokenRefreshSerializer",
+}
+
+JWT_AUTHENTICATION_CLASSES = {
+    "database": "rest_framework_simplejwt.authentication.JWTAuthentication",
+    "cached": "accounts.authentication.CachedJWTAuthentication",
+    "stateless": "accounts.authentication.StatelessJWTAuthentication",
 }
+# List endpoint pagination: "cursor" (keyset on id/created_at), "limit_offset",
+# "page" or "none".
+API_PAGINATION = os.getenv("API_PAGINATION", "limit_offset")
+API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", "20"))
+API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", "100"))
+
+API_PAGINATION_CLASSES = {
+    "page": "root.pagination.PageNumberPagination",
+    "limit_offset": "root.pagination.LimitOffsetPagination",
+    "cursor": "root.pagination.KeysetPagination",
+    "none": None,
+}
+
 REST_FRAMEWORK = {
+    "DEFAULT_PAGINATION_CLASS": API_PAGINATION_CLASSES[API_PAGINATION],
+    "PAGE_SIZE": API_PAGE_SIZE,
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        JWT_AUTHENTICATION_CLASSES[JWT_AUTH_MODE],
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
@@ -165,3 +410,14 @@ SPECTACULAR_SETTINGS = {
 }
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "root.timing": {"handlers": ["console"], "level": os.getenv("REQUEST_TIMING_LOG_LEVEL", "INFO"), "propagate": False},
+    },
+}
@@ -0,0 +1,176 @@
+import contextvars
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework import serializers
+
+from .metrics import observe_request
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('request_timings', default=None)
+_installed = False
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised instead of logged when QUERY_BUDGET_ACTION is "raise", so tests fail on N+1 regressions."""
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.serializer = 0.0
+        self.in_serializer = False
+        self.cache = {'hit': 0, 'miss': 0}
+
+    def as_dict(self, request, response, total):
+        match = request.resolver_match
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': match.url_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_queries': self.queries,
+            'db_ms': round(self.db * 1000, 2),
+            'serializer_ms': round(self.serializer * 1000, 2),
+            'cache_hits': self.cache['hit'],
+            'cache_misses': self.cache['miss'],
+        }
+
+
+def record_cache(outcome):
+    timings = _current.get()
+    if timings is not None:
+        timings.cache[outcome] += 1
+
+
+def record_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.db += time.perf_counter() - started
+
+
+def add_query_wrapper(sender, connection, **kwargs):
+    # First in the list: connection.execute_wrapper() pops the last entry on
+    # exit, which must stay the wrapper it pushed.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def timed_data(prop):
+    """Wrap a serializer ``data`` property; nested and super() calls count once."""
+    def data(self):
+        timings = _current.get()
+        if timings is None or timings.in_serializer:
+            return prop.fget(self)
+        timings.in_serializer = True
+        started = time.perf_counter()
+        try:
+            return prop.fget(self)
+        finally:
+            timings.serializer += time.perf_counter() - started
+            timings.in_serializer = False
+    return property(data)
+
+
+def instrument():
+    """
+    Hook query execution on every connection and ``.data`` on DRF serializers.
+    Both only do work while a request is being timed. Safe to call twice.
+    """
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    connection_created.connect(add_query_wrapper)
+    for connection in connections.all(initialized_only=True):
+        add_query_wrapper(None, connection)
+    for cls in (serializers.BaseSerializer, serializers.Serializer, serializers.ListSerializer):
+        cls.data = timed_data(cls.__dict__['data'])
+
+
+def server_timing(timings, total):
+    return ', '.join([
+        f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries"',
+        f'serializer;dur={timings.serializer * 1000:.1f}',
+        f'cache;desc="{timings.cache["hit"]} hits, {timings.cache["miss"]} misses"',
+        f'total;dur={total * 1000:.1f}',
+    ])
+
+
+def check_query_budget(record):
+    budget = settings.QUERY_BUDGETS.get(record['view'])
+    if budget is None or record['db_queries'] <= budget:
+        return
+    message = f"{record['method']} {record['path']} ({record['view']}) ran {record['db_queries']} queries, budget is {budget}"
+    if settings.QUERY_BUDGET_ACTION == 'raise':
+        raise QueryBudgetExceeded(message)
+    logger.warning(message, extra={'timing': record})
+
+
+class ServerTimingMiddleware:
+    """
+    Time each request: database queries (count and duration), serializer
+    ``.data``, catalog cache hits/misses and the total. Adds a Server-Timing
+    header, logs one JSON line at DEBUG on this module's logger, feeds root.metrics and
+    enforces QUERY_BUDGETS. For streaming responses the total stops at the headers.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        instrument()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.REQUEST_TIMING_ENABLED:
+            return self.get_response(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        if not settings.REQUEST_TIMING_ENABLED:
+            return await self.get_response(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        total = time.perf_counter() - timings.started
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = server_timing(timings, total)
+        record = timings.as_dict(request, response, total)
+        if settings.REQUEST_TIMING_LOG and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps(record), extra={'timing': record})
+        if settings.METRICS_ENABLED:
+            observe_request(record, response)
+        check_query_budget(record)
+        return response
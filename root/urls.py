@@ -9,6 +9,10 @@ from drf_spectacular.views import (
 from django.conf import settings
 from django.conf.urls.static import static
 
+from root.db import DatabaseStatsView
+from root.metrics import metrics_view
+from root.profiling import ProfileDownloadView, ProfileListView
+
 urlpatterns = [
     path("admin/", admin.site.urls),
 
@@ -19,6 +23,10 @@ urlpatterns = [
     # Accounts API
     path("api/accounts/", include("accounts.urls")),
     path('api/course/', include('courses.urls')),
+    path("api/db/stats/", DatabaseStatsView.as_view(), name="db-stats"),
+    path("metrics", metrics_view, name="metrics"),
+    path("api/profiles/", ProfileListView.as_view(), name="profile-list"),
+    path("api/profiles/<str:name>", ProfileDownloadView.as_view(), name="profile-download"),
 
     # Schema & Documentation
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),